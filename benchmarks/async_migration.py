@@ -0,0 +1,130 @@
+"""
+Event-loop blocking of AsyncSelfTuningMap while it migrates.
+
+Loads n keys, forces a switch and, until the migration and the release of
+the old structure are done, keeps a client issuing searches and a probe
+measuring how long each of its `await asyncio.sleep(0)` calls waited for
+the loop. The longest wait is the longest time anything held the loop;
+it should stay near `chunk_budget`. Full GC collections stall the loop
+whatever the map does, so they are timed separately. For scale, the same switch is also
+timed on a blocking SelfTuningMap.
+
+    python -m benchmarks.async_migration [n_keys] [chunk_budget_ms] [from] [to]
+"""
+
+import asyncio
+import gc
+import random
+import sys
+import time
+
+from src.core import AsyncSelfTuningMap, SelfTuningMap
+
+
+def _disable_switching(stm):
+    stm.decision_engine.min_ops_before_switch = float('inf')
+
+
+class _FullCollections:
+    """Records when the cyclic GC runs full collections, which pause any Python code"""
+    
+    def __init__(self):
+        self.intervals = []
+        self._start = None
+    
+    def __call__(self, phase, info):
+        if info['generation'] != 2:
+            return
+        if phase == 'start':
+            self._start = time.perf_counter()
+        elif self._start is not None:
+            self.intervals.append((self._start, time.perf_counter()))
+    
+    def within(self, start, end):
+        """Seconds of full collection between start and end"""
+        return sum(max(0.0, min(end, b) - max(start, a)) for a, b in self.intervals)
+
+
+async def _probe(done, waits):
+    while not done.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(0)
+        waits.append((start, time.perf_counter()))
+
+
+async def _client(amap, n_keys, done, latencies, seed=0):
+    rng = random.Random(seed)
+    while not done.is_set():
+        start = time.perf_counter()
+        value = await amap.search(rng.randrange(n_keys))
+        latencies.append(time.perf_counter() - start)
+        assert value is not None
+        await asyncio.sleep(0)
+
+
+async def measure_async_migration(n_keys=1000000, chunk_budget=0.002, source='AVL', target='HashMap'):
+    """
+    Returns {'migration_seconds', 'max_loop_block_ms', 'p99_loop_block_ms',
+    'max_gc_pause_ms', 'max_search_ms', 'searches'} for one background
+    switch of n_keys. Loop blocks exclude full GC collections, which stall
+    the loop however the work is chunked; the longest one is reported on
+    its own.
+    """
+    amap = AsyncSelfTuningMap(initial_structure=source, chunk_budget=chunk_budget)
+    _disable_switching(amap.map)
+    amap.map.active_ds.bulk_load((key, key) for key in range(n_keys))
+    
+    done = asyncio.Event()
+    waits = []
+    latencies = []
+    probe = asyncio.create_task(_probe(done, waits))
+    client = asyncio.create_task(_client(amap, n_keys, done, latencies))
+    
+    collections = _FullCollections()
+    gc.callbacks.append(collections)
+    try:
+        start = time.perf_counter()
+        await amap.force_switch(target)
+        await amap.wait_for_migration()
+        elapsed = time.perf_counter() - start
+        done.set()
+        await asyncio.gather(probe, client)
+    finally:
+        gc.callbacks.remove(collections)
+    
+    assert amap.get_current_structure() == target
+    blocks = sorted(end - begin - collections.within(begin, end) for begin, end in waits)
+    return {
+        'migration_seconds': elapsed,
+        'max_loop_block_ms': blocks[-1] * 1000,
+        'p99_loop_block_ms': blocks[int(len(blocks) * 0.99)] * 1000,
+        'max_gc_pause_ms': max((b - a for a, b in collections.intervals), default=0.0) * 1000,
+        'max_search_ms': max(latencies) * 1000,
+        'searches': len(latencies)
+    }
+
+
+def measure_blocking_migration(n_keys=1000000, source='AVL', target='HashMap'):
+    """Seconds one blocking SelfTuningMap switch of n_keys holds the caller"""
+    stm = SelfTuningMap(initial_structure=source)
+    _disable_switching(stm)
+    stm.active_ds.bulk_load((key, key) for key in range(n_keys))
+    start = time.perf_counter()
+    stm.force_switch(target)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    n_keys = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    chunk_budget = float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.002
+    source = sys.argv[3] if len(sys.argv) > 3 else 'AVL'
+    target = sys.argv[4] if len(sys.argv) > 4 else 'HashMap'
+    
+    print(f"{source} -> {target}, {n_keys} keys, chunk budget {chunk_budget * 1000:.1f}ms")
+    result = asyncio.run(measure_async_migration(n_keys, chunk_budget, source, target))
+    print(f"  async:    {result['migration_seconds']:.2f}s in the background, "
+          f"loop blocked at most {result['max_loop_block_ms']:.2f}ms "
+          f"(p99 {result['p99_loop_block_ms']:.3f}ms, GC pauses up to {result['max_gc_pause_ms']:.0f}ms), "
+          f"{result['searches']} searches, slowest {result['max_search_ms']:.2f}ms")
+    blocking = measure_blocking_migration(n_keys, source, target)
+    print(f"  blocking: one {blocking * 1000:.0f}ms pause")
@@ -0,0 +1,70 @@
+"""
+Counting Bloom filter in front of a structure: search throughput on misses.
+
+Loads n keys into a SelfTuningMap pinned to a structure
+(instrumentation='off', so it never switches), then runs uniform searches
+over a key space that makes the given share of them misses, with and
+without the filter, reporting operations per second, the misses the
+filter answered on its own and its observed false-positive rate. Also
+times rebuild(), which the map runs on every blocking migration.
+
+    python -m benchmarks.bloom [n_keys] [structure] [n_ops]
+"""
+
+import sys
+import time
+
+from src.core import SelfTuningMap, CountingBloomFilter
+from src.utils.workload_generator import WorkloadStream
+
+MISS_SHARES = (0.0, 0.5, 0.9)
+
+
+def _run(stm, keys):
+    search = stm.search
+    start = time.perf_counter()
+    for key in keys:
+        search(key)
+    return time.perf_counter() - start
+
+
+def measure_rebuild(n_keys=1000000):
+    """Seconds for one rebuild() over n keys"""
+    bloom = CountingBloomFilter()
+    start = time.perf_counter()
+    bloom.rebuild(range(n_keys))
+    return time.perf_counter() - start
+
+
+def measure_bloom(n_keys=1000000, structure='AVL', n_ops=500000, miss_share=0.5):
+    """Returns {label: {'ops_per_sec', 'misses_saved', 'observed_fp_rate'}}"""
+    key_space = int(n_keys / (1 - miss_share))
+    keys = [key for _, key, _ in WorkloadStream(n_ops, 'uniform', key_space=key_space,
+                                                mix={'search': 1}, seed=1)]
+    results = {}
+    for label, bloom in (('no filter', None), ('bloom', True)):
+        stm = SelfTuningMap(initial_structure=structure, instrumentation='off', bloom=bloom)
+        stm.active_ds.bulk_load((key, key) for key in range(n_keys))
+        if stm.bloom is not None:
+            stm.bloom.rebuild(range(n_keys))
+        seconds = _run(stm, keys)
+        stats = stm.get_stats()['bloom']
+        results[label] = {
+            'ops_per_sec': n_ops / seconds,
+            'misses_saved': stats['misses_saved'] if stats else 0,
+            'observed_fp_rate': stats['observed_fp_rate'] if stats else 0.0
+        }
+    return results
+
+
+if __name__ == "__main__":
+    n_keys = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    structure = sys.argv[2] if len(sys.argv) > 2 else 'AVL'
+    n_ops = int(sys.argv[3]) if len(sys.argv) > 3 else 500000
+    
+    print(f"rebuild() over {n_keys} keys: {measure_rebuild(n_keys) * 1e3:.0f}ms")
+    for miss_share in MISS_SHARES:
+        print(f"{n_keys} keys on {structure}, {n_ops} uniform searches, {miss_share:.0%} misses")
+        for label, r in measure_bloom(n_keys, structure, n_ops, miss_share).items():
+            print(f"  {label:<10} {r['ops_per_sec']:>10,.0f} ops/s  misses saved {r['misses_saved']}  "
+                  f"false positives {r['observed_fp_rate']:.2%}")
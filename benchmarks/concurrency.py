@@ -0,0 +1,143 @@
+"""
+Multi-threaded stress and throughput test for ConcurrentSelfTuningMap.
+
+Reader threads search random keys for `duration` seconds while one
+writer inserts at a fixed rate and forces a switch every
+`switch_interval` seconds. The same run goes against a
+SelfTuningMap behind one global lock (blocking migrations) and against
+ConcurrentSelfTuningMap, reporting read throughput, the worst read
+latency and reads stalled for more than `stall_ms`. Afterwards every
+written key is checked, so a lost or torn write fails the run.
+
+    python -m benchmarks.concurrency [n_keys] [seconds] [max_threads]
+"""
+
+from bisect import bisect_right
+import random
+import sys
+import threading
+import time
+
+from src.core import ConcurrentSelfTuningMap, SelfTuningMap
+
+
+SWITCH_CYCLE = ('AVL', 'HashMap', 'BPlusTree', 'HashMap')
+
+
+class GlobalLockMap:
+    """SelfTuningMap with every call behind one lock: the baseline"""
+    
+    def __init__(self, initial_structure='HashMap'):
+        self.map = SelfTuningMap(initial_structure=initial_structure, instrumentation='sampled')
+        self.lock = threading.Lock()
+    
+    def insert(self, key, value):
+        with self.lock:
+            return self.map.insert(key, value)
+    
+    def search(self, key):
+        with self.lock:
+            return self.map.search(key)
+    
+    def force_switch(self, target_structure):
+        with self.lock:
+            self.map.force_switch(target_structure)
+    
+    def wait_for_migration(self, timeout=None):
+        return True
+
+
+def _reader(target, keys, stop, seed, results):
+    rng = random.Random(seed)
+    search = target.search
+    latencies = []
+    while not stop.is_set():
+        key = keys[rng.randrange(len(keys))]
+        start = time.perf_counter_ns()
+        search(key)
+        latencies.append(time.perf_counter_ns() - start)
+    results.append(latencies)
+
+
+def _writer(target, first_key, stop, switch_interval, written, burst=50):
+    key = first_key
+    switches = 0
+    next_switch = time.perf_counter() + switch_interval
+    while not stop.is_set():
+        target.insert(key, -key)
+        written.append(key)
+        key += 1
+        if time.perf_counter() >= next_switch:
+            target.force_switch(SWITCH_CYCLE[switches % len(SWITCH_CYCLE)])
+            switches += 1
+            next_switch = time.perf_counter() + switch_interval
+        if (key - first_key) % burst == 0:
+            time.sleep(0.001)  # Same write rate for both maps, well below saturation
+
+
+def run_stress(target, n_keys=50000, n_threads=4, duration=2.0, switch_interval=0.25,
+               stall_ms=5.0, seed=0):
+    """
+    Returns {'read_ops_per_sec', 'p99_read_ms', 'max_read_ms', 'stalled_reads', 'writes'}.
+    Raises AssertionError if any key written reads back wrong afterwards.
+    """
+    keys = list(range(n_keys))
+    for key in keys:
+        target.insert(key, -key)
+    target.wait_for_migration()
+    
+    stop = threading.Event()
+    written = []
+    results = []
+    threads = [threading.Thread(target=_writer,
+                                args=(target, n_keys, stop, switch_interval, written))]
+    threads += [threading.Thread(target=_reader, args=(target, keys, stop, seed + i, results))
+                for i in range(n_threads)]
+    
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    target.wait_for_migration()
+    
+    for key in keys + written:
+        value = target.search(key)
+        assert value == -key, f"key {key} read back {value!r}"
+    
+    latencies = sorted(t for thread_latencies in results for t in thread_latencies)
+    stall_ns = stall_ms * 1e6
+    return {
+        'read_ops_per_sec': len(latencies) / duration,
+        'p99_read_ms': latencies[int(len(latencies) * 0.99)] / 1e6,
+        'max_read_ms': latencies[-1] / 1e6,
+        'stalled_reads': len(latencies) - bisect_right(latencies, stall_ns),
+        'writes': len(written)
+    }
+
+
+def compare(n_keys=50000, duration=2.0, thread_counts=(1, 2, 4, 8)):
+    """{n_threads: {'global_lock': result, 'concurrent': result}}"""
+    results = {}
+    for n_threads in thread_counts:
+        results[n_threads] = {
+            'global_lock': run_stress(GlobalLockMap(), n_keys, n_threads, duration),
+            'concurrent': run_stress(ConcurrentSelfTuningMap(initial_structure='HashMap'),
+                                     n_keys, n_threads, duration)
+        }
+    return results
+
+
+if __name__ == "__main__":
+    n_keys = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    duration = float(sys.argv[2]) if len(sys.argv) > 2 else 2.0
+    max_threads = int(sys.argv[3]) if len(sys.argv) > 3 else 8
+    thread_counts = tuple(n for n in (1, 2, 4, 8, 16) if n <= max_threads)
+    
+    print(f"{n_keys} keys, {duration}s per run, a switch every 0.25s")
+    for n_threads, result in compare(n_keys, duration, thread_counts).items():
+        for name, r in result.items():
+            print(f"  {n_threads:>2} threads {name:>11}: {r['read_ops_per_sec']:>10,.0f} reads/s  "
+                  f"p99 {r['p99_read_ms']:6.2f}ms  max {r['max_read_ms']:7.2f}ms  "
+                  f"stalled {r['stalled_reads']:>5}  writes {r['writes']}")
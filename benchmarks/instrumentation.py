@@ -0,0 +1,111 @@
+"""
+Monitoring tax of SelfTuningMap per instrumentation level.
+
+Runs the same operation stream against the bare structure and against a
+SelfTuningMap pinned to that structure at each level, and reports the
+slowdown relative to the bare structure.
+    
+    python -m benchmarks.instrumentation [n_ops] [structure] [sample_rate]
+
+The default sampled config (one op in 1024) keeps the tax under the 10%
+target: about +8% on the HashMap here, of which +7% is the unsampled
+fast path (a call and a countdown over a ~4us bare op). A recorded op
+costs 10-25us, so denser sampling quickly adds up: one in 256 is
+already +12%.
+"""
+
+import gc
+import random
+import sys
+import time
+from statistics import median
+
+from src.core import AVL, BST, HashMap, SelfTuningMap
+from src.core.self_tuning_map import INSTRUMENTATION_LEVELS
+
+
+STRUCTURES = {'BST': BST, 'AVL': AVL, 'HashMap': HashMap}
+
+
+def make_operations(n_ops, key_range=100000, search_ratio=0.7, seed=42):
+    """Random insert/search mix as (op, key) pairs"""
+    rng = random.Random(seed)
+    return [('search' if rng.random() < search_ratio else 'insert', rng.randrange(key_range))
+            for _ in range(n_ops)]
+
+
+def _run(targets, operations, chunk=2000):
+    """
+    Seconds each target spends on each chunk of `operations`. Targets take
+    turns a chunk at a time, in rotating order, so neither a slow stretch
+    of the machine nor going first or last favours any of them.
+    """
+    calls = [(target.insert, target.search) for target in targets]
+    seconds = [[] for _ in targets]
+    clock = time.perf_counter
+    gc.disable()  # As timeit does: collections land on whichever target is unlucky
+    try:
+        for lo in range(0, len(operations), chunk):
+            block = operations[lo:lo + chunk]
+            first = lo // chunk
+            for turn in range(len(calls)):
+                i = (first + turn) % len(calls)
+                insert, search = calls[i]
+                start = clock()
+                for op, key in block:
+                    if op == 'insert':
+                        insert(key, key)
+                    else:
+                        search(key)
+                seconds[i].append(clock() - start)
+    finally:
+        gc.enable()
+    return seconds
+
+
+def measure_instrumentation_overhead(n_ops=200000, structure='HashMap', sample_rate=1024,
+                                     levels=INSTRUMENTATION_LEVELS, repeat=5):
+    """
+    Returns {level: {'seconds', 'ops_per_sec', 'overhead'}} where overhead is
+    the fractional slowdown versus the bare structure (0.1 == 10% tax).
+    Switching is disabled so only monitoring is measured. Each chunk's
+    time is the median over `repeat` runs, to damp machine noise.
+    """
+    operations = make_operations(n_ops)
+    
+    def make_map(level):
+        stm = SelfTuningMap(initial_structure=structure, instrumentation=level,
+                            sample_rate=sample_rate)
+        stm.decision_engine.min_ops_before_switch = float('inf')
+        return stm
+    
+    factories = {'bare': STRUCTURES[structure]}
+    for level in levels:
+        factories[level] = lambda level=level: make_map(level)
+    
+    runs = [_run([factory() for factory in factories.values()], operations)
+            for _ in range(repeat)]
+    best = {name: sum(median(chunk) for chunk in zip(*(run[i] for run in runs)))
+            for i, name in enumerate(factories)}
+    
+    baseline = best['bare']
+    return {
+        name: {
+            'seconds': seconds,
+            'ops_per_sec': n_ops / seconds,
+            'overhead': seconds / baseline - 1
+        }
+        for name, seconds in best.items()
+    }
+
+
+if __name__ == "__main__":
+    n_ops = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    structure = sys.argv[2] if len(sys.argv) > 2 else 'HashMap'
+    sample_rate = int(sys.argv[3]) if len(sys.argv) > 3 else 1024
+    
+    print(f"Monitoring tax on {structure}, {n_ops} ops, sampling 1 in {sample_rate}")
+    results = measure_instrumentation_overhead(n_ops, structure, sample_rate)
+    for level, result in results.items():
+        print(f"  {level:>9}: {result['ops_per_sec']:>12,.0f} ops/s  "
+              f"overhead {result['overhead']:+.1%}")
@@ -0,0 +1,65 @@
+"""
+Read cache in front of a tree: search throughput with and without it.
+
+Loads n keys into a SelfTuningMap pinned to a tree (instrumentation='off',
+so it never switches), then runs a Zipfian search-heavy stream through it
+without a cache and with LRU and CLOCK caches of several sizes, reporting
+operations per second and the hit ratio. Uniform keys show the cost of
+misses.
+
+    python -m benchmarks.read_cache [n_keys] [structure] [n_ops]
+"""
+
+import sys
+import time
+
+from src.core import SelfTuningMap, LRUCache, ClockCache
+from src.utils.workload_generator import WorkloadStream
+
+CAPACITIES = (1024, 16384)
+MIX = {'search': 0.95, 'insert': 0.05}
+
+
+def _run(stm, operations):
+    insert, search = stm.insert, stm.search
+    start = time.perf_counter()
+    for op, key, value in operations:
+        if op == 'search':
+            search(key)
+        else:
+            insert(key, value)
+    return time.perf_counter() - start
+
+
+def measure_cache(n_keys=1000000, structure='AVL', n_ops=500000, distribution='zipfian'):
+    """Returns {label: {'ops_per_sec', 'hit_ratio', 'evictions'}}"""
+    operations = list(WorkloadStream(n_ops, distribution, key_space=n_keys, mix=MIX, seed=1))
+    caches = {'no cache': lambda: None}
+    for capacity in CAPACITIES:
+        caches[f'lru {capacity}'] = lambda capacity=capacity: LRUCache(capacity)
+        caches[f'clock {capacity}'] = lambda capacity=capacity: ClockCache(capacity)
+    
+    results = {}
+    for label, make_cache in caches.items():
+        stm = SelfTuningMap(initial_structure=structure, instrumentation='off', cache=make_cache())
+        stm.active_ds.bulk_load((key, key) for key in range(n_keys))
+        seconds = _run(stm, operations)
+        cache = stm.get_stats()['cache']
+        results[label] = {
+            'ops_per_sec': n_ops / seconds,
+            'hit_ratio': cache['hit_ratio'] if cache else 0.0,
+            'evictions': cache['evictions'] if cache else 0
+        }
+    return results
+
+
+if __name__ == "__main__":
+    n_keys = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    structure = sys.argv[2] if len(sys.argv) > 2 else 'AVL'
+    n_ops = int(sys.argv[3]) if len(sys.argv) > 3 else 500000
+    
+    for distribution in ('zipfian', 'uniform'):
+        print(f"{n_keys} keys on {structure}, {n_ops} {distribution} ops (95% searches)")
+        for label, r in measure_cache(n_keys, structure, n_ops, distribution).items():
+            print(f"  {label:<12} {r['ops_per_sec']:>10,.0f} ops/s  hit ratio {r['hit_ratio']:.2f}  "
+                  f"evictions {r['evictions']}")
@@ -0,0 +1,76 @@
+"""
+Restart cost: loading a binary snapshot versus rebuilding by inserts.
+
+Builds a map of n keys (inserted in random order, as a rebuild from a
+source database would), lets it tune itself, saves a snapshot and loads it
+back, and times the per-item rebuild for comparison. The loaded map must
+come back with the same structure and contents.
+
+    python -m benchmarks.snapshot [n_keys] [structure] [path]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+from src.core import SelfTuningMap
+
+
+def rebuild(keys, initial_structure='BST'):
+    """A fresh map filled one insert at a time, and the seconds it took"""
+    start = time.perf_counter()
+    stm = SelfTuningMap(initial_structure=initial_structure, instrumentation='sampled')
+    for key in keys:
+        stm.insert(key, key)
+    return stm, time.perf_counter() - start
+
+
+def measure_snapshot(n_keys=1000000, structure='AVL', path=None, seed=0):
+    """
+    Returns {'rebuild_seconds', 'save_seconds', 'load_seconds',
+    'file_bytes', 'structure'}.
+    """
+    keys = list(range(n_keys))
+    random.Random(seed).shuffle(keys)
+    stm, rebuild_seconds = rebuild(keys, structure)
+    
+    if path is None:
+        fd, path = tempfile.mkstemp(suffix='.snap')
+        os.close(fd)
+    try:
+        start = time.perf_counter()
+        stm.save(path)
+        save_seconds = time.perf_counter() - start
+        
+        start = time.perf_counter()
+        loaded = SelfTuningMap.load(path)
+        load_seconds = time.perf_counter() - start
+        file_bytes = os.path.getsize(path)
+    finally:
+        os.remove(path)
+    
+    assert loaded.get_current_structure() == stm.get_current_structure()
+    assert loaded.active_ds.size == n_keys
+    assert all(loaded.search(key) == key for key in keys[:1000])
+    return {
+        'rebuild_seconds': rebuild_seconds,
+        'save_seconds': save_seconds,
+        'load_seconds': load_seconds,
+        'file_bytes': file_bytes,
+        'structure': loaded.get_current_structure()
+    }
+
+
+if __name__ == "__main__":
+    n_keys = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    structure = sys.argv[2] if len(sys.argv) > 2 else 'AVL'
+    path = sys.argv[3] if len(sys.argv) > 3 else None
+    
+    result = measure_snapshot(n_keys, structure, path)
+    print(f"{n_keys} keys, {result['structure']}, snapshot {result['file_bytes'] / 2**20:.1f} MiB")
+    print(f"  rebuild by inserts: {result['rebuild_seconds']:.2f}s")
+    print(f"  save:               {result['save_seconds']:.2f}s")
+    print(f"  load:               {result['load_seconds']:.2f}s "
+          f"({result['rebuild_seconds'] / result['load_seconds']:.1f}x faster than rebuilding)")
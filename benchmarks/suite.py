@@ -0,0 +1,283 @@
+"""
+Benchmark suite: fixed structures against SelfTuningMap.
+
+Runs every workload shape at every size against fixed BST, AVL and
+HashMap and against SelfTuningMap (with full and with sampled
+instrumentation), one run per worker process so that each run's peak RSS
+is its own, and writes the results as JSON: throughput, latency
+percentiles per operation, peak memory, and the migrations the
+self-tuning map made. Workloads are seeded WorkloadStreams, so a run is
+reproducible; a run that exceeds its time budget (a fixed BST under
+sorted keys at 1e6, say) stops there and is marked timed_out.
+
+Every run is repeated --repeats times (3) and the run with the median
+throughput is kept. With --baseline, results are compared against an
+earlier output file and runs whose median throughput fell by more than
+--tolerance are reported; the exit status is 1 if any did. Runs shorter
+than --min-seconds on either side are too short to time reliably and
+are not compared. Parallel workers share the machine, so keep --workers
+fixed between a baseline and the runs checked against it.
+
+    python -m benchmarks.suite [--sizes 1000,10000,100000,1000000]
+        [--shapes sorted,random,...] [--configs BST,AVL,...] [--workers N]
+        [--budget SECONDS] [--seed N] [--repeats 3] [--output results.json]
+        [--baseline baseline.json] [--tolerance 0.25] [--min-seconds 0.2]
+"""
+
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import time
+
+import numpy as np
+
+from src.core import AVL, BST, HashMap, SelfTuningMap
+from src.core.latency_histogram import LatencyHistogram
+from src.utils.workload_generator import WorkloadStream, OP_NAMES, INSERT, SEARCH, DELETE
+
+
+CONFIGS = {
+    'BST': BST,
+    'AVL': AVL,
+    'HashMap': HashMap,
+    'SelfTuningMap': SelfTuningMap,
+    'SelfTuningMap-sampled': lambda: SelfTuningMap(instrumentation='sampled'),
+}
+
+# Each shape is a list of phases: WorkloadStream arguments, with n_ops and
+# key_space given as multiples of the run size
+SHAPES = {
+    'sorted': [
+        dict(n_ops=1, distribution='sequential', key_space=1, mix={'insert': 1}, noise=0),
+        dict(n_ops=1, distribution='uniform', key_space=1, mix={'search': 1}),
+    ],
+    'random': [
+        dict(n_ops=1, distribution='uniform', key_space=4, mix={'insert': 1}),
+        dict(n_ops=1, distribution='uniform', key_space=4, mix={'insert': 0.5, 'search': 0.5}),
+    ],
+    'search_heavy': [
+        dict(n_ops=1, distribution='uniform', key_space=2, mix={'insert': 1}),
+        dict(n_ops=3, distribution='uniform', key_space=2, mix={'insert': 0.05, 'search': 0.95}),
+    ],
+    'evolving': [
+        dict(n_ops=1, distribution='sequential', key_space=1, mix={'insert': 1}, noise=0),
+        dict(n_ops=1, distribution='zipfian', key_space=1, mix={'insert': 0.1, 'search': 0.9}),
+        dict(n_ops=1, distribution='uniform', key_space=4,
+             mix={'insert': 0.4, 'search': 0.4, 'delete': 0.2}),
+    ],
+    'skewed': [
+        dict(n_ops=1, distribution='uniform', key_space=2, mix={'insert': 1}),
+        dict(n_ops=2, distribution='zipfian', key_space=2, mix={'insert': 0.1, 'search': 0.9}),
+    ],
+}
+
+SIZES = (1000, 10000, 100000, 1000000)
+LATENCY_SAMPLE = 16  # Time one operation in this many; timing them all would slow the run
+CHECK_EVERY = 64  # Operations between time-budget checks
+REPEATS = 3
+MIN_SECONDS = 0.2  # Shorter runs are not compared against a baseline
+
+
+def _peak_rss():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024  # Linux reports KiB
+
+
+def _run_stream(target, stream, histograms, deadline):
+    """Run a stream against target; returns (operations run, whether the deadline passed)"""
+    insert, search, delete, range_ = target.insert, target.search, target.delete, target.range
+    span = stream.range_span
+    clock = time.perf_counter_ns
+    done = 0
+    for ops, keys in stream.chunks():
+        for i, (op, key) in enumerate(zip(ops.tolist(), keys.tolist())):
+            timed = i % LATENCY_SAMPLE == 0
+            if timed:
+                t = clock()
+            if op == SEARCH:
+                search(key)
+            elif op == INSERT:
+                insert(key, key)
+            elif op == DELETE:
+                delete(key)
+            else:
+                range_(key, key + span)
+            if timed:
+                histograms[op].record((clock() - t) / 1e9)
+            if i % CHECK_EVERY == 0 and clock() > deadline:
+                return done + i + 1, True
+        done += len(ops)
+    return done, False
+
+
+def run_one(config, shape, size, seed=0, budget=60.0):
+    """
+    Run one workload shape at one size against one configuration.
+    Returns the result record written to the JSON output.
+    """
+    # The map reports its switches on stdout, which may be carrying the JSON
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        return _run_one(config, shape, size, seed, budget)
+
+
+def _run_one(config, shape, size, seed, budget):
+    target = CONFIGS[config]()
+    histograms = {op: LatencyHistogram() for op in range(len(OP_NAMES))}
+    rss_before = _peak_rss()
+    
+    operations = 0
+    timed_out = False
+    start = time.perf_counter_ns()
+    deadline = start + int(budget * 1e9)
+    for i, phase in enumerate(SHAPES[shape]):
+        phase = dict(phase, n_ops=phase['n_ops'] * size, key_space=max(2, phase['key_space'] * size))
+        done, timed_out = _run_stream(target, WorkloadStream(seed=seed * 1000 + i, **phase),
+                                      histograms, deadline)
+        operations += done
+        if timed_out:
+            break
+    seconds = (time.perf_counter_ns() - start) / 1e9
+    
+    engine = getattr(target, 'decision_engine', None)
+    return {
+        'config': config,
+        'shape': shape,
+        'size': size,
+        'seed': seed,
+        'operations': operations,
+        'seconds': seconds,
+        'ops_per_sec': operations / seconds if seconds else 0.0,
+        'timed_out': timed_out,
+        'latency': {OP_NAMES[op]: h.get_summary() for op, h in histograms.items() if h.count},
+        'peak_rss_bytes': _peak_rss(),
+        'rss_growth_bytes': _peak_rss() - rss_before,
+        'migrations': getattr(target, 'migration_count', 0),
+        'switches': engine.get_switch_history() if engine is not None else [],
+        'final_structure': (target.get_current_structure()
+                            if hasattr(target, 'get_current_structure') else config)
+    }
+
+
+def _run_task(task):
+    return run_one(*task)
+
+
+def _median_run(runs):
+    """The run with the median throughput, with every run's throughput attached"""
+    runs = sorted(runs, key=lambda r: r['ops_per_sec'])
+    return dict(runs[len(runs) // 2], repeats=len(runs),
+                ops_per_sec_runs=[r['ops_per_sec'] for r in runs])
+
+
+def run_suite(configs=tuple(CONFIGS), shapes=tuple(SHAPES), sizes=SIZES, seed=0,
+              budget=60.0, workers=None, repeats=REPEATS):
+    """
+    Run every (config, shape, size) combination `repeats` times, each run
+    in a fresh worker process, and keep the median run of each. Returns
+    {'meta', 'results'}, results sorted by shape, size and config.
+    """
+    tasks = [(config, shape, size, seed, budget)
+             for shape in shapes for size in sizes for config in configs]
+    # One task per process: ru_maxrss is a process-lifetime peak
+    runs = {}
+    with multiprocessing.Pool(workers, maxtasksperchild=1) as pool:
+        for r in pool.imap_unordered(_run_task, tasks * max(1, repeats)):
+            runs.setdefault((r['config'], r['shape'], r['size']), []).append(r)
+    results = [_median_run(runs[task[:3]]) for task in tasks]
+    return {
+        'meta': {
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'workers': workers or os.cpu_count(),
+            'seed': seed,
+            'budget_seconds': budget,
+            'repeats': max(1, repeats)
+        },
+        'results': results
+    }
+
+
+def check_regressions(results, baseline, tolerance=0.25, min_seconds=MIN_SECONDS):
+    """
+    Compare two run_suite outputs. Returns the runs present in both whose
+    median throughput fell by more than `tolerance` (a fraction of the
+    baseline), or that timed out where the baseline run didn't. A drop
+    only counts if both runs lasted at least `min_seconds`.
+    """
+    before = {(r['config'], r['shape'], r['size']): r for r in baseline['results']}
+    regressions = []
+    for r in results['results']:
+        b = before.get((r['config'], r['shape'], r['size']))
+        if b is None or not b['ops_per_sec']:
+            continue
+        change = r['ops_per_sec'] / b['ops_per_sec'] - 1
+        timed = min(r['seconds'], b['seconds']) >= min_seconds
+        if (change < -tolerance and timed) or (r['timed_out'] and not b['timed_out']):
+            regressions.append({
+                'config': r['config'],
+                'shape': r['shape'],
+                'size': r['size'],
+                'baseline_ops_per_sec': b['ops_per_sec'],
+                'ops_per_sec': r['ops_per_sec'],
+                'change': change,
+                'timed_out': r['timed_out']
+            })
+    return regressions
+
+
+def _names(value, known):
+    names = value.split(',')
+    unknown = [name for name in names if name not in known]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown: {', '.join(unknown)} (expected {', '.join(known)})")
+    return names
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.suite')
+    parser.add_argument('--sizes', type=lambda v: [int(float(s)) for s in v.split(',')], default=SIZES)
+    parser.add_argument('--shapes', type=lambda v: _names(v, SHAPES), default=list(SHAPES))
+    parser.add_argument('--configs', type=lambda v: _names(v, CONFIGS), default=list(CONFIGS))
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--budget', type=float, default=60.0, help="seconds per run")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeats', type=int, default=REPEATS, help="runs per combination")
+    parser.add_argument('--output', help="write the results JSON here (default: stdout)")
+    parser.add_argument('--baseline', help="results JSON to check for regressions against")
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    parser.add_argument('--min-seconds', type=float, default=MIN_SECONDS,
+                        help="shortest run compared against the baseline")
+    args = parser.parse_args()
+    
+    suite = run_suite(args.configs, args.shapes, args.sizes, args.seed, args.budget, args.workers,
+                      args.repeats)
+    if args.baseline:
+        with open(args.baseline) as f:
+            suite['regressions'] = check_regressions(suite, json.load(f), args.tolerance,
+                                                     args.min_seconds)
+    
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(suite, f, indent=2)
+    else:
+        json.dump(suite, sys.stdout, indent=2)
+        print()
+    
+    for r in suite['results']:
+        search = r['latency'].get('search', {})
+        print(f"{r['shape']:<12} {r['size']:>8} {r['config']:<21} {r['ops_per_sec']:>10,.0f} ops/s  "
+              f"search p99 {search.get('p99', 0) * 1e6:7.2f}us  "
+              f"peak {r['peak_rss_bytes'] / 2**20:6.1f} MiB  migrations {r['migrations']}"
+              f"{'  TIMED OUT' if r['timed_out'] else ''}", file=sys.stderr)
+    for r in suite.get('regressions', []):
+        print(f"REGRESSION {r['config']} {r['shape']} {r['size']}: {r['change']:+.0%} "
+              f"({r['baseline_ops_per_sec']:,.0f} -> {r['ops_per_sec']:,.0f} ops/s)", file=sys.stderr)
+    sys.exit(1 if suite.get('regressions') else 0)
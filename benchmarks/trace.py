@@ -0,0 +1,103 @@
+"""
+Trace recording overhead and replay against several configurations.
+
+Runs the same mixed workload on a SelfTuningMap with and without
+start_trace() to measure the recording cost per operation, then replays
+the recorded trace against the self-tuning map and fixed structures,
+reporting throughput, search latency percentiles and the switches made.
+
+    python -m benchmarks.trace [n_ops] [trace_path]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+from src.core import SelfTuningMap, AVL, BPlusTree, HashMap
+from src.core.trace import TraceRecorder, SEARCH, replay_trace
+
+
+def _workload(stm, n_ops, seed=0):
+    """Sorted loading, then random reads and writes, then ordered scans"""
+    rng = random.Random(seed)
+    third = n_ops // 3
+    for key in range(third):
+        stm.insert(key, key)
+    for _ in range(third):
+        if rng.random() < 0.8:
+            stm.search(rng.randrange(2 * third))
+        else:
+            stm.insert(rng.randrange(2 * third), 0)
+    for _ in range(n_ops - 2 * third):
+        if rng.random() < 0.01:
+            stm.range(rng.randrange(third), None, 20)
+        else:
+            stm.search(rng.randrange(third))
+
+
+def measure_recording(n_ops=200000, path=None, repeats=5):
+    """
+    Returns ({'plain_ns', 'traced_ns', 'overhead_ns', 'record_ns'}, records):
+    best time per op of `repeats` alternating runs without and with
+    tracing, the cost of one TraceRecorder.record() call on its own, and
+    the trace size.
+    """
+    plain = traced = float('inf')
+    records = 0
+    for _ in range(repeats):
+        stm = SelfTuningMap(instrumentation='sampled')
+        start = time.perf_counter_ns()
+        _workload(stm, n_ops)
+        plain = min(plain, (time.perf_counter_ns() - start) / n_ops)
+        
+        stm = SelfTuningMap(instrumentation='sampled')
+        stm.start_trace(path)
+        start = time.perf_counter_ns()
+        _workload(stm, n_ops)
+        records = stm.stop_trace()
+        traced = min(traced, (time.perf_counter_ns() - start) / n_ops)
+    
+    recorder = TraceRecorder(os.devnull)
+    record_ns = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter_ns()
+        for key in range(n_ops):
+            recorder.record(SEARCH, key)
+        record_ns = min(record_ns, (time.perf_counter_ns() - start) / n_ops)
+    recorder.close()
+    return {'plain_ns': plain, 'traced_ns': traced, 'overhead_ns': traced - plain,
+            'record_ns': record_ns}, records
+
+
+CONFIGS = {
+    'SelfTuningMap': lambda: SelfTuningMap(instrumentation='sampled'),
+    'AVL': AVL,
+    'BPlusTree': BPlusTree,
+    'HashMap': HashMap,
+}
+
+
+if __name__ == "__main__":
+    n_ops = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    path = sys.argv[2] if len(sys.argv) > 2 else None
+    if path is None:
+        fd, path = tempfile.mkstemp(suffix='.trace')
+        os.close(fd)
+    
+    try:
+        overhead, records = measure_recording(n_ops, path)
+        print(f"{n_ops} ops: {overhead['plain_ns']:.0f}ns per op untraced, "
+              f"{overhead['traced_ns']:.0f}ns traced (+{overhead['overhead_ns']:.0f}ns); "
+              f"record() alone {overhead['record_ns']:.0f}ns")
+        print(f"trace: {records} records, {os.path.getsize(path) / records:.0f} bytes each")
+        for name, factory in CONFIGS.items():
+            r = replay_trace(path, factory())
+            search = r['latency']['search']
+            switches = ', '.join(f"{s['from']}->{s['to']}@{s['at_operation']}" for s in r['switches'])
+            print(f"  {name:<14} {r['ops_per_sec']:>10,.0f} ops/s  search p50 {search['p50'] * 1e6:5.2f}us "
+                  f"p99 {search['p99'] * 1e6:6.2f}us  switches: {switches or 'none'}")
+    finally:
+        if len(sys.argv) <= 2:
+            os.remove(path)
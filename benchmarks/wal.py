@@ -0,0 +1,86 @@
+"""
+Per-write cost of the write-ahead log, and recovery time.
+
+Inserts n random int keys into a SelfTuningMap without a log and then with
+a WriteAheadLog under several group-commit / fsync settings, reporting
+microseconds per write and the overhead over the unlogged map. The last
+log is then recovered (snapshot plus replay) and checked against the
+written keys.
+
+    python -m benchmarks.wal [n_writes] [directory]
+"""
+
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+from src.core import SelfTuningMap, WriteAheadLog
+
+
+# (label, group_size, fsync_every)
+CONFIGS = (
+    ('fsync every write', 1, 1),
+    ('group 64, fsync each group', 64, 1),
+    ('group 256, fsync every 16 groups', 256, 16),
+    ('group 256, no fsync', 256, 0),
+)
+
+
+def _write(stm, keys):
+    start = time.perf_counter()
+    for key in keys:
+        stm.insert(key, key)
+    if stm.wal is not None:
+        stm.wal.commit()
+    return time.perf_counter() - start
+
+
+def measure_wal(n_writes=100000, directory=None, compact_bytes=64 << 20, seed=0):
+    """
+    Returns {'baseline_us', 'configs': {label: {'us_per_write', 'overhead_us',
+    'fsyncs', 'bytes'}}, 'recovery_seconds'}.
+    """
+    keys = random.Random(seed).sample(range(n_writes * 10), n_writes)
+    baseline = _write(SelfTuningMap(instrumentation='sampled'), keys) / n_writes
+    
+    root = directory or tempfile.mkdtemp(prefix='wal-bench-')
+    results = {}
+    try:
+        for i, (label, group_size, fsync_every) in enumerate(CONFIGS):
+            path = f"{root}/{i}"
+            wal = WriteAheadLog(path, group_size=group_size, fsync_every=fsync_every,
+                                compact_bytes=compact_bytes)
+            per_write = _write(SelfTuningMap(instrumentation='sampled', wal=wal), keys) / n_writes
+            wal.close()
+            stats = wal.get_stats()
+            results[label] = {
+                'us_per_write': per_write * 1e6,
+                'overhead_us': (per_write - baseline) * 1e6,
+                'fsyncs': stats['fsyncs'],
+                'bytes': stats['bytes_written']
+            }
+        
+        start = time.perf_counter()
+        recovered = SelfTuningMap.recover(WriteAheadLog(path))
+        recovery_seconds = time.perf_counter() - start
+        assert recovered.active_ds.size == n_writes
+        assert all(recovered.search(key) == key for key in keys[:1000])
+    finally:
+        if directory is None:
+            shutil.rmtree(root)
+    
+    return {'baseline_us': baseline * 1e6, 'configs': results, 'recovery_seconds': recovery_seconds}
+
+
+if __name__ == "__main__":
+    n_writes = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    directory = sys.argv[2] if len(sys.argv) > 2 else None
+    
+    result = measure_wal(n_writes, directory)
+    print(f"{n_writes} inserts, no log: {result['baseline_us']:.2f}us per write")
+    for label, r in result['configs'].items():
+        print(f"  {label:<34} {r['us_per_write']:8.2f}us per write (+{r['overhead_us']:.2f}us), "
+              f"{r['fsyncs']} fsyncs, {r['bytes'] / n_writes:.1f} bytes per record")
+    print(f"  recovery (replay of the last log): {result['recovery_seconds']:.2f}s")
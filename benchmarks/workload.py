@@ -0,0 +1,48 @@
+"""
+Generation rate and memory of the streaming workloads.
+
+Generates n operations of each key distribution with WorkloadStream, once
+as raw chunks and once as operation tuples, reporting operations per
+second and the peak memory allocated while generating (tracemalloc),
+which should not grow with n.
+
+    python -m benchmarks.workload [n_ops] [chunk_size]
+"""
+
+import sys
+import time
+import tracemalloc
+
+from src.utils.workload_generator import WorkloadStream, DISTRIBUTIONS
+
+MIX = {'insert': 0.3, 'search': 0.6, 'delete': 0.05, 'range': 0.05}
+
+
+def measure_stream(distribution, n_ops=10000000, chunk_size=1 << 16, tuples=False):
+    """Returns {'ops_per_sec', 'peak_bytes'} for one pass over the stream"""
+    stream = WorkloadStream(n_ops, distribution, mix=MIX, chunk_size=chunk_size)
+    tracemalloc.start()
+    start = time.perf_counter()
+    if tuples:
+        for _ in stream:
+            pass
+    else:
+        for _ in stream.chunks():
+            pass
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {'ops_per_sec': n_ops / seconds, 'peak_bytes': peak}
+
+
+if __name__ == "__main__":
+    n_ops = int(sys.argv[1]) if len(sys.argv) > 1 else 10000000
+    chunk_size = int(sys.argv[2]) if len(sys.argv) > 2 else 1 << 16
+    
+    print(f"{n_ops} ops, chunks of {chunk_size}")
+    for distribution in DISTRIBUTIONS:
+        chunks = measure_stream(distribution, n_ops, chunk_size)
+        tuples = measure_stream(distribution, n_ops // 10, chunk_size, tuples=True)
+        print(f"  {distribution:<11} chunks {chunks['ops_per_sec']:>12,.0f} ops/s "
+              f"(peak {chunks['peak_bytes'] / 2**20:.1f} MiB)   "
+              f"tuples {tuples['ops_per_sec']:>11,.0f} ops/s (peak {tuples['peak_bytes'] / 2**20:.1f} MiB)")
@@ -1,9 +1,24 @@
 # src/core/__init__.py
 from .bst import BST
 from .avl import AVL
+from .bplustree import BPlusTree
 from .hashmap import HashMap
+from .sorted_array_map import SortedArrayMap
 from .stats_collector import StatsCollector
 from .decision_engine import DecisionEngine
 from .self_tuning_map import SelfTuningMap
+from .concurrent_map import ConcurrentSelfTuningMap, RWLock
+from .sharded_map import ShardedSelfTuningMap
+from .async_map import AsyncSelfTuningMap
+from .wal import WriteAheadLog
+from .cost_model import CostModel
+from .latency_histogram import LatencyHistogram
+from .shadow import ShadowEvaluator
+from .read_cache import ReadCache, LRUCache, ClockCache
+from .bloom_filter import CountingBloomFilter
+from .change_detector import ChangeDetector, PageHinkley
 
-__all__ = ['BST', 'AVL', 'HashMap', 'StatsCollector', 'DecisionEngine', 'SelfTuningMap']
+__all__ = ['BST', 'AVL', 'BPlusTree', 'HashMap', 'SortedArrayMap', 'StatsCollector', 'DecisionEngine',
+           'SelfTuningMap', 'ConcurrentSelfTuningMap', 'RWLock', 'ShardedSelfTuningMap',
+           'AsyncSelfTuningMap', 'WriteAheadLog', 'CostModel', 'LatencyHistogram', 'ShadowEvaluator',
+           'ReadCache', 'LRUCache', 'ClockCache', 'CountingBloomFilter', 'ChangeDetector', 'PageHinkley']
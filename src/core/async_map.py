@@ -0,0 +1,157 @@
+from .self_tuning_map import SelfTuningMap
+import asyncio
+
+
+class _CooperativeMap(SelfTuningMap):
+    """
+    SelfTuningMap whose switches never do unbounded work inside a call:
+    migration targets grow as they fill instead of being presized, and
+    with no per-operation migration steps the owner frees `retired`
+    structures itself, a chunk at a time.
+    """
+    
+    def _prepare_target(self, target_ds, n):
+        pass  # A HashMap's own growth is incremental; presizing 1M slots is not
+
+
+class AsyncSelfTuningMap:
+    """
+    asyncio front-end for SelfTuningMap.
+    Migrations and batches run in chunks of at most `chunk_budget` seconds,
+    yielding to the event loop between them. Not thread-safe: use one loop.
+    """
+    
+    def __init__(self, initial_structure='BST', chunk_budget=0.002, chunk_items=4096,
+                 batch_chunk=1024, instrumentation='full', sample_rate=1024,
+                 decision_engine=None, shadow=None, cache=None, bloom=None):
+        self.map = _CooperativeMap(initial_structure=initial_structure,
+                                   migration_mode='incremental', migration_batch_size=0,
+                                   instrumentation=instrumentation, sample_rate=sample_rate,
+                                   decision_engine=decision_engine, shadow=shadow, cache=cache,
+                                   bloom=bloom)
+        self.chunk_budget = chunk_budget
+        self.chunk_items = chunk_items
+        self.batch_chunk = batch_chunk
+        self._task = None
+    
+    def _schedule_background(self):
+        """Start the background task if a migration or a release is pending"""
+        if self._task is None and (self.map.migration is not None or self.map.retired):
+            self._task = asyncio.get_running_loop().create_task(self._background())
+    
+    async def _background(self):
+        stm = self.map
+        try:
+            while True:
+                if stm.migration is not None:
+                    stm.migration_step(self.chunk_items, self.chunk_budget)
+                elif stm.retired:
+                    stm.release_step(self.chunk_items, self.chunk_budget)
+                else:
+                    return
+                await asyncio.sleep(0)
+        finally:
+            self._task = None
+    
+    async def insert(self, key, value):
+        """Insert operation with monitoring"""
+        result = self.map.insert(key, value)
+        self._schedule_background()
+        return result
+    
+    async def search(self, key):
+        """Search operation with monitoring"""
+        result = self.map.search(key)
+        self._schedule_background()
+        return result
+    
+    async def delete(self, key):
+        """Delete operation with monitoring"""
+        result = self.map.delete(key)
+        self._schedule_background()
+        return result
+    
+    async def _batched(self, method, batch):
+        batch = list(batch)
+        step = self.batch_chunk
+        results = []
+        for i in range(0, len(batch), step):
+            if i:
+                await asyncio.sleep(0)
+            results.extend(method(batch[i:i + step]))
+            self._schedule_background()
+        return results
+    
+    async def insert_many(self, items):
+        """Insert a batch of (key, value) pairs; returns bools aligned with `items`"""
+        return await self._batched(self.map.insert_many, items)
+    
+    async def search_many(self, keys):
+        """Look up a batch of keys; returns values (None if missing) aligned with `keys`"""
+        return await self._batched(self.map.search_many, keys)
+    
+    async def delete_many(self, keys):
+        """Delete a batch of keys; returns bools aligned with `keys`"""
+        return await self._batched(self.map.delete_many, keys)
+    
+    async def range(self, lo=None, hi=None, limit=None):
+        """Items with lo <= key < hi in key order (None = unbounded), at most `limit`"""
+        result = self.map.range(lo, hi, limit)
+        self._schedule_background()
+        return result
+    
+    async def floor(self, key):
+        """Item with the largest key <= `key`, or None"""
+        result = self.map.floor(key)
+        self._schedule_background()
+        return result
+    
+    async def ceiling(self, key):
+        """Item with the smallest key >= `key`, or None"""
+        result = self.map.ceiling(key)
+        self._schedule_background()
+        return result
+    
+    async def min(self):
+        """Item with the smallest key, or None"""
+        result = self.map.min()
+        self._schedule_background()
+        return result
+    
+    async def max(self):
+        """Item with the largest key, or None"""
+        result = self.map.max()
+        self._schedule_background()
+        return result
+    
+    async def items_from(self, key=None, chunk_size=64):
+        """Async-iterate items in key order from the first key >= `key`, yielding between chunks"""
+        for i, item in enumerate(self.map.items_from(key, chunk_size), 1):
+            yield item
+            if i % chunk_size == 0:
+                self._schedule_background()
+                await asyncio.sleep(0)
+    
+    async def force_switch(self, target_structure):
+        """Manually force a switch; the copy runs in the background task"""
+        self.map.force_switch(target_structure)
+        self._schedule_background()
+    
+    async def wait_for_migration(self):
+        """Wait until the migration in flight and the release after it are done"""
+        while self._task is not None:
+            await asyncio.shield(self._task)
+    
+    def get_current_structure(self):
+        """Get name of current structure"""
+        return self.map.get_current_structure()
+    
+    def get_memory_stats(self):
+        """Structures alive now and items held across them, including ones still being freed"""
+        return self.map.get_memory_stats()
+    
+    def get_stats(self):
+        """Get all statistics"""
+        stats = self.map.get_stats()
+        stats['chunk_budget'] = self.chunk_budget
+        return stats
@@ -1,4 +1,9 @@
+from bisect import bisect_left
+
+
 class AVLNode:
+    __slots__ = ('key', 'value', 'left', 'right', 'height')
+    
     def __init__(self, key, value):
         self.key = key
         self.value = value
@@ -10,130 +15,248 @@ class AVLNode:
 class AVL:
     """AVL Tree implementation with automatic balancing"""
     
+    BATCH_REBUILD_FRACTION = 0.25  # Batches this share of the tree are merged and rebuilt
+    
     def __init__(self):
         self.root = None
         self.size = 0
         self.rotation_count = 0
+        self._releasing = []  # Detached nodes release_step() hasn't freed yet
     
     def insert(self, key, value):
         """Insert with automatic rebalancing"""
-        self.root, inserted = self._insert_recursive(self.root, key, value)
-        if inserted:
-            self.size += 1
-        return inserted
-    
-    def _insert_recursive(self, node, key, value):
-        # Standard BST insert
-        if node is None:
-            return AVLNode(key, value), True
+        # Standard BST insert, remembering the path for rebalancing
+        path = []
+        node = self.root
+        while node is not None:
+            if key == node.key:
+                node.value = value
+                return False
+            path.append(node)
+            node = node.left if key < node.key else node.right
         
-        if key == node.key:
-            node.value = value
-            return node, False
-        elif key < node.key:
-            node.left, inserted = self._insert_recursive(node.left, key, value)
+        new_node = AVLNode(key, value)
+        if not path:
+            self.root = new_node
+        elif key < path[-1].key:
+            path[-1].left = new_node
         else:
-            node.right, inserted = self._insert_recursive(node.right, key, value)
-        
-        if not inserted:
-            return node, False
-        
-        # Update height
-        node.height = 1 + max(self._get_height(node.left), self._get_height(node.right))
+            path[-1].right = new_node
+        self.size += 1
         
-        # Rebalance
-        balance = self._get_balance(node)
-        
-        # Left-Left
-        if balance > 1 and key < node.left.key:
-            self.rotation_count += 1
-            return self._rotate_right(node), True
-        
-        # Right-Right
-        if balance < -1 and key > node.right.key:
-            self.rotation_count += 1
-            return self._rotate_left(node), True
-        
-        # Left-Right
-        if balance > 1 and key > node.left.key:
-            self.rotation_count += 2
-            node.left = self._rotate_left(node.left)
-            return self._rotate_right(node), True
-        
-        # Right-Left
-        if balance < -1 and key < node.right.key:
-            self.rotation_count += 2
-            node.right = self._rotate_right(node.right)
-            return self._rotate_left(node), True
+        for i in range(len(path) - 1, -1, -1):
+            node = path[i]
+            
+            # Update height; once a subtree's height is unchanged, nothing above can change
+            old_height = node.height
+            node.height = 1 + max(self._get_height(node.left), self._get_height(node.right))
+            if node.height == old_height:
+                break
+            
+            # Rebalance
+            balance = self._get_balance(node)
+            subtree = node
+            
+            # Left-Left
+            if balance > 1 and key < node.left.key:
+                self.rotation_count += 1
+                subtree = self._rotate_right(node)
+            
+            # Right-Right
+            elif balance < -1 and key > node.right.key:
+                self.rotation_count += 1
+                subtree = self._rotate_left(node)
+            
+            # Left-Right
+            elif balance > 1 and key > node.left.key:
+                self.rotation_count += 2
+                node.left = self._rotate_left(node.left)
+                subtree = self._rotate_right(node)
+            
+            # Right-Left
+            elif balance < -1 and key < node.right.key:
+                self.rotation_count += 2
+                node.right = self._rotate_right(node.right)
+                subtree = self._rotate_left(node)
+            
+            if subtree is not node:
+                # A rotation restores the subtree's height from before the insert
+                self._replace_child(path[i - 1] if i > 0 else None, node, subtree)
+                break
         
-        return node, True
+        return True
     
     def search(self, key):
         """Search for key"""
-        node = self._search_recursive(self.root, key)
+        node = self.root
+        while node is not None and node.key != key:
+            node = node.left if key < node.key else node.right
         return node.value if node else None
     
-    def _search_recursive(self, node, key):
-        if node is None or node.key == key:
-            return node
-        if key < node.key:
-            return self._search_recursive(node.left, key)
-        return self._search_recursive(node.right, key)
-    
     def delete(self, key):
         """Delete with rebalancing"""
-        self.root, deleted = self._delete_recursive(self.root, key)
-        if deleted:
-            self.size -= 1
-        return deleted
-    
-    def _delete_recursive(self, node, key):
+        path = []
+        node = self.root
+        while node is not None and node.key != key:
+            path.append(node)
+            node = node.left if key < node.key else node.right
+        
         if node is None:
-            return None, False
+            return False
         
-        if key < node.key:
-            node.left, deleted = self._delete_recursive(node.left, key)
-        elif key > node.key:
-            node.right, deleted = self._delete_recursive(node.right, key)
-        else:
-            # Node found
-            if node.left is None:
-                return node.right, True
-            elif node.right is None:
-                return node.left, True
-            
-            min_node = self._find_min(node.right)
+        if node.left is not None and node.right is not None:
+            # Two children: move in the min of the right subtree, then unlink it
+            path.append(node)
+            min_node = node.right
+            while min_node.left:
+                path.append(min_node)
+                min_node = min_node.left
             node.key = min_node.key
             node.value = min_node.value
-            node.right, _ = self._delete_recursive(node.right, min_node.key)
-            deleted = True
-        
-        if not deleted or node is None:
-            return node, deleted
-        
-        # Update height and rebalance
-        node.height = 1 + max(self._get_height(node.left), 
-                              self._get_height(node.right))
-        balance = self._get_balance(node)
-        
-        # Rebalance after deletion
-        if balance > 1 and self._get_balance(node.left) >= 0:
-            return self._rotate_right(node), True
-        if balance > 1 and self._get_balance(node.left) < 0:
-            node.left = self._rotate_left(node.left)
-            return self._rotate_right(node), True
-        if balance < -1 and self._get_balance(node.right) <= 0:
-            return self._rotate_left(node), True
-        if balance < -1 and self._get_balance(node.right) > 0:
-            node.right = self._rotate_right(node.right)
-            return self._rotate_left(node), True
-        
-        return node, deleted
-    
-    def _find_min(self, node):
-        while node.left:
-            node = node.left
-        return node
+            self._replace_child(path[-1], min_node, min_node.right)
+        else:
+            child = node.left if node.left is not None else node.right
+            self._replace_child(path[-1] if path else None, node, child)
+        self.size -= 1
+        
+        # Update heights and rebalance from the removed node's parent upwards
+        for i in range(len(path) - 1, -1, -1):
+            node = path[i]
+            node.height = 1 + max(self._get_height(node.left),
+                                  self._get_height(node.right))
+            balance = self._get_balance(node)
+            subtree = node
+            
+            if balance > 1 and self._get_balance(node.left) >= 0:
+                subtree = self._rotate_right(node)
+            elif balance > 1 and self._get_balance(node.left) < 0:
+                node.left = self._rotate_left(node.left)
+                subtree = self._rotate_right(node)
+            elif balance < -1 and self._get_balance(node.right) <= 0:
+                subtree = self._rotate_left(node)
+            elif balance < -1 and self._get_balance(node.right) > 0:
+                node.right = self._rotate_right(node.right)
+                subtree = self._rotate_left(node)
+            
+            if subtree is not node:
+                self._replace_child(path[i - 1] if i > 0 else None, node, subtree)
+        
+        return True
+    
+    def insert_many(self, items):
+        """
+        Insert a batch of (key, value) pairs. Returns bools aligned with
+        `items` (True = new key), as insert() would.
+        The batch is sorted; a batch that is a large share of the tree is
+        merged with the in-order items and rebuilt balanced in O(n + k),
+        a smaller one is inserted in key order.
+        """
+        items = list(items)
+        results = [False] * len(items)
+        order = sorted(range(len(items)), key=lambda i: items[i][0])
+        
+        if len(items) < self.size * self.BATCH_REBUILD_FRACTION:
+            for i in order:
+                results[i] = self.insert(*items[i])
+            return results
+        
+        merged = []
+        existing = self.get_all_items()
+        p = 0
+        for i in order:
+            key = items[i][0]
+            if merged and merged[-1][0] == key:
+                merged[-1] = items[i]  # Repeated in the batch: last value wins
+                continue
+            while p < len(existing) and existing[p][0] < key:
+                merged.append(existing[p])
+                p += 1
+            if p < len(existing) and existing[p][0] == key:
+                p += 1
+            else:
+                results[i] = True
+            merged.append(items[i])
+        merged.extend(existing[p:])
+        self._rebuild(merged)
+        return results
+    
+    def search_many(self, keys):
+        """
+        Look up a batch of keys with one descent over the sorted batch.
+        Returns values (None if missing) aligned with `keys`.
+        """
+        keys = list(keys)
+        results = [None] * len(keys)
+        if self.root is None or not keys:
+            return results
+        
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+        sorted_keys = [keys[i] for i in order]
+        
+        stack = [(self.root, 0, len(sorted_keys))]
+        while stack:
+            node, lo, hi = stack.pop()
+            if hi - lo == 1:
+                # A lone key finishes with a plain search from here
+                key = sorted_keys[lo]
+                while node is not None and node.key != key:
+                    node = node.left if key < node.key else node.right
+                if node is not None:
+                    results[order[lo]] = node.value
+                continue
+            
+            i = bisect_left(sorted_keys, node.key, lo, hi)
+            j = i
+            while j < hi and sorted_keys[j] == node.key:
+                results[order[j]] = node.value
+                j += 1
+            if lo < i and node.left is not None:
+                stack.append((node.left, lo, i))
+            if j < hi and node.right is not None:
+                stack.append((node.right, j, hi))
+        return results
+    
+    def delete_many(self, keys):
+        """
+        Delete a batch of keys. Returns bools aligned with `keys` (True =
+        deleted; a repeated key only counts once). Large batches are merged
+        against the in-order items and the tree rebuilt balanced.
+        """
+        keys = list(keys)
+        results = [False] * len(keys)
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+        
+        if len(keys) < self.size * self.BATCH_REBUILD_FRACTION:
+            for i in order:
+                results[i] = self.delete(keys[i])
+            return results
+        
+        kept = []
+        p = 0
+        for item in self.get_all_items():
+            while p < len(order) and keys[order[p]] < item[0]:
+                p += 1
+            if p < len(order) and keys[order[p]] == item[0]:
+                results[order[p]] = True
+            else:
+                kept.append(item)
+        self._rebuild(kept)
+        return results
+    
+    def _rebuild(self, sorted_items):
+        """bulk_load, keeping the rotation count"""
+        rotations = self.rotation_count
+        self.bulk_load(sorted_items)
+        self.rotation_count = rotations
+    
+    def _replace_child(self, parent, old, new):
+        """Point whichever link held `old` (or the root) at `new`"""
+        if parent is None:
+            self.root = new
+        elif parent.left is old:
+            parent.left = new
+        else:
+            parent.right = new
     
     def _get_height(self, node):
         return node.height if node else 0
@@ -165,16 +288,181 @@ class AVL:
     def get_all_items(self):
         """Get all key-value pairs"""
         items = []
-        self._inorder_traversal(self.root, items)
+        stack = []
+        node = self.root
+        while stack or node:
+            while node:
+                stack.append(node)
+                node = node.left
+            node = stack.pop()
+            items.append((node.key, node.value))
+            node = node.right
         return items
     
-    def _inorder_traversal(self, node, items):
-        if node:
-            self._inorder_traversal(node.left, items)
+    def range(self, lo=None, hi=None, limit=None):
+        """
+        Items with lo <= key < hi in key order (None = unbounded), at most
+        `limit` of them. Only the matching subtrees are walked: O(log n + k).
+        """
+        items = []
+        stack = []
+        node = self.root
+        while node:
+            if lo is None or node.key >= lo:
+                stack.append(node)
+                node = node.left
+            else:
+                node = node.right
+        
+        while stack and (limit is None or len(items) < limit):
+            node = stack.pop()
+            if hi is not None and node.key >= hi:
+                break
+            items.append((node.key, node.value))
+            node = node.right
+            while node:
+                stack.append(node)
+                node = node.left
+        return items
+    
+    def floor(self, key):
+        """Item with the largest key <= `key`, or None"""
+        best = None
+        node = self.root
+        while node:
+            if node.key == key:
+                return node.key, node.value
+            if node.key < key:
+                best = node
+                node = node.right
+            else:
+                node = node.left
+        return (best.key, best.value) if best else None
+    
+    def ceiling(self, key):
+        """Item with the smallest key >= `key`, or None"""
+        best = None
+        node = self.root
+        while node:
+            if node.key == key:
+                return node.key, node.value
+            if node.key > key:
+                best = node
+                node = node.left
+            else:
+                node = node.right
+        return (best.key, best.value) if best else None
+    
+    def min(self):
+        """Item with the smallest key, or None"""
+        node = self.root
+        if node is None:
+            return None
+        while node.left:
+            node = node.left
+        return node.key, node.value
+    
+    def max(self):
+        """Item with the largest key, or None"""
+        node = self.root
+        if node is None:
+            return None
+        while node.right:
+            node = node.right
+        return node.key, node.value
+    
+    def items_from(self, key=None, chunk_size=64):
+        """
+        Lazily yield items in key order from the first key >= `key` (None =
+        from the smallest). Items are fetched `chunk_size` at a time through
+        scan(), so writes between items are tolerated: nothing is skipped,
+        though an item deleted after its chunk was fetched is still yielded.
+        """
+        item = self.min() if key is None else self.ceiling(key)
+        if item is None:
+            return
+        yield item
+        
+        cursor = item[0]
+        while cursor is not None:
+            items, cursor = self.scan(cursor, chunk_size)
+            yield from items
+    
+    @classmethod
+    def from_sorted(cls, sorted_items):
+        """Build a balanced tree from (key, value) pairs sorted by unique key"""
+        tree = cls()
+        tree.bulk_load(sorted_items)
+        return tree
+    
+    def bulk_load(self, sorted_items):
+        """Replace contents with a perfectly balanced tree in O(n)"""
+        self.clear()
+        items = list(sorted_items)
+        self.root = self._build_balanced(items, 0, len(items) - 1)
+        self.size = len(items)
+    
+    def _build_balanced(self, items, lo, hi):
+        if lo > hi:
+            return None
+        mid = (lo + hi) // 2
+        node = AVLNode(*items[mid])
+        node.left = self._build_balanced(items, lo, mid - 1)
+        node.right = self._build_balanced(items, mid + 1, hi)
+        node.height = 1 + max(self._get_height(node.left), self._get_height(node.right))
+        return node
+    
+    def scan(self, cursor=None, count=100):
+        """
+        Resumable in-order scan.
+        Returns up to `count` items with keys after `cursor` (None = from the
+        start) and the cursor to resume from, or None once the scan is done.
+        Safe to interleave with inserts and deletes.
+        """
+        items = []
+        stack = []
+        node = self.root
+        while node:
+            if cursor is None or node.key > cursor:
+                stack.append(node)
+                node = node.left
+            else:
+                node = node.right
+        
+        while stack and len(items) < count:
+            node = stack.pop()
             items.append((node.key, node.value))
-            self._inorder_traversal(node.right, items)
+            node = node.right
+            while node:
+                stack.append(node)
+                node = node.left
+        
+        next_cursor = items[-1][0] if stack else None
+        return items, next_cursor
     
     def clear(self):
         self.root = None
         self.size = 0
-        self.rotation_count = 0
\ No newline at end of file
+        self.rotation_count = 0
+    
+    def release_step(self, max_items=4096):
+        """
+        clear() in bounded steps: the first call empties the tree, and each
+        call frees at most `max_items` of the detached nodes, so dropping a
+        big tree never frees millions of nodes at once. Returns True once
+        they are all freed.
+        """
+        if self.root is not None:
+            self._releasing.append(self.root)
+            self.clear()
+        stack = self._releasing
+        for _ in range(max_items):
+            if not stack:
+                return True
+            node = stack.pop()
+            if node.left is not None:
+                stack.append(node.left)
+            if node.right is not None:
+                stack.append(node.right)
+            node.left = node.right = None
+        return not stack
\ No newline at end of file
@@ -0,0 +1,180 @@
+from math import exp
+
+try:
+    import numpy as np
+except ImportError:  # Optional: without NumPy rebuilds hash key by key
+    np = None
+
+_FIBONACCI = 0x9E3779B97F4A7C15  # 2**64 / golden ratio, odd
+
+
+class CountingBloomFilter:
+    """
+    Counting Bloom filter over a map's keys: might_contain() False means
+    the key is definitely absent. 8-bit counters let remove() undo add().
+    Grows either at once (rebuild()) or in steps through a `pending` copy
+    (start_resize(), refill(), finish_resize()).
+    """
+    
+    GROWTH = 2  # rebuild() sizes for this many times the current keys
+    MIN_CAPACITY = 1024
+    
+    def __init__(self, capacity=MIN_CAPACITY, counters_per_key=10, hashes=4):
+        if counters_per_key < 1 or hashes < 1:
+            raise ValueError("counters_per_key and hashes must be at least 1")
+        self.counters_per_key = counters_per_key
+        self.hashes = hashes
+        self._resize(capacity)
+        self.pending = None  # Larger copy being refilled by a stepped resize, or None
+        
+        # Metrics
+        self.negatives = 0  # Searches answered "absent" without touching the structure
+        self.false_positives = 0  # Passed the filter, then not found
+        self.rebuilds = 0
+    
+    def _resize(self, capacity):
+        self.capacity = max(capacity, 1)
+        self.slots = 1 << (self.capacity * self.counters_per_key - 1).bit_length()
+        self._mask = self.slots - 1
+        self.counters = bytearray(self.slots)
+        self.count = 0  # Keys added and not removed
+    
+    def _positions(self, key):
+        h = hash(key) * _FIBONACCI
+        mask = self._mask
+        i = (h >> 32) & mask
+        step = h | 1
+        positions = [i]
+        for _ in range(self.hashes - 1):
+            i = (i + step) & mask
+            positions.append(i)
+        return positions
+    
+    def add(self, key):
+        self._count_in((key,))
+        self.count += 1
+        if self.pending is not None:
+            self.pending.add(key)
+    
+    def _count_in(self, keys):
+        # _positions() inlined: this runs for every key written or refilled
+        counters = self.counters
+        mask = self._mask
+        rounds = range(self.hashes - 1)
+        for key in keys:
+            h = hash(key) * _FIBONACCI
+            i = (h >> 32) & mask
+            step = h | 1
+            if counters[i] < 255:
+                counters[i] += 1
+            for _ in rounds:
+                i = (i + step) & mask
+                if counters[i] < 255:
+                    counters[i] += 1
+    
+    def remove(self, key):
+        """
+        Undo add(key); only call it for a key that was added. A pending copy
+        may not hold the key yet, so it keeps the count: a false positive at
+        worst.
+        """
+        counters = self.counters
+        for i in self._positions(key):
+            if 0 < counters[i] < 255:
+                counters[i] -= 1
+        self.count -= 1
+    
+    def might_contain(self, key):
+        # _positions() inlined, stopping at the first empty slot
+        h = hash(key) * _FIBONACCI
+        counters = self.counters
+        mask = self._mask
+        i = (h >> 32) & mask
+        if not counters[i]:
+            return False
+        step = h | 1
+        for _ in range(self.hashes - 1):
+            i = (i + step) & mask
+            if not counters[i]:
+                return False
+        return True
+    
+    def needs_resize(self, n_keys):
+        """Whether `n_keys` keys would overfill the filter or leave it mostly empty"""
+        return n_keys > self.capacity or self.GROWTH * n_keys * 4 < self.capacity
+    
+    def start_resize(self, n_keys):
+        """Open an empty pending copy sized for GROWTH times `n_keys` (dropping any earlier one)"""
+        self.pending = CountingBloomFilter(max(self.MIN_CAPACITY, self.GROWTH * n_keys),
+                                           self.counters_per_key, self.hashes)
+    
+    def refill(self, keys):
+        """Add already-stored keys to the pending copy"""
+        keys = list(keys)
+        self.pending._count_in(keys)
+        self.pending.count += len(keys)
+    
+    def finish_resize(self, n_keys):
+        """Swap in the pending copy once every stored key has been refilled into it"""
+        pending = self.pending
+        self.pending = None
+        self.capacity = pending.capacity
+        self.slots = pending.slots
+        self._mask = pending._mask
+        self.counters = pending.counters
+        self.count = n_keys
+        self.rebuilds += 1
+    
+    def rebuild(self, keys):
+        """Reset, sized for GROWTH times len(keys), and add every key"""
+        keys = list(keys)
+        self.pending = None
+        self._resize(max(self.MIN_CAPACITY, self.GROWTH * len(keys)))
+        self.rebuilds += 1
+        if not keys:
+            return
+        if np is None:
+            for key in keys:
+                self.add(key)
+            return
+        
+        # The same positions as _positions(): masking keeps only low bits, which
+        # uint64 arithmetic (wrapping) and Python ints (two's complement) agree on
+        h = np.fromiter(map(hash, keys), dtype=np.int64, count=len(keys)).view(np.uint64)
+        h = h * np.uint64(_FIBONACCI)
+        mask = np.uint64(self._mask)
+        i = (h >> np.uint64(32)) & mask
+        step = h | np.uint64(1)
+        positions = [i]
+        for _ in range(self.hashes - 1):
+            i = (i + step) & mask
+            positions.append(i)
+        counts = np.bincount(np.concatenate(positions).astype(np.int64), minlength=self.slots)
+        self.counters = bytearray(np.minimum(counts, 255).astype(np.uint8).tobytes())
+        self.count = len(keys)
+    
+    def clear(self):
+        self.pending = None
+        self.counters = bytearray(self.slots)
+        self.count = 0
+    
+    def estimated_fp_rate(self):
+        """Expected false-positive rate at the current key count"""
+        return (1 - exp(-self.hashes * self.count / self.slots)) ** self.hashes
+    
+    def get_stats(self):
+        absent = self.negatives + self.false_positives
+        return {
+            'capacity': self.capacity,
+            'keys': self.count,
+            'slots': self.slots,
+            'hashes': self.hashes,
+            'bytes': len(self.counters),
+            'estimated_fp_rate': self.estimated_fp_rate(),
+            # Share of searches for absent keys that got past the filter
+            'observed_fp_rate': self.false_positives / absent if absent else 0.0,
+            'misses_saved': self.negatives,
+            'false_positives': self.false_positives,
+            'rebuilds': self.rebuilds,
+            'resizing': self.pending is not None
+        }
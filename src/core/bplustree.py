@@ -0,0 +1,481 @@
+from bisect import bisect_left, bisect_right
+
+
+class BPlusLeaf:
+    __slots__ = ('keys', 'values', 'next')
+    
+    def __init__(self, keys=None, values=None):
+        self.keys = keys if keys is not None else []
+        self.values = values if values is not None else []
+        self.next = None
+
+
+class BPlusInternal:
+    __slots__ = ('keys', 'children')
+    
+    def __init__(self, keys, children):
+        self.keys = keys  # keys[i] separates children[i] (keys < it) from children[i + 1]
+        self.children = children
+
+
+class BPlusTree:
+    """
+    B+ Tree: up to `fanout` sorted keys per node, searched with bisect, so a
+    lookup walks log_fanout(n) nodes instead of log2(n). Items live only in
+    the leaves, which are linked left to right for sequential scans.
+    """
+    
+    DEFAULT_FANOUT = 64
+    BATCH_REBUILD_FRACTION = 0.25  # Batches this share of the tree are merged and rebuilt
+    
+    def __init__(self, fanout=DEFAULT_FANOUT):
+        if fanout < 4:
+            raise ValueError(f"fanout must be at least 4, got {fanout}")
+        self.fanout = fanout
+        self.min_keys = fanout // 2  # Fewest keys in a non-root leaf
+        self.min_children = (fanout + 1) // 2  # Fewest children of a non-root internal node
+        self.root = BPlusLeaf()
+        self.size = 0
+        self.split_count = 0
+        self.merge_count = 0
+        self._releasing = []  # Detached nodes release_step() hasn't freed yet
+    
+    def _find_leaf(self, key):
+        node = self.root
+        while type(node) is BPlusInternal:
+            node = node.children[bisect_right(node.keys, key)]
+        return node
+    
+    def insert(self, key, value):
+        """Insert key-value pair, splitting full nodes on the way back up"""
+        path = []
+        node = self.root
+        while type(node) is BPlusInternal:
+            i = bisect_right(node.keys, key)
+            path.append((node, i))
+            node = node.children[i]
+        
+        keys = node.keys
+        i = bisect_left(keys, key)
+        if i < len(keys) and keys[i] == key:
+            node.values[i] = value
+            return False
+        keys.insert(i, key)
+        node.values.insert(i, value)
+        self.size += 1
+        
+        if len(keys) > self.fanout:
+            self._split(node, path)
+        return True
+    
+    def _split(self, node, path):
+        """Split an overfull node in half and push the separator up"""
+        while True:
+            self.split_count += 1
+            mid = len(node.keys) // 2
+            if type(node) is BPlusLeaf:
+                right = BPlusLeaf(node.keys[mid:], node.values[mid:])
+                del node.keys[mid:]
+                del node.values[mid:]
+                right.next = node.next
+                node.next = right
+                separator = right.keys[0]
+            else:
+                separator = node.keys[mid]
+                right = BPlusInternal(node.keys[mid + 1:], node.children[mid + 1:])
+                del node.keys[mid:]
+                del node.children[mid + 1:]
+            
+            if not path:
+                self.root = BPlusInternal([separator], [node, right])
+                return
+            parent, i = path.pop()
+            parent.keys.insert(i, separator)
+            parent.children.insert(i + 1, right)
+            if len(parent.children) <= self.fanout:
+                return
+            node = parent
+    
+    def search(self, key):
+        """Search for key"""
+        node = self.root
+        while type(node) is BPlusInternal:
+            node = node.children[bisect_right(node.keys, key)]
+        keys = node.keys
+        i = bisect_left(keys, key)
+        if i < len(keys) and keys[i] == key:
+            return node.values[i]
+        return None
+    
+    def delete(self, key):
+        """Delete key, borrowing from or merging with a sibling on underflow"""
+        path = []
+        node = self.root
+        while type(node) is BPlusInternal:
+            i = bisect_right(node.keys, key)
+            path.append((node, i))
+            node = node.children[i]
+        
+        keys = node.keys
+        i = bisect_left(keys, key)
+        if i == len(keys) or keys[i] != key:
+            return False
+        del keys[i]
+        del node.values[i]
+        self.size -= 1
+        
+        if path and len(keys) < self.min_keys:
+            self._rebalance(node, path)
+        return True
+    
+    def _rebalance(self, node, path):
+        """Fix an underfull node, walking up while merges leave parents underfull"""
+        while path:
+            parent, i = path.pop()
+            left = parent.children[i - 1] if i > 0 else None
+            right = parent.children[i + 1] if i + 1 < len(parent.children) else None
+            
+            if type(node) is BPlusLeaf:
+                if left is not None and len(left.keys) > self.min_keys:
+                    node.keys.insert(0, left.keys.pop())
+                    node.values.insert(0, left.values.pop())
+                    parent.keys[i - 1] = node.keys[0]
+                    return
+                if right is not None and len(right.keys) > self.min_keys:
+                    node.keys.append(right.keys.pop(0))
+                    node.values.append(right.values.pop(0))
+                    parent.keys[i] = right.keys[0]
+                    return
+                if left is None:
+                    left, node, i = node, right, i + 1
+                left.keys.extend(node.keys)
+                left.values.extend(node.values)
+                left.next = node.next
+            else:
+                if left is not None and len(left.children) > self.min_children:
+                    node.keys.insert(0, parent.keys[i - 1])
+                    node.children.insert(0, left.children.pop())
+                    parent.keys[i - 1] = left.keys.pop()
+                    return
+                if right is not None and len(right.children) > self.min_children:
+                    node.keys.append(parent.keys[i])
+                    node.children.append(right.children.pop(0))
+                    parent.keys[i] = right.keys.pop(0)
+                    return
+                if left is None:
+                    left, node, i = node, right, i + 1
+                left.keys.append(parent.keys[i - 1])
+                left.keys.extend(node.keys)
+                left.children.extend(node.children)
+            
+            # `node` was merged into `left`: drop it from the parent
+            self.merge_count += 1
+            del parent.keys[i - 1]
+            del parent.children[i]
+            
+            if parent is self.root:
+                if len(parent.children) == 1:
+                    self.root = parent.children[0]
+                return
+            if len(parent.children) >= self.min_children:
+                return
+            node = parent
+    
+    def insert_many(self, items):
+        """
+        Insert a batch of (key, value) pairs. Returns bools aligned with
+        `items` (True = new key), as insert() would.
+        A batch that is a large share of the tree is merged with the leaf
+        items and bulk loaded in O(n + k); a smaller one is inserted in key
+        order.
+        """
+        items = list(items)
+        results = [False] * len(items)
+        order = sorted(range(len(items)), key=lambda i: items[i][0])
+        
+        if len(items) < self.size * self.BATCH_REBUILD_FRACTION:
+            for i in order:
+                results[i] = self.insert(*items[i])
+            return results
+        
+        merged = []
+        existing = self.get_all_items()
+        p = 0
+        for i in order:
+            key = items[i][0]
+            if merged and merged[-1][0] == key:
+                merged[-1] = items[i]  # Repeated in the batch: last value wins
+                continue
+            while p < len(existing) and existing[p][0] < key:
+                merged.append(existing[p])
+                p += 1
+            if p < len(existing) and existing[p][0] == key:
+                p += 1
+            else:
+                results[i] = True
+            merged.append(items[i])
+        merged.extend(existing[p:])
+        self._rebuild(merged)
+        return results
+    
+    def search_many(self, keys):
+        """
+        Look up a batch of keys in key order, staying on the current leaf
+        while the keys fall inside it. Returns values (None if missing)
+        aligned with `keys`.
+        """
+        keys = list(keys)
+        results = [None] * len(keys)
+        leaf = None
+        for i in sorted(range(len(keys)), key=keys.__getitem__):
+            key = keys[i]
+            if leaf is None or not leaf.keys or key > leaf.keys[-1]:
+                leaf = self._find_leaf(key)
+            j = bisect_left(leaf.keys, key)
+            if j < len(leaf.keys) and leaf.keys[j] == key:
+                results[i] = leaf.values[j]
+        return results
+    
+    def delete_many(self, keys):
+        """
+        Delete a batch of keys. Returns bools aligned with `keys` (True =
+        deleted; a repeated key only counts once). Large batches are merged
+        against the leaf items and the tree bulk loaded.
+        """
+        keys = list(keys)
+        results = [False] * len(keys)
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+        
+        if len(keys) < self.size * self.BATCH_REBUILD_FRACTION:
+            for i in order:
+                results[i] = self.delete(keys[i])
+            return results
+        
+        kept = []
+        p = 0
+        for item in self.get_all_items():
+            while p < len(order) and keys[order[p]] < item[0]:
+                p += 1
+            if p < len(order) and keys[order[p]] == item[0]:
+                results[order[p]] = True
+            else:
+                kept.append(item)
+        self._rebuild(kept)
+        return results
+    
+    def _rebuild(self, sorted_items):
+        """bulk_load, keeping the split and merge counts"""
+        splits, merges = self.split_count, self.merge_count
+        self.bulk_load(sorted_items)
+        self.split_count, self.merge_count = splits, merges
+    
+    def _first_leaf(self):
+        node = self.root
+        while type(node) is BPlusInternal:
+            node = node.children[0]
+        return node
+    
+    def get_height(self):
+        """Levels from the root to the leaves"""
+        height = 1
+        node = self.root
+        while type(node) is BPlusInternal:
+            node = node.children[0]
+            height += 1
+        return height
+    
+    def get_all_items(self):
+        """Get all key-value pairs (one pass along the leaf chain)"""
+        items = []
+        leaf = self._first_leaf()
+        while leaf is not None:
+            items.extend(zip(leaf.keys, leaf.values))
+            leaf = leaf.next
+        return items
+    
+    def range(self, lo=None, hi=None, limit=None):
+        """
+        Items with lo <= key < hi in key order (None = unbounded), at most
+        `limit` of them: one descent, then slices of the linked leaves.
+        """
+        if lo is None:
+            leaf = self._first_leaf()
+            i = 0
+        else:
+            leaf = self._find_leaf(lo)
+            i = bisect_left(leaf.keys, lo)
+        
+        items = []
+        while leaf is not None and (limit is None or len(items) < limit):
+            keys = leaf.keys
+            end = len(keys) if hi is None else bisect_left(keys, hi, i)
+            if limit is not None:
+                end = min(end, i + limit - len(items))
+            items.extend(zip(keys[i:end], leaf.values[i:end]))
+            if end < len(keys):
+                break
+            leaf = leaf.next
+            i = 0
+        return items
+    
+    def floor(self, key):
+        """Item with the largest key <= `key`, or None"""
+        node = self.root
+        left = None  # Nearest subtree holding only smaller keys
+        while type(node) is BPlusInternal:
+            i = bisect_right(node.keys, key)
+            if i > 0:
+                left = node.children[i - 1]
+            node = node.children[i]
+        
+        i = bisect_right(node.keys, key)
+        if i > 0:
+            return node.keys[i - 1], node.values[i - 1]
+        if left is None:
+            return None
+        while type(left) is BPlusInternal:
+            left = left.children[-1]
+        return left.keys[-1], left.values[-1]
+    
+    def ceiling(self, key):
+        """Item with the smallest key >= `key`, or None"""
+        leaf = self._find_leaf(key)
+        i = bisect_left(leaf.keys, key)
+        if i == len(leaf.keys):
+            leaf = leaf.next
+            i = 0
+            if leaf is None:
+                return None
+        return leaf.keys[i], leaf.values[i]
+    
+    def min(self):
+        """Item with the smallest key, or None"""
+        leaf = self._first_leaf()
+        return (leaf.keys[0], leaf.values[0]) if leaf.keys else None
+    
+    def max(self):
+        """Item with the largest key, or None"""
+        node = self.root
+        while type(node) is BPlusInternal:
+            node = node.children[-1]
+        return (node.keys[-1], node.values[-1]) if node.keys else None
+    
+    def items_from(self, key=None, chunk_size=64):
+        """
+        Lazily yield items in key order from the first key >= `key` (None =
+        from the smallest). Items are fetched `chunk_size` at a time through
+        scan(), so writes between items are tolerated: nothing is skipped,
+        though an item deleted after its chunk was fetched is still yielded.
+        """
+        item = self.min() if key is None else self.ceiling(key)
+        if item is None:
+            return
+        yield item
+        
+        cursor = item[0]
+        while cursor is not None:
+            items, cursor = self.scan(cursor, chunk_size)
+            yield from items
+    
+    @classmethod
+    def from_sorted(cls, sorted_items, fanout=DEFAULT_FANOUT):
+        """Build a tree from (key, value) pairs sorted by unique key"""
+        tree = cls(fanout)
+        tree.bulk_load(sorted_items)
+        return tree
+    
+    def _chunks(self, n):
+        """Split n entries into the fewest runs of at most `fanout`, sized evenly"""
+        count = -(-n // self.fanout)
+        base, extra = divmod(n, count)
+        bounds = [0]
+        for j in range(count):
+            bounds.append(bounds[-1] + base + (1 if j < extra else 0))
+        return bounds
+    
+    def bulk_load(self, sorted_items):
+        """Replace contents with leaves filled bottom-up in O(n)"""
+        self.clear()
+        items = list(sorted_items)
+        if not items:
+            return
+        
+        keys = [key for key, _ in items]
+        values = [value for _, value in items]
+        bounds = self._chunks(len(items))
+        level = []
+        for lo, hi in zip(bounds, bounds[1:]):
+            leaf = BPlusLeaf(keys[lo:hi], values[lo:hi])
+            if level:
+                level[-1].next = leaf
+            level.append(leaf)
+        lows = [leaf.keys[0] for leaf in level]
+        
+        while len(level) > 1:
+            bounds = self._chunks(len(level))
+            parents = []
+            parent_lows = []
+            for lo, hi in zip(bounds, bounds[1:]):
+                parents.append(BPlusInternal(lows[lo + 1:hi], level[lo:hi]))
+                parent_lows.append(lows[lo])
+            level = parents
+            lows = parent_lows
+        
+        self.root = level[0]
+        self.size = len(items)
+    
+    def scan(self, cursor=None, count=100):
+        """
+        Resumable in-order scan along the leaf chain.
+        Returns up to `count` items with keys after `cursor` (None = from the
+        start) and the cursor to resume from, or None once the scan is done.
+        Safe to interleave with inserts and deletes.
+        """
+        if cursor is None:
+            leaf = self._first_leaf()
+            i = 0
+        else:
+            leaf = self._find_leaf(cursor)
+            i = bisect_right(leaf.keys, cursor)
+        
+        items = []
+        while leaf is not None:
+            end = min(len(leaf.keys), i + count - len(items))
+            items.extend(zip(leaf.keys[i:end], leaf.values[i:end]))
+            if end < len(leaf.keys):
+                return items, items[-1][0]
+            leaf = leaf.next
+            i = 0
+            if len(items) == count:
+                break
+        
+        more = leaf is not None and leaf.keys
+        next_cursor = items[-1][0] if more and items else None
+        return items, next_cursor
+    
+    def clear(self):
+        self.root = BPlusLeaf()
+        self.size = 0
+        self.split_count = 0
+        self.merge_count = 0
+    
+    def release_step(self, max_items=4096):
+        """
+        clear() in bounded steps: the first call empties the tree, and each
+        call frees detached nodes holding at most about `max_items` items.
+        Returns True once they are all freed.
+        """
+        if self.size:
+            self._releasing.append(self.root)
+            self.clear()
+        stack = self._releasing
+        while stack and max_items > 0:
+            node = stack.pop()
+            if type(node) is BPlusInternal:
+                stack.extend(node.children)
+                node.children = []
+                max_items -= 1
+            else:
+                node.next = None
+                max_items -= len(node.keys)
+        return not stack
\ No newline at end of file
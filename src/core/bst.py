@@ -1,4 +1,9 @@
+from bisect import bisect_left
+
+
 class BSTNode:
+    __slots__ = ('key', 'value', 'left', 'right')
+    
     def __init__(self, key, value):
         self.key = key
         self.value = value
@@ -9,107 +14,429 @@ class BSTNode:
 class BST:
     """Binary Search Tree implementation"""
     
+    BATCH_REBUILD_FRACTION = 0.25  # delete_many rebuilds once a batch is this share of the tree
+    
     def __init__(self):
         self.root = None
         self.size = 0
+        self._max_depth = 0  # Deepest insert since the tree was last rebuilt
+        self._releasing = []  # Detached nodes release_step() hasn't freed yet
     
     def insert(self, key, value):
         """Insert key-value pair"""
         if self.root is None:
             self.root = BSTNode(key, value)
             self.size += 1
+            self._max_depth = max(self._max_depth, 1)
             return True
         
-        return self._insert_recursive(self.root, key, value)
-    
-    def _insert_recursive(self, node, key, value):
-        if key == node.key:
-            node.value = value  # Update existing
-            return False
-        elif key < node.key:
-            if node.left is None:
-                node.left = BSTNode(key, value)
-                self.size += 1
-                return True
-            return self._insert_recursive(node.left, key, value)
-        else:
-            if node.right is None:
-                node.right = BSTNode(key, value)
-                self.size += 1
-                return True
-            return self._insert_recursive(node.right, key, value)
+        node = self.root
+        depth = 2  # Of a child of `node`
+        while True:
+            if key == node.key:
+                node.value = value  # Update existing
+                return False
+            elif key < node.key:
+                if node.left is None:
+                    node.left = BSTNode(key, value)
+                    break
+                node = node.left
+            else:
+                if node.right is None:
+                    node.right = BSTNode(key, value)
+                    break
+                node = node.right
+            depth += 1
+        self.size += 1
+        if depth > self._max_depth:
+            self._max_depth = depth
+        return True
     
     def search(self, key):
         """Search for key, return value or None"""
-        node = self._search_recursive(self.root, key)
+        node = self._find(key)
         return node.value if node else None
     
-    def _search_recursive(self, node, key):
-        if node is None or node.key == key:
-            return node
-        if key < node.key:
-            return self._search_recursive(node.left, key)
-        return self._search_recursive(node.right, key)
+    def _find(self, key):
+        node = self.root
+        while node is not None and node.key != key:
+            node = node.left if key < node.key else node.right
+        return node
     
     def delete(self, key):
         """Delete key from tree"""
-        self.root, deleted = self._delete_recursive(self.root, key)
-        if deleted:
-            self.size -= 1
-        return deleted
-    
-    def _delete_recursive(self, node, key):
+        parent = None
+        node = self.root
+        while node is not None and node.key != key:
+            parent = node
+            node = node.left if key < node.key else node.right
+        
         if node is None:
-            return None, False
+            return False
         
-        if key < node.key:
-            node.left, deleted = self._delete_recursive(node.left, key)
-            return node, deleted
-        elif key > node.key:
-            node.right, deleted = self._delete_recursive(node.right, key)
-            return node, deleted
-        else:
-            # Node to delete found
-            if node.left is None:
-                return node.right, True
-            elif node.right is None:
-                return node.left, True
-            
-            # Two children: find min in right subtree
-            min_node = self._find_min(node.right)
+        if node.left is not None and node.right is not None:
+            # Two children: move in the min of the right subtree, then unlink it
+            min_parent = node
+            min_node = node.right
+            while min_node.left:
+                min_parent = min_node
+                min_node = min_node.left
             node.key = min_node.key
             node.value = min_node.value
-            node.right, _ = self._delete_recursive(node.right, min_node.key)
-            return node, True
+            if min_parent is node:
+                min_parent.right = min_node.right
+            else:
+                min_parent.left = min_node.right
+        else:
+            child = node.left if node.left is not None else node.right
+            if parent is None:
+                self.root = child
+            elif parent.left is node:
+                parent.left = child
+            else:
+                parent.right = child
+        
+        self.size -= 1
+        return True
     
-    def _find_min(self, node):
-        while node.left:
-            node = node.left
-        return node
+    def insert_many(self, items):
+        """
+        Insert a batch of (key, value) pairs.
+        The batch is sorted and pushed down the tree in one descent: each
+        node splits the sorted run between its subtrees, and a run reaching
+        an empty link becomes a balanced subtree there. Returns a list of
+        bools aligned with `items` (True = new key), as insert() would.
+        """
+        items = list(items)
+        results = [False] * len(items)
+        if not items:
+            return results
+        
+        # Sorted unique keys; a key repeated in the batch keeps its last value
+        # and counts as new only at its first position
+        order = sorted(range(len(items)), key=lambda i: items[i][0])
+        batch = []
+        first = []
+        for i in order:
+            if batch and batch[-1][0] == items[i][0]:
+                batch[-1] = items[i]
+            else:
+                batch.append(items[i])
+                first.append(i)
+        keys = [key for key, _ in batch]
+        
+        if self.root is None:
+            self.root = self._build_balanced(batch, 0, len(batch) - 1)
+            self.size += len(batch)
+            self._max_depth = max(self._max_depth, len(batch).bit_length())
+            for i in first:
+                results[i] = True
+            return results
+        
+        stack = [(self.root, 0, len(keys), 1)]
+        while stack:
+            node, lo, hi, depth = stack.pop()
+            if hi - lo == 1:
+                # A lone key finishes with a plain insert from here
+                key, value = batch[lo]
+                while True:
+                    if key == node.key:
+                        node.value = value
+                        break
+                    child = node.left if key < node.key else node.right
+                    if child is None:
+                        if key < node.key:
+                            node.left = BSTNode(key, value)
+                        else:
+                            node.right = BSTNode(key, value)
+                        self._mark_new(results, first, lo, hi, depth)
+                        break
+                    node = child
+                    depth += 1
+                continue
+            
+            i = bisect_left(keys, node.key, lo, hi)
+            j = i
+            if j < hi and keys[j] == node.key:
+                node.value = batch[j][1]  # Update existing
+                j += 1
+            
+            if lo < i:
+                if node.left is None:
+                    node.left = self._build_balanced(batch, lo, i - 1)
+                    self._mark_new(results, first, lo, i, depth)
+                else:
+                    stack.append((node.left, lo, i, depth + 1))
+            if j < hi:
+                if node.right is None:
+                    node.right = self._build_balanced(batch, j, hi - 1)
+                    self._mark_new(results, first, j, hi, depth)
+                else:
+                    stack.append((node.right, j, hi, depth + 1))
+        return results
+    
+    def _mark_new(self, results, first, lo, hi, parent_depth):
+        """Count batch[lo:hi] as new, built as a balanced subtree under a node at `parent_depth`"""
+        for p in range(lo, hi):
+            results[first[p]] = True
+        self.size += hi - lo
+        self._max_depth = max(self._max_depth, parent_depth + (hi - lo).bit_length())
+    
+    def search_many(self, keys):
+        """
+        Look up a batch of keys with one descent over the sorted batch.
+        Returns values (None if missing) aligned with `keys`.
+        """
+        keys = list(keys)
+        results = [None] * len(keys)
+        if self.root is None or not keys:
+            return results
+        
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+        sorted_keys = [keys[i] for i in order]
+        
+        stack = [(self.root, 0, len(sorted_keys))]
+        while stack:
+            node, lo, hi = stack.pop()
+            if hi - lo == 1:
+                # A lone key finishes with a plain search from here
+                key = sorted_keys[lo]
+                while node is not None and node.key != key:
+                    node = node.left if key < node.key else node.right
+                if node is not None:
+                    results[order[lo]] = node.value
+                continue
+            
+            i = bisect_left(sorted_keys, node.key, lo, hi)
+            j = i
+            while j < hi and sorted_keys[j] == node.key:
+                results[order[j]] = node.value
+                j += 1
+            if lo < i and node.left is not None:
+                stack.append((node.left, lo, i))
+            if j < hi and node.right is not None:
+                stack.append((node.right, j, hi))
+        return results
+    
+    def delete_many(self, keys):
+        """
+        Delete a batch of keys. Returns bools aligned with `keys` (True =
+        deleted; a repeated key only counts once). Large batches are merged
+        against the in-order items and the tree rebuilt balanced.
+        """
+        keys = list(keys)
+        results = [False] * len(keys)
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+        
+        if len(keys) < self.size * self.BATCH_REBUILD_FRACTION:
+            for i in order:
+                results[i] = self.delete(keys[i])
+            return results
+        
+        kept = []
+        p = 0
+        for item in self.get_all_items():
+            while p < len(order) and keys[order[p]] < item[0]:
+                p += 1
+            if p < len(order) and keys[order[p]] == item[0]:
+                results[order[p]] = True
+            else:
+                kept.append(item)
+        self.bulk_load(kept)
+        return results
     
     def get_height(self):
-        """Calculate tree height"""
-        return self._height_recursive(self.root)
+        """Calculate tree height (level-order walk)"""
+        height = 0
+        level = [self.root] if self.root else []
+        while level:
+            height += 1
+            level = [child for node in level for child in (node.left, node.right) if child]
+        return height
     
-    def _height_recursive(self, node):
-        if node is None:
-            return 0
-        return 1 + max(self._height_recursive(node.left), 
-                       self._height_recursive(node.right))
+    def get_height_bound(self):
+        """Upper bound on the height in O(1): the deepest insert since the last rebuild"""
+        return self._max_depth
     
     def get_all_items(self):
         """Get all key-value pairs (in-order)"""
         items = []
-        self._inorder_traversal(self.root, items)
+        stack = []
+        node = self.root
+        while stack or node:
+            while node:
+                stack.append(node)
+                node = node.left
+            node = stack.pop()
+            items.append((node.key, node.value))
+            node = node.right
         return items
     
-    def _inorder_traversal(self, node, items):
-        if node:
-            self._inorder_traversal(node.left, items)
+    def range(self, lo=None, hi=None, limit=None):
+        """
+        Items with lo <= key < hi in key order (None = unbounded), at most
+        `limit` of them. Only the matching subtrees are walked: O(log n + k).
+        """
+        items = []
+        stack = []
+        node = self.root
+        while node:
+            if lo is None or node.key >= lo:
+                stack.append(node)
+                node = node.left
+            else:
+                node = node.right
+        
+        while stack and (limit is None or len(items) < limit):
+            node = stack.pop()
+            if hi is not None and node.key >= hi:
+                break
+            items.append((node.key, node.value))
+            node = node.right
+            while node:
+                stack.append(node)
+                node = node.left
+        return items
+    
+    def floor(self, key):
+        """Item with the largest key <= `key`, or None"""
+        best = None
+        node = self.root
+        while node:
+            if node.key == key:
+                return node.key, node.value
+            if node.key < key:
+                best = node
+                node = node.right
+            else:
+                node = node.left
+        return (best.key, best.value) if best else None
+    
+    def ceiling(self, key):
+        """Item with the smallest key >= `key`, or None"""
+        best = None
+        node = self.root
+        while node:
+            if node.key == key:
+                return node.key, node.value
+            if node.key > key:
+                best = node
+                node = node.left
+            else:
+                node = node.right
+        return (best.key, best.value) if best else None
+    
+    def min(self):
+        """Item with the smallest key, or None"""
+        node = self.root
+        if node is None:
+            return None
+        while node.left:
+            node = node.left
+        return node.key, node.value
+    
+    def max(self):
+        """Item with the largest key, or None"""
+        node = self.root
+        if node is None:
+            return None
+        while node.right:
+            node = node.right
+        return node.key, node.value
+    
+    def items_from(self, key=None, chunk_size=64):
+        """
+        Lazily yield items in key order from the first key >= `key` (None =
+        from the smallest). Items are fetched `chunk_size` at a time through
+        scan(), so writes between items are tolerated: nothing is skipped,
+        though an item deleted after its chunk was fetched is still yielded.
+        """
+        item = self.min() if key is None else self.ceiling(key)
+        if item is None:
+            return
+        yield item
+        
+        cursor = item[0]
+        while cursor is not None:
+            items, cursor = self.scan(cursor, chunk_size)
+            yield from items
+    
+    @classmethod
+    def from_sorted(cls, sorted_items):
+        """Build a balanced tree from (key, value) pairs sorted by unique key"""
+        tree = cls()
+        tree.bulk_load(sorted_items)
+        return tree
+    
+    def bulk_load(self, sorted_items):
+        """Replace contents with a perfectly balanced tree in O(n)"""
+        self.clear()
+        items = list(sorted_items)
+        self.root = self._build_balanced(items, 0, len(items) - 1)
+        self.size = len(items)
+        self._max_depth = len(items).bit_length()
+    
+    def _build_balanced(self, items, lo, hi):
+        if lo > hi:
+            return None
+        mid = (lo + hi) // 2
+        node = BSTNode(*items[mid])
+        node.left = self._build_balanced(items, lo, mid - 1)
+        node.right = self._build_balanced(items, mid + 1, hi)
+        return node
+    
+    def scan(self, cursor=None, count=100):
+        """
+        Resumable in-order scan.
+        Returns up to `count` items with keys after `cursor` (None = from the
+        start) and the cursor to resume from, or None once the scan is done.
+        Safe to interleave with inserts and deletes.
+        """
+        items = []
+        stack = []
+        node = self.root
+        while node:
+            if cursor is None or node.key > cursor:
+                stack.append(node)
+                node = node.left
+            else:
+                node = node.right
+        
+        while stack and len(items) < count:
+            node = stack.pop()
             items.append((node.key, node.value))
-            self._inorder_traversal(node.right, items)
+            node = node.right
+            while node:
+                stack.append(node)
+                node = node.left
+        
+        next_cursor = items[-1][0] if stack else None
+        return items, next_cursor
     
     def clear(self):
         """Clear all nodes"""
         self.root = None
-        self.size = 0
\ No newline at end of file
+        self.size = 0
+        self._max_depth = 0
+    
+    def release_step(self, max_items=4096):
+        """
+        clear() in bounded steps: the first call empties the tree, and each
+        call frees at most `max_items` of the detached nodes, so dropping a
+        big tree never frees millions of nodes at once. Returns True once
+        they are all freed.
+        """
+        if self.root is not None:
+            self._releasing.append(self.root)
+            self.clear()
+        stack = self._releasing
+        for _ in range(max_items):
+            if not stack:
+                return True
+            node = stack.pop()
+            if node.left is not None:
+                stack.append(node.left)
+            if node.right is not None:
+                stack.append(node.right)
+            node.left = node.right = None
+        return not stack
\ No newline at end of file
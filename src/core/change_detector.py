@@ -0,0 +1,157 @@
+class PageHinkley:
+    """
+    Two-sided Page-Hinkley test for a shift in the mean of a stream.
+    Tracks the cumulative deviation from the running mean (less a drift
+    allowance `delta`); a climb or fall of more than `threshold` from its
+    extreme signals a change, and the sample where that extreme was set
+    estimates where the change began (`change_at`). O(1) time and memory
+    per sample.
+    """
+    
+    def __init__(self, delta=0.1, threshold=10.0, min_samples=30):
+        self.delta = delta
+        self.threshold = threshold
+        self.min_samples = min_samples
+        self.change_at = None
+        self.reset()
+    
+    def update(self, x, t=None):
+        """
+        Add a sample taken at time `t` (the caller's clock, default the
+        sample count); returns True if the mean has shifted.
+        """
+        self.n += 1
+        if t is None:
+            t = self.n
+        self.mean += (x - self.mean) / self.n
+        
+        self.up += x - self.mean - self.delta
+        if self.up < self.up_min:
+            self.up_min = self.up
+            self.up_min_at = t
+        self.down += x - self.mean + self.delta
+        if self.down > self.down_max:
+            self.down_max = self.down
+            self.down_max_at = t
+        
+        if self.n < self.min_samples:
+            return False
+        if self.up - self.up_min > self.threshold:
+            self.change_at = self.up_min_at
+            return True
+        if self.down_max - self.down > self.threshold:
+            self.change_at = self.down_max_at
+            return True
+        return False
+    
+    def reset(self):
+        self.n = 0
+        self.mean = 0.0
+        self.up = 0.0
+        self.up_min = 0.0
+        self.up_min_at = 0
+        self.down = 0.0
+        self.down_max = 0.0
+        self.down_max_at = 0
+
+
+class ChangeDetector:
+    """
+    Watches the workload for phase changes in per-window aggregates rather
+    than single operations: the caller passes StatsCollector.get_totals()
+    at a fixed cadence, and a signal is sampled once enough operations
+    have gone by since its last sample. One Page-Hinkley test per signal:
+    - 'search': share of searches among the operations since the last sample
+    - 'order': share of consecutive insert pairs that ascend (key order)
+    - 'latency': mean log2 of the operation times in ns, tested separately
+      per operation type (the op mix is already the 'search' signal), so a
+      2x slowdown is a shift of 1 whatever the baseline; clipped so single
+      outliers can't trigger it on their own
+    A test that fires restarts, so the new phase becomes its baseline;
+    `change_age` is how many recorded operations ago the change began.
+    """
+    
+    SEARCH_OPS = 16  # Fewest operations per op-mix sample
+    ORDER_PAIRS = 16  # Fewest insert pairs per key-order sample
+    LATENCY_OPS = 8  # Fewest timed operations of a type per latency sample
+    LATENCY_CLIP = 2.0  # Max distance of one latency sample from the mean (log2 units)
+    
+    def __init__(self, delta=0.1, threshold=1.0, latency_delta=0.5, latency_threshold=5.0,
+                 min_samples=4):
+        self.tests = {
+            'search': PageHinkley(delta, threshold, min_samples),
+            'order': PageHinkley(delta, threshold, min_samples)
+        }
+        self.latency_tests = {
+            op: PageHinkley(latency_delta, latency_threshold, min_samples)
+            for op in ('insert', 'search', 'delete', 'range')
+        }
+        self.base = None  # Totals as of each signal's last sample
+        self.samples = 0
+        self.changes = 0
+        self.change_age = 0
+    
+    def observe(self, totals):
+        """
+        Feed running totals (StatsCollector.get_totals()). The first call,
+        and the first after the totals were reset, only sets the baseline.
+        Returns the name of the signal that changed, or None.
+        """
+        base = self.base
+        if base is None or totals['ops'] < base['ops']:
+            self.base = {**totals, 'latency': dict(totals['latency'])}
+            return None
+        self.samples += 1
+        t = totals['recorded_ops']
+        fired = []
+        
+        ops = totals['ops'] - base['ops']
+        if ops >= self.SEARCH_OPS:
+            searches = totals['searches'] - base['searches']
+            base['ops'] = totals['ops']
+            base['searches'] = totals['searches']
+            search = self.tests['search']
+            if search.update(searches / ops, t):
+                fired.append(('search', search))
+        
+        pairs = totals['pairs'] - base['pairs']
+        if pairs >= self.ORDER_PAIRS:
+            ascending = totals['ascending_pairs'] - base['ascending_pairs']
+            base['pairs'] = totals['pairs']
+            base['ascending_pairs'] = totals['ascending_pairs']
+            order = self.tests['order']
+            if order.update(ascending / pairs, t):
+                fired.append(('order', order))
+        
+        timed = base['latency']
+        for op, (count, log_sum) in totals['latency'].items():
+            last_count, last_sum = timed.get(op, (0, 0.0))
+            if count - last_count < self.LATENCY_OPS:
+                continue
+            timed[op] = (count, log_sum)
+            latency = self.latency_tests[op]
+            x = (log_sum - last_sum) / (count - last_count)
+            if latency.n:
+                x = min(max(x, latency.mean - self.LATENCY_CLIP), latency.mean + self.LATENCY_CLIP)
+            if latency.update(x, t):
+                fired.append(('latency', latency))
+        
+        if not fired:
+            return None
+        self.changes += 1
+        self.change_age = max(t - test.change_at for _, test in fired)
+        for _, test in fired:
+            test.reset()
+        return fired[0][0]
+    
+    def reset_latency(self):
+        """Restart the latency tests (a new structure has a new baseline)"""
+        for test in self.latency_tests.values():
+            test.reset()
+    
+    def reset(self):
+        """Restart every test"""
+        for test in self.tests.values():
+            test.reset()
+        self.reset_latency()
+        self.base = None
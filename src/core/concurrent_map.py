@@ -0,0 +1,383 @@
+from contextlib import contextmanager
+import copy
+from .self_tuning_map import SelfTuningMap
+from . import trace as tr
+import threading
+import time
+
+
+class RWLock:
+    """
+    Readers-writer lock: any number of readers or one writer.
+    Writer-preferring, so a steady stream of readers can't starve writes;
+    the flip side is that it isn't reentrant: a thread holding the read
+    lock must not take it again while a writer may be waiting.
+    """
+    
+    def __init__(self):
+        self._mutex = threading.Lock()
+        self._cond = threading.Condition(self._mutex)
+        self._readers = 0
+        self._writer = False
+        self._waiting_writers = 0
+    
+    # Plain acquire/release rather than `with`: this is on every operation
+    
+    def acquire_read(self):
+        self._mutex.acquire()
+        while self._writer or self._waiting_writers:
+            self._cond.wait()
+        self._readers += 1
+        self._mutex.release()
+    
+    def release_read(self):
+        self._mutex.acquire()
+        self._readers -= 1
+        if not self._readers and self._waiting_writers:
+            self._cond.notify_all()
+        self._mutex.release()
+    
+    def acquire_write(self):
+        self._mutex.acquire()
+        self._waiting_writers += 1
+        while self._writer or self._readers:
+            self._cond.wait()
+        self._waiting_writers -= 1
+        self._writer = True
+        self._mutex.release()
+    
+    def release_write(self):
+        self._mutex.acquire()
+        self._writer = False
+        self._cond.notify_all()
+        self._mutex.release()
+    
+    @contextmanager
+    def read(self):
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+    
+    @contextmanager
+    def write(self):
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
+
+
+class _ThreadState:
+    """Sampling countdowns of one thread, per op type"""
+    __slots__ = ('insert_left', 'insert_gap', 'search_left', 'search_gap',
+                 'delete_left', 'delete_gap', 'range_left', 'range_gap')
+    
+    def __init__(self):
+        self.insert_left = self.insert_gap = 1
+        self.search_left = self.search_gap = 1
+        self.delete_left = self.delete_gap = 1
+        self.range_left = self.range_gap = 1
+
+
+def _per_thread(name):
+    return property(lambda self: getattr(self._thread_state(), name),
+                    lambda self, value: setattr(self._thread_state(), name, value))
+
+
+class ConcurrentSelfTuningMap(SelfTuningMap):
+    """
+    Thread-safe SelfTuningMap with reader-writer semantics.
+    Reads share the lock, writes take it exclusively; switches are copied by
+    a background thread and swapped in under the exclusive lock, and the
+    same thread frees the old structure afterwards, holding no lock. Lock
+    order: structure, then stats, then migration.
+    """
+    
+    # Per thread, so only recorded ops take the stats lock; another thread's
+    # unsampled counts reach get_stats() at its next recorded op, hence a
+    # lower default sample_rate than SelfTuningMap's, whose tax the locks dwarf
+    _insert_left = _per_thread('insert_left')
+    _insert_gap = _per_thread('insert_gap')
+    _search_left = _per_thread('search_left')
+    _search_gap = _per_thread('search_gap')
+    _delete_left = _per_thread('delete_left')
+    _delete_gap = _per_thread('delete_gap')
+    _range_left = _per_thread('range_left')
+    _range_gap = _per_thread('range_gap')
+    
+    def __init__(self, initial_structure='BST', migration_batch_size=256,
+                 migration_time_budget=None, instrumentation='sampled', sample_rate=16,
+                 decision_engine=None, shadow=None, wal=None, cache=None, bloom=None):
+        self._local = threading.local()
+        self._lock = RWLock()
+        self._stats_lock = threading.Lock()
+        self._cache_lock = threading.Lock()
+        self._migration_lock = threading.Lock()
+        self._release_lock = threading.Lock()  # One thread frees retired structures at a time
+        self._route_lock = threading.Lock()
+        self._builder = None
+        super().__init__(initial_structure, 'incremental', migration_batch_size,
+                         migration_time_budget, instrumentation, sample_rate,
+                         decision_engine, shadow, wal, cache, bloom)
+    
+    def _thread_state(self):
+        try:
+            return self._local.state
+        except AttributeError:
+            state = self._local.state = _ThreadState()
+            return state
+    
+    def _route_ops(self):
+        # The builder thread reroutes once it has freed the old structure
+        with self._route_lock:
+            super()._route_ops()
+    
+    def _new_structure(self, name):
+        ds = super()._new_structure(name)
+        if hasattr(ds, 'advance_on_read'):
+            ds.advance_on_read = False
+        return ds
+    
+    def _read_locked(self, fn, *args):
+        """fn(*args) under the shared lock"""
+        lock = self._lock
+        lock.acquire_read()
+        try:
+            return fn(*args)
+        finally:
+            lock.release_read()
+    
+    # Reads: shared lock
+    
+    def search(self, key):
+        """Search operation with monitoring (concurrent with other reads)"""
+        lock = self._lock
+        lock.acquire_read()
+        try:
+            # Unsampled fast path inlined: per-thread state is slow to reach via properties
+            state = self._thread_state()
+            left = state.search_left - 1
+            if left:
+                state.search_left = left
+                return self._search(key)
+            return self._monitored_search(key)
+        finally:
+            lock.release_read()
+    
+    def _guarded_search(self, key):
+        if self._read_cache is None:
+            return super()._guarded_search(key)
+        with self._cache_lock:
+            return super()._guarded_search(key)
+    
+    def _guarded_search_many(self, keys):
+        if self._read_cache is None:
+            return super()._guarded_search_many(keys)
+        with self._cache_lock:
+            return super()._guarded_search_many(keys)
+    
+    def search_many(self, keys):
+        """Look up a batch of keys; returns values (None if missing) aligned with `keys`"""
+        with self._lock.read():
+            return super().search_many(keys)
+    
+    def _ordered_read(self, key, method, *args):
+        return self._read_locked(super()._ordered_read, key, method, *args)
+    
+    def range(self, lo=None, hi=None, limit=None):
+        """Items with lo <= key < hi in key order (None = unbounded), at most `limit`"""
+        items = self._ordered_read(lo, 'range', lo, hi, limit)
+        with self._stats_lock:
+            self.stats.record_range_items(len(items))
+        if self.trace is not None:
+            self.trace.record(tr.RANGE, lo, len(items))
+        return items
+    
+    def _range_chunk(self, key, limit):
+        return self.active_ds.range(key, None, limit)
+    
+    def _iterate_from(self, key, chunk_size):
+        # The lock is held per chunk, never across a yield
+        items = self._read_locked(self._range_chunk, key, chunk_size)
+        while items:
+            with self._stats_lock:
+                self.stats.record_range_items(len(items))
+            yield from items
+            if len(items) < chunk_size:
+                return
+            last = items[-1][0]
+            items = self._read_locked(self._range_chunk, last, chunk_size + 1)
+            if items and items[0][0] == last:
+                items = items[1:]
+    
+    # Writes: exclusive lock
+    
+    def insert(self, key, value):
+        """Insert operation with monitoring"""
+        lock = self._lock
+        lock.acquire_write()
+        try:
+            return super().insert(key, value)
+        finally:
+            lock.release_write()
+    
+    def delete(self, key):
+        """Delete operation with monitoring"""
+        lock = self._lock
+        lock.acquire_write()
+        try:
+            return super().delete(key)
+        finally:
+            lock.release_write()
+    
+    def insert_many(self, items):
+        """Insert a batch of (key, value) pairs; returns bools aligned with `items`"""
+        with self._lock.write():
+            return super().insert_many(items)
+    
+    def delete_many(self, keys):
+        """Delete a batch of keys; returns bools aligned with `keys`"""
+        with self._lock.write():
+            return super().delete_many(keys)
+    
+    # Monitoring: stats lock, taken only by recorded operations
+    
+    def _record(self, op, key, mode, start, value=None):
+        waited = time.perf_counter_ns()
+        with self._stats_lock:
+            if start:
+                start += time.perf_counter_ns() - waited  # Don't time the lock wait
+            super()._record(op, key, mode, start, value)
+    
+    def _record_batch(self, op, keys, mode, start, items=None):
+        waited = time.perf_counter_ns()
+        with self._stats_lock:
+            if start:
+                start += time.perf_counter_ns() - waited
+            super()._record_batch(op, keys, mode, start, items)
+    
+    def _maybe_switch(self, ops=1):
+        with self._stats_lock:
+            super()._maybe_switch(ops)
+    
+    # Migration: built in the background, swapped in under the exclusive lock
+    
+    def _advance_migration(self, ops=1):
+        pass  # Operations never copy; the builder thread does
+    
+    def _advance_release(self, ops=1):
+        pass  # Nor free: readers share the lock, and the builder thread frees
+    
+    def release_step(self, max_items, time_budget=None):
+        with self._release_lock:
+            return super().release_step(max_items, time_budget)
+    
+    def _migrate_to(self, target_structure, reason, total_ops, details=None):
+        with self._migration_lock:
+            self._start_migration(target_structure, reason, total_ops, details)
+            migration = self.migration
+        if self.migration_batch_size > 0:
+            self._builder = threading.Thread(target=self._run_migration, args=(migration,),
+                                             name=f"migrate-to-{migration.target_name}",
+                                             daemon=True)
+            self._builder.start()
+    
+    def _run_migration(self, migration):
+        try:
+            while not self._step_migration(migration, self.migration_batch_size,
+                                           self.migration_time_budget):
+                time.sleep(0)  # Hand the GIL to waiting operations between chunks
+        except Exception:
+            with self._lock.read(), self._stats_lock, self._migration_lock:
+                if self.migration is migration:
+                    super()._abort_migration("Migration failed")
+            raise
+        
+        # Whichever structure was dropped is unreachable now: free it outside every lock
+        while not self.release_step(self.migration_batch_size, self.migration_time_budget):
+            time.sleep(0)
+    
+    def _copy_chunk(self, migration, max_items, time_budget):
+        with self._migration_lock:
+            if self.migration is not migration:
+                return None
+            return migration.step(max_items, time_budget)
+    
+    def _step_migration(self, migration, max_items, time_budget=None):
+        """Copy one chunk of `migration`; True once it has committed or been dropped"""
+        try:
+            done = self._read_locked(self._copy_chunk, migration, max_items, time_budget)
+        except TypeError:
+            if migration.target_name not in self.INT64_STRUCTURES:
+                raise
+            with self._lock.read(), self._stats_lock, self._migration_lock:
+                self.stats.int_keys = False
+                if self.migration is migration:
+                    super()._abort_migration("Keys are not all int64")
+            return True
+        if done is None:
+            return True
+        if not done:
+            return False
+        
+        with self._lock.write():
+            if self.migration is migration and not self._veto_migration():
+                with self._migration_lock:
+                    self._commit_migration()
+        return True
+    
+    def migration_step(self, max_items=None, time_budget=None):
+        """
+        Copy one chunk of an in-flight migration from the calling thread.
+        Returns True if no migration is left in flight. A structure dropped
+        this way is freed by release_step(), not by operations.
+        """
+        migration = self.migration
+        if migration is None:
+            return True
+        if max_items is None:
+            max_items = self.migration_batch_size
+        self._step_migration(migration, max_items, time_budget)
+        return self.migration is None
+    
+    def wait_for_migration(self, timeout=None):
+        """Block until the background migration finishes; True if none is left running"""
+        builder = self._builder
+        if builder is not None:
+            builder.join(timeout)
+        return self.migration is None
+    
+    def _abort_migration(self, reason):
+        with self._migration_lock:
+            return super()._abort_migration(reason)
+    
+    def abort_migration(self, reason="Aborted"):
+        """Drop an in-flight migration and keep the current structure"""
+        with self._lock.read(), self._stats_lock:
+            return self._abort_migration(reason)
+    
+    def force_switch(self, target_structure):
+        """Manually force a switch; the copy runs in the background"""
+        with self._lock.read(), self._stats_lock:
+            super().force_switch(target_structure)
+    
+    def save(self, path):
+        """Write a binary snapshot; writers wait until it is done, readers don't"""
+        return self._read_locked(super().save, path)
+    
+    def _snapshot_state(self):
+        # Copied under the stats lock: readers keep recording while it is written
+        with self._stats_lock:
+            return copy.deepcopy(super()._snapshot_state())
+    
+    def get_memory_stats(self):
+        """Structures alive now and items held across them, now and at peak"""
+        with self._lock.read():
+            return super().get_memory_stats()
+    
+    def get_stats(self):
+        """Get all statistics"""
+        with self._lock.read(), self._stats_lock:
+            return super().get_stats()
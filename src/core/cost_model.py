@@ -0,0 +1,188 @@
+from math import log, log2
+import random
+import time
+
+from .bst import BST
+from .avl import AVL
+from .bplustree import BPlusTree
+from .hashmap import HashMap
+from .sorted_array_map import SortedArrayMap, HAS_NUMPY
+
+
+class CostModel:
+    """
+    Predicts per-operation cost of each structure and the cost of migrating
+    into it, from workload stats plus per-machine constants.
+    Constants start at rough defaults; calibrate() replaces them with
+    micro-benchmark measurements, and observe_migration() refines the
+    migration constants from real switches.
+    """
+    
+    STRUCTURES = ('BST', 'AVL', 'BPlusTree', 'HashMap') + (('SortedArray',) if HAS_NUMPY else ())
+    
+    def __init__(self):
+        # Seconds per tree node (B+ Tree: per level) visited, per search / insert / delete
+        self.node_cost = {
+            'BST': {'search': 1.0e-7, 'insert': 1.5e-7, 'delete': 1.5e-7},
+            'AVL': {'search': 1.0e-7, 'insert': 3.0e-7, 'delete': 3.0e-7},
+            'BPlusTree': {'search': 6.0e-7, 'insert': 8.0e-7, 'delete': 1.0e-6}
+        }
+        # Seconds per item returned by a tree range query, after the descent
+        self.range_item_cost = {'BST': 1.0e-7, 'AVL': 1.0e-7, 'BPlusTree': 2.0e-8,
+                                'SortedArray': 2.0e-8}
+        self.bplus_fanout = BPlusTree.DEFAULT_FANOUT
+        # Seconds per HashMap probe
+        self.probe_cost = {'search': 4.0e-7, 'insert': 6.0e-7, 'delete': 5.0e-7}
+        # Seconds per SortedArray op (binary search, or buffer write plus its share of merges)
+        self.array_cost = {'search': 1.5e-6, 'insert': 1.5e-6, 'delete': 1.5e-6}
+        # Seconds per item moved into each target, plus sort cost per n*log2(n)
+        self.migration_item_cost = {'BST': 1.0e-6, 'AVL': 1.2e-6, 'BPlusTree': 3.0e-7,
+                                    'HashMap': 1.0e-6, 'SortedArray': 2.0e-7}
+        self.sort_cost = 5.0e-8
+        self.calibrated = False
+    
+    def get_state(self):
+        """The constants, as plain data"""
+        return {
+            'node_cost': self.node_cost,
+            'range_item_cost': self.range_item_cost,
+            'probe_cost': self.probe_cost,
+            'array_cost': self.array_cost,
+            'migration_item_cost': self.migration_item_cost,
+            'sort_cost': self.sort_cost,
+            'calibrated': self.calibrated
+        }
+    
+    def set_state(self, state):
+        """Restore what get_state() returned"""
+        for name, value in state.items():
+            setattr(self, name, value)
+    
+    def calibrate(self, n=5000, seed=0):
+        """Fit the constants with micro-benchmarks on `n` random int keys"""
+        rng = random.Random(seed)
+        keys = rng.sample(range(n * 10), n)
+        depth = log2(n) + 1
+        
+        backends = [('BST', BST), ('AVL', AVL), ('BPlusTree', BPlusTree), ('HashMap', HashMap)]
+        if HAS_NUMPY:
+            backends.append(('SortedArray', SortedArrayMap))
+        
+        for name, cls in backends:
+            ds = cls()
+            times = {}
+            
+            start = time.perf_counter()
+            for key in keys:
+                ds.insert(key, key)
+            if name == 'SortedArray':
+                ds.merge()  # Flushing the insert buffer is part of the insert cost
+            times['insert'] = (time.perf_counter() - start) / n
+            
+            start = time.perf_counter()
+            for key in keys:
+                ds.search(key)
+            times['search'] = (time.perf_counter() - start) / n
+            
+            if name != 'HashMap':
+                start = time.perf_counter()
+                ds.range()
+                self.range_item_cost[name] = (time.perf_counter() - start) / n
+                # Nodes visited per op: B+ Tree levels are all the same depth
+                levels = ds.get_height() if name == 'BPlusTree' else depth
+            
+            start = time.perf_counter()
+            for key in keys[:n // 2]:
+                ds.delete(key)
+            times['delete'] = (time.perf_counter() - start) / (n // 2)
+            
+            if name == 'HashMap':
+                probes = max(ds.get_avg_probe_length(), 1.0)
+                self.probe_cost = {op: t / probes for op, t in times.items()}
+            elif name == 'SortedArray':
+                self.array_cost = times
+            else:
+                self.node_cost[name] = {op: t / levels for op, t in times.items()}
+            
+            items = sorted((key, key) for key in keys)
+            start = time.perf_counter()
+            cls().bulk_load(items)
+            self.migration_item_cost[name] = (time.perf_counter() - start) / n
+        
+        items = [(key, key) for key in keys]
+        start = time.perf_counter()
+        items.sort()
+        self.sort_cost = (time.perf_counter() - start) / (n * log2(n))
+        
+        self.calibrated = True
+        return self
+    
+    def expected_depth(self, structure, stats_summary, size, current_height=None, horizon=0):
+        """Average nodes visited per tree operation over the coming horizon"""
+        if structure == 'BPlusTree':
+            # Nodes split into halves, so they average ~ln 2 full
+            return current_height or 1 + log(size + 1) / log(self.bplus_fanout * 0.69)
+        
+        balanced = log2(size + 1) + 1
+        if structure == 'AVL':
+            return balanced
+        
+        # BST: starts at the measured height (or balanced after a bulk load)
+        # and grows linearly while inserts arrive in key order
+        start = current_height if current_height else balanced
+        sortedness = max(0.0, (stats_summary['order_score'] - 0.5) * 2)
+        growth = sortedness * stats_summary['insert_ratio'] * horizon
+        return max(start, balanced) + growth / 2
+    
+    def op_costs(self, structure, stats_summary, size, current_height=None,
+                 probe_length=None, horizon=0):
+        """Expected seconds per search / insert / delete / range"""
+        range_items = stats_summary.get('avg_range_items', 0)
+        if structure == 'HashMap':
+            probes = probe_length or 1.2
+            costs = {op: cost * probes for op, cost in self.probe_cost.items()}
+            # No key order: every slot is visited and the matches sorted
+            costs['range'] = size * self.probe_cost['search']
+            if range_items > 1:
+                costs['range'] += self.sort_cost * range_items * log2(range_items)
+            return costs
+        
+        if structure == 'SortedArray':
+            costs = dict(self.array_cost)
+            costs['range'] = costs['search'] + range_items * self.range_item_cost[structure]
+            return costs
+        
+        depth = self.expected_depth(structure, stats_summary, size, current_height, horizon)
+        costs = {op: cost * depth for op, cost in self.node_cost[structure].items()}
+        # One descent, then a walk over the items returned
+        costs['range'] = costs['search'] + range_items * self.range_item_cost[structure]
+        return costs
+    
+    def mixed_cost(self, costs, stats_summary):
+        """Weight per-op costs by the current operation mix"""
+        search = stats_summary['search_ratio']
+        insert = stats_summary['insert_ratio']
+        delete = stats_summary.get('delete_ratio', max(0.0, 1.0 - search - insert))
+        ranges = stats_summary.get('range_ratio', 0.0)
+        return (search * costs['search'] + insert * costs['insert'] + delete * costs['delete']
+                + ranges * costs['range'])
+    
+    def migration_cost(self, from_structure, to_structure, size):
+        """Expected seconds to move `size` items between structures"""
+        cost = size * self.migration_item_cost[to_structure]
+        if from_structure == 'HashMap' and to_structure != 'HashMap' and size > 1:
+            cost += self.sort_cost * size * log2(size)
+        return cost
+    
+    def observe_migration(self, from_structure, to_structure, size, seconds, weight=0.3):
+        """Blend a measured migration into the per-item constant"""
+        if size <= 0:
+            return
+        
+        sort_time = 0
+        if from_structure == 'HashMap' and to_structure != 'HashMap' and size > 1:
+            sort_time = self.sort_cost * size * log2(size)
+        per_item = max(seconds - sort_time, 0) / size
+        # A registered backend the model has no default for starts from its first switch
+        old = self.migration_item_cost.get(to_structure, per_item)
+        self.migration_item_cost[to_structure] = (1 - weight) * old + weight * per_item
@@ -1,53 +1,207 @@
+from collections import deque
+from .cost_model import CostModel
+from .change_detector import ChangeDetector
+
+
 class DecisionEngine:
     """
     Decides when and which data structure to switch to.
     This is the brain of the self-tuning system.
+    
+    mode='threshold' uses fixed workload-feature thresholds; mode='cost_model'
+    switches when predicted savings over `horizon_ops` beat the migration
+    cost. Checks back off while the structure is right (adaptive=False keeps
+    a fixed interval).
     """
     
-    def __init__(self):
-        self.check_interval = 50  # Check every N operations
+    MODES = ('threshold', 'cost_model')
+    
+    def __init__(self, mode='threshold', cost_model=None, horizon_ops=5000, calibrate=True,
+                 adaptive=True, change_detector=None):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown decision mode: {mode}")
+        self.mode = mode
+        
+        self.base_check_interval = 50  # Check every N operations
+        self.check_interval = self.base_check_interval
+        self.max_check_interval = 3200
+        self.check_backoff = 2  # Interval growth after a check that keeps the structure
         self.min_ops_before_switch = 100  # Minimum ops before first switch
         self.switch_cooldown = 200  # Ops to wait after a switch
         
         # Thresholds
         self.sorted_threshold = 0.7  # Order score threshold
         self.search_heavy_threshold = 0.6
+        self.range_heavy_threshold = 0.05  # Ordered reads that rule out the HashMap
+        self.large_ordered_size = 50000  # Items above which the B+ Tree beats AVL
+        self.read_only_threshold = 0.01  # Write ratio low enough for the sorted array
+        self.array_write_limit = 0.1  # Write ratio that moves off it again
+        self.min_array_size = 1000
+        
+        # Cost model
+        self.cost_model = cost_model or CostModel()
+        self.horizon_ops = horizon_ops  # Ops the current pattern is expected to last
+        self.switch_margin = 1.0  # Required savings / migration cost
+        self.shadow_veto_margin = 0.1  # Shadow slowdown that blocks a switch
+        if mode == 'cost_model' and calibrate and not self.cost_model.calibrated:
+            self.cost_model.calibrate()
+        
+        # Change detection
+        self.adaptive = adaptive
+        self.change_detector = (change_detector or ChangeDetector()) if adaptive else None
+        self.change_pending = False
+        self.change_points = deque(maxlen=100)
+        self.check_count = 0
         
         self.last_switch_at = 0
+        self.last_check_at = 0
+        self.last_decision = None  # Numbers behind the most recent decision
         self.switch_history = []
     
     def should_check(self, total_ops):
-        """Should we check for a switch now?"""
+        """
+        Should we check for a switch now?
+        Due once `check_interval` ops have passed since the last check, so
+        callers that skip ahead (sampling, batches) still get their checks,
+        or right away once a workload change has been detected.
+        """
         if total_ops < self.min_ops_before_switch:
             return False
         
-        # Cooldown after switch
+        # Cooldown after switch (a change seen meanwhile stays pending)
         if total_ops - self.last_switch_at < self.switch_cooldown:
             return False
         
-        return total_ops % self.check_interval == 0
+        if not self.change_pending and total_ops - self.last_check_at < self.check_interval:
+            return False
+        self.change_pending = False
+        self.last_check_at = total_ops
+        self.check_count += 1
+        return True
     
-    def decide_structure(self, current_structure, stats_summary, current_height=None):
+    def observe(self, totals, total_ops):
+        """
+        Feed the StatsCollector's running totals to the change detector.
+        Returns the detected change (signal and how many recorded ops ago
+        it began) or None.
+        """
+        signal = self.change_detector.observe(totals)
+        if not signal:
+            return None
+        
+        change = {
+            'at_operation': total_ops,
+            'signal': signal,
+            'age': self.change_detector.change_age
+        }
+        self.change_points.append(change)
+        self.change_pending = True
+        self.check_interval = self.base_check_interval
+        return change
+    
+    def _schedule_next_check(self, should_switch):
+        """Back off while the structure is right; check often again after a switch"""
+        if not self.adaptive:
+            return
+        if should_switch:
+            self.check_interval = self.base_check_interval
+        else:
+            self.check_interval = min(self.check_interval * self.check_backoff,
+                                      self.max_check_interval)
+    
+    def decide_structure(self, current_structure, stats_summary, current_height=None,
+                         size=None, probe_length=None, shadow=None):
         """
         Decide which structure should be used.
+        `shadow` is an optional ShadowEvaluator whose measured candidate
+        latencies correct the cost model or veto threshold-based switches.
         Returns: (should_switch: bool, target_structure: str, reason: str)
         """
+        if self.mode == 'cost_model':
+            decision = self._decide_by_cost(current_structure, stats_summary, current_height,
+                                            size or 0, probe_length, shadow)
+        else:
+            decision = self._decide_by_threshold(current_structure, stats_summary, current_height,
+                                                 size or 0)
+            if decision[0] and shadow is not None:
+                decision = self._shadow_veto(current_structure, decision, stats_summary, shadow)
+        
+        range_ratio = stats_summary.get('range_ratio', 0.0)
+        if decision[0] and self.rules_out(decision[1], range_ratio):
+            decision = (False, current_structure,
+                        f'Range-heavy ({range_ratio:.2f}): staying on an ordered structure')
+        
+        self._schedule_next_check(decision[0])
+        return decision
+    
+    def rules_out(self, structure, range_ratio):
+        """Range veto: a HashMap answers every range or floor/ceiling with a full-table pass"""
+        return structure == 'HashMap' and range_ratio >= self.range_heavy_threshold
+    
+    def _ordered_target(self, size):
+        """Ordered structure for a dataset of `size` items"""
+        return 'BPlusTree' if size >= self.large_ordered_size else 'AVL'
+    
+    def _array_eligible(self, stats_summary, size):
+        """SortedArray is available and the keys fit it"""
+        return ('SortedArray' in CostModel.STRUCTURES and bool(stats_summary.get('int_keys'))
+                and size >= self.min_array_size)
+    
+    @staticmethod
+    def _cache_hit_ratio(structure, stats_summary):
+        """Share of searches a read cache answers before they reach `structure`"""
+        if structure not in stats_summary.get('cached_structures', ()):
+            return 0.0
+        return stats_summary.get('cache_hit_ratio', 0.0)
+    
+    def _decide_by_threshold(self, current_structure, stats_summary, current_height, size=0):
+        """Fixed workload-feature thresholds"""
         order_score = stats_summary['order_score']
         search_ratio = stats_summary['search_ratio']
+        range_ratio = stats_summary.get('range_ratio', 0.0)
         total_ops = stats_summary['total_ops']
+        hit_ratio = self._cache_hit_ratio(current_structure, stats_summary)
+        if hit_ratio:
+            # Searches the structure itself still serves, as a share of what reaches it
+            missed = search_ratio * (1 - hit_ratio)
+            search_ratio = missed / (1 - search_ratio + missed) if missed else 0.0
+        self.last_decision = {
+            'mode': 'threshold',
+            'order_score': order_score,
+            'search_ratio': search_ratio,
+            'cache_hit_ratio': hit_ratio,
+            'insert_ratio': stats_summary['insert_ratio'],
+            'range_ratio': range_ratio,
+            'tree_height': current_height,
+            'size': size
+        }
+        ordered = self._ordered_target(size)
+        writes = stats_summary['insert_ratio'] + stats_summary.get('delete_ratio', 0.0)
         
         # Decision logic
         
-        # Case 1: Sorted workload detected → Use AVL
+        # Case 0: Range queries on a HashMap → back to an ordered tree
+        if range_ratio >= self.range_heavy_threshold and current_structure == 'HashMap':
+            return True, ordered, f'Range queries ({range_ratio:.2f}) need an ordered structure'
+        
+        # Case 0b: Read-mostly integer keys → sorted array (stay until writes pick up)
+        if self._array_eligible(stats_summary, size):
+            on_array = current_structure == 'SortedArray'
+            if writes <= (self.array_write_limit if on_array else self.read_only_threshold):
+                if on_array:
+                    return False, current_structure, 'No switch needed'
+                return True, 'SortedArray', f'Read-mostly integer keys (writes {writes:.2f})'
+        
+        # Case 1: Sorted workload detected → Use AVL (B+ Tree if large)
         if order_score > self.sorted_threshold:
             if current_structure == 'BST':
                 # BST degrading on sorted data
                 if current_height and current_height > 15:  # Arbitrary threshold
-                    return True, 'AVL', f'High order score ({order_score:.2f}) + tree height {current_height}'
-            elif current_structure == 'HashMap':
+                    return True, ordered, f'High order score ({order_score:.2f}) + tree height {current_height}'
+            elif current_structure in ('HashMap', 'SortedArray'):
                 # HashMap is fine for sorted, but if we're insert-heavy, AVL might be better
                 if stats_summary['insert_ratio'] > 0.5:
-                    return True, 'AVL', f'Sorted inserts detected (order: {order_score:.2f})'
+                    return True, ordered, f'Sorted inserts detected (order: {order_score:.2f})'
         
         # Case 2: Search-heavy + random keys → Use HashMap
         if search_ratio > self.search_heavy_threshold and order_score < 0.5:
@@ -61,21 +215,186 @@ class DecisionEngine:
         
         # Case 4: BST degrading (high height) → Switch to AVL
         if current_structure == 'BST' and current_height and current_height > 20:
-            return True, 'AVL', f'BST height too high ({current_height})'
+            return True, ordered, f'BST height too high ({current_height})'
+        
+        # Case 5: Large ordered dataset → B+ Tree (fewer, wider nodes than AVL)
+        if current_structure == 'AVL' and size >= self.large_ordered_size:
+            return True, 'BPlusTree', f'Large ordered dataset ({size} items)'
+        
+        # Case 6: Writes on the sorted array → a tree that takes them cheaply
+        if current_structure == 'SortedArray' and writes > self.array_write_limit:
+            return True, ordered, f'Writes ({writes:.2f}) on the read-optimized sorted array'
         
         # No switch needed
         return False, current_structure, 'No switch needed'
     
-    def record_switch(self, from_structure, to_structure, reason, total_ops):
-        """Record a structure switch"""
+    def _shadow_veto(self, current_structure, decision, stats_summary, shadow):
+        """Keep the current structure if the shadow measured the target as slower"""
+        target = decision[1]
+        if not (shadow.is_reliable(target) and shadow.is_reliable(current_structure)):
+            return decision
+        
+        target_cost = shadow.mixed_cost(target, stats_summary)
+        current_cost = shadow.mixed_cost(current_structure, stats_summary)
+        if target_cost is None or current_cost is None:
+            return decision
+        
+        self.last_decision['shadow_cost'] = {target: target_cost, current_structure: current_cost}
+        if target_cost > current_cost * (1 + self.shadow_veto_margin):
+            return False, current_structure, (
+                f'Shadow veto: {target} measured {target_cost*1e6:.2f}us/op vs '
+                f'{current_structure} {current_cost*1e6:.2f}us/op'
+            )
+        return decision
+    
+    def _shadow_corrections(self, stats_summary, shadow):
+        """measured / predicted cost per candidate, at the shadow's own size"""
+        # The shadow replays point operations only; compare on that mix
+        point_summary = dict(stats_summary)
+        range_ratio = stats_summary.get('range_ratio', 0.0)
+        if 0 < range_ratio < 1:
+            for ratio in ('search_ratio', 'insert_ratio', 'delete_ratio'):
+                if ratio in point_summary:
+                    point_summary[ratio] /= 1 - range_ratio
+            point_summary['range_ratio'] = 0.0
+        
+        corrections = {}
+        for structure, candidate in shadow.get_report()['candidates'].items():
+            if not candidate['reliable']:
+                continue
+            measured = shadow.mixed_cost(structure, point_summary)
+            predicted = self.cost_model.mixed_cost(
+                self.cost_model.op_costs(
+                    structure,
+                    point_summary,
+                    candidate['size'],
+                    candidate['height'],
+                    candidate['probe_length']
+                ),
+                point_summary
+            )
+            if measured and predicted > 0:
+                corrections[structure] = min(max(measured / predicted, 0.25), 4.0)
+        return corrections
+    
+    def _decide_by_cost(self, current_structure, stats_summary, current_height, size, probe_length,
+                        shadow=None):
+        """Switch when projected savings over the horizon beat the migration cost"""
+        model = self.cost_model
+        costs = {}
+        array_ok = self._array_eligible(stats_summary, size)
+        for structure in CostModel.STRUCTURES:
+            if structure == 'SortedArray' and not array_ok and structure != current_structure:
+                continue
+            is_current = structure == current_structure
+            op_costs = model.op_costs(
+                structure,
+                stats_summary,
+                size,
+                current_height if is_current else None,
+                probe_length if is_current else None,
+                self.horizon_ops
+            )
+            op_costs['search'] *= 1 - self._cache_hit_ratio(structure, stats_summary)
+            costs[structure] = model.mixed_cost(op_costs, stats_summary)
+        
+        # Shadow measurements correct each candidate for our real keys
+        corrections = self._shadow_corrections(stats_summary, shadow) if shadow else {}
+        for structure, correction in corrections.items():
+            costs[structure] *= correction
+        
+        # Measured latency of the current structure rescales every estimate
+        # (key types, comparison cost and cache effects the model can't see)
+        scale = 1.0
+        measured = stats_summary.get('avg_time') or 0
+        if measured > 0 and costs[current_structure] > 0:
+            scale = min(max(measured / costs[current_structure], 0.25), 4.0)
+        costs = {structure: cost * scale for structure, cost in costs.items()}
+        
+        best = min(costs, key=costs.get)
+        savings = (costs[current_structure] - costs[best]) * self.horizon_ops
+        migration = model.migration_cost(current_structure, best, size)
+        
+        self.last_decision = {
+            'mode': 'cost_model',
+            'op_cost': costs,
+            'scale': scale,
+            'shadow_corrections': corrections,
+            'cache_hit_ratio': stats_summary.get('cache_hit_ratio'),
+            'best': best,
+            'horizon_ops': self.horizon_ops,
+            'projected_savings': savings,
+            'migration_cost': migration,
+            'size': size
+        }
+        
+        if best != current_structure and savings > migration * self.switch_margin:
+            return True, best, (
+                f'Cost model: {best} at {costs[best]*1e6:.2f}us/op vs '
+                f'{costs[current_structure]*1e6:.2f}us/op saves {savings*1000:.2f}ms over '
+                f'{self.horizon_ops} ops > {migration*1000:.2f}ms migration'
+            )
+        return False, current_structure, 'No switch needed'
+    
+    def record_switch(self, from_structure, to_structure, reason, total_ops, details=None):
+        """Record a structure switch, with the numbers behind the decision"""
         self.last_switch_at = total_ops
+        if self.change_detector is not None:
+            # Latencies of the new structure are a new baseline, not a change
+            self.change_detector.reset_latency()
         self.switch_history.append({
             'from': from_structure,
             'to': to_structure,
             'reason': reason,
-            'at_operation': total_ops
+            'at_operation': total_ops,
+            'details': details
         })
     
+    def get_state(self):
+        """
+        What a snapshot keeps: settings, check schedule, switch history and
+        cost constants, as plain data. The change detector starts afresh.
+        """
+        return {
+            'mode': self.mode,
+            'adaptive': self.adaptive,
+            'horizon_ops': self.horizon_ops,
+            'check_interval': self.check_interval,
+            'check_count': self.check_count,
+            'change_pending': self.change_pending,
+            'change_points': list(self.change_points),
+            'last_switch_at': self.last_switch_at,
+            'last_check_at': self.last_check_at,
+            'last_decision': self.last_decision,
+            'switch_history': self.switch_history,
+            'cost_model': self.cost_model.get_state()
+        }
+    
+    @classmethod
+    def from_state(cls, state):
+        """An engine restored from get_state(); a calibrated cost model isn't recalibrated"""
+        cost_model = CostModel()
+        cost_model.set_state(state['cost_model'])
+        engine = cls(state['mode'], cost_model, state['horizon_ops'], adaptive=state['adaptive'])
+        engine.check_interval = state['check_interval']
+        engine.check_count = state['check_count']
+        engine.change_pending = state['change_pending']
+        engine.change_points.extend(state['change_points'])
+        engine.last_switch_at = state['last_switch_at']
+        engine.last_check_at = state['last_check_at']
+        engine.last_decision = state['last_decision']
+        engine.switch_history = state['switch_history']
+        return engine
+    
     def get_switch_history(self):
         """Get all switches"""
-        return self.switch_history
\ No newline at end of file
+        return self.switch_history
+    
+    def get_check_stats(self):
+        """Check schedule and detected workload changes"""
+        return {
+            'adaptive': self.adaptive,
+            'checks': self.check_count,
+            'check_interval': self.check_interval,
+            'change_points': list(self.change_points)
+        }
\ No newline at end of file
@@ -1,91 +1,511 @@
+from heapq import nsmallest
+from operator import itemgetter
+
+_EMPTY = object()
+_DELETED = object()
+_HASH_MASK = (1 << 64) - 1
+
+
 class HashMap:
-    """Hash Map with chaining for collision resolution"""
+    """
+    Hash Map with open addressing (probing over parallel key/value arrays,
+    tombstones for deletes).
+    Resizing is incremental: a grow or shrink allocates the new table and then
+    moves a bounded number of old slots on every following operation, so no
+    single operation pays for the whole rehash.
+    With advance_on_read=False only writes do that background work, so
+    searches never modify the table and can run concurrently.
+    """
+    
+    MAX_LOAD = 0.75
+    MIN_LOAD = 0.125
+    PREPARE_LOAD = 0.5  # Start allocating the next table in chunks
+    RESIZE_STEP = 16
+    PREALLOC_STEP = 32  # Next-table slots allocated per operation (8 needed to be ready in time)
+    ALLOC_CHUNK = 1 << 12  # Slots of a drained table freed per operation
+    PREALLOC_MIN_CAPACITY = 1 << 16
     
     def __init__(self, initial_capacity=16):
-        self.capacity = initial_capacity
+        self.min_capacity = self._round_capacity(initial_capacity)
+        self.capacity = self.min_capacity
         self.size = 0
-        self.buckets = [[] for _ in range(self.capacity)]
-        self.collision_count = 0
+        self.keys = [_EMPTY] * self.capacity
+        self.values = [None] * self.capacity
+        self.used = 0  # Live entries + tombstones in the current table
+        
+        # Table being drained by an incremental resize
+        self._old_keys = None
+        self._old_values = None
+        self._resize_pos = 0
+        self._resize_step = self.RESIZE_STEP
+        
+        # Next (grown) table allocated ahead of time, and drained tables
+        # released piecewise, so neither costs one long pause
+        self._next_keys = None
+        self._next_values = None
+        self._retired = []
+        self._releasing = []  # Detached tables release_step() hasn't freed yet
+        self._reserved = 0  # Size reserve() made room for: no next table below it
+        self._background = False
+        self.advance_on_read = True
+        self.generation = 0
+        self.resize_count = 0
+        
+        # Probe statistics
+        self.total_probes = 0
+        self.probe_ops = 0
+        self.max_probe_length = 0
+    
+    @staticmethod
+    def _round_capacity(n):
+        capacity = 8
+        while capacity < n:
+            capacity *= 2
+        return capacity
     
-    def _hash(self, key):
-        """Hash function"""
-        return hash(key) % self.capacity
+    def _probe(self, keys, key):
+        """
+        Walk the probe sequence for key (CPython-style perturbed probing, so
+        dense integer keys don't pile up into one long cluster).
+        Returns (slot holding key or -1, first reusable slot).
+        """
+        mask = len(keys) - 1
+        perturb = hash(key) & _HASH_MASK
+        index = perturb & mask
+        free = -1
+        probes = 1
+        found = -1
+        while True:
+            k = keys[index]
+            if k is _EMPTY:
+                if free < 0:
+                    free = index
+                break
+            if k is _DELETED:
+                if free < 0:
+                    free = index
+            elif k is key or k == key:
+                found = index
+                break
+            perturb >>= 5
+            index = (5 * index + perturb + 1) & mask
+            probes += 1
+        
+        self.total_probes += probes
+        self.probe_ops += 1
+        if probes > self.max_probe_length:
+            self.max_probe_length = probes
+        return found, free
     
     def insert(self, key, value):
         """Insert key-value pair"""
-        index = self._hash(key)
-        bucket = self.buckets[index]
+        if self._background:
+            self._background_step()
         
-        # Check if key exists
-        for i, (k, v) in enumerate(bucket):
-            if k == key:
-                bucket[i] = (key, value)
-                return False
+        index, free = self._probe(self.keys, key)
+        if index >= 0:
+            self.values[index] = value
+            return False
         
-        # New key
-        if len(bucket) > 0:
-            self.collision_count += 1
+        inserted = True
+        if self._old_keys is not None:
+            # Not moved yet: take it out of the old table and re-home it here
+            old_index, _ = self._probe(self._old_keys, key)
+            if old_index >= 0:
+                self._old_keys[old_index] = _DELETED
+                self._old_values[old_index] = None
+                inserted = False
         
-        bucket.append((key, value))
-        self.size += 1
+        if self.keys[free] is _EMPTY:
+            self.used += 1
+        self.keys[free] = key
+        self.values[free] = value
+        if inserted:
+            self.size += 1
         
-        # Rehash if load factor > 0.75
-        if self.size / self.capacity > 0.75:
-            self._rehash()
+        if self.used > self.capacity * self.PREPARE_LOAD:
+            if self.used > self.capacity * self.MAX_LOAD:
+                self._maybe_resize()
+            elif self._next_keys is None:
+                self._start_prealloc()
         
-        return True
+        return inserted
     
     def search(self, key):
         """Search for key"""
-        index = self._hash(key)
-        bucket = self.buckets[index]
+        if self._background and self.advance_on_read:
+            self._background_step()
         
-        for k, v in bucket:
-            if k == key:
-                return v
+        index, _ = self._probe(self.keys, key)
+        if index >= 0:
+            return self.values[index]
+        
+        if self._old_keys is not None:
+            index, _ = self._probe(self._old_keys, key)
+            if index >= 0:
+                return self._old_values[index]
         return None
     
     def delete(self, key):
         """Delete key"""
-        index = self._hash(key)
-        bucket = self.buckets[index]
+        if self._background:
+            self._background_step()
         
-        for i, (k, v) in enumerate(bucket):
-            if k == key:
-                bucket.pop(i)
+        for keys, values in ((self.keys, self.values), (self._old_keys, self._old_values)):
+            if keys is None:
+                continue
+            index, _ = self._probe(keys, key)
+            if index >= 0:
+                keys[index] = _DELETED
+                values[index] = None
                 self.size -= 1
+                if self.size < self.capacity * self.MIN_LOAD:
+                    self._maybe_resize()
                 return True
         return False
     
-    def _rehash(self):
-        """Double capacity and rehash all items"""
-        old_buckets = self.buckets
-        self.capacity *= 2
-        self.buckets = [[] for _ in range(self.capacity)]
-        self.size = 0
-        self.collision_count = 0
+    def insert_many(self, items):
+        """
+        Insert a batch of (key, value) pairs; returns bools aligned with `items`.
+        An empty table is sized once for the batch; a filled one grows
+        incrementally, like single inserts, so no batch pays for a rehash.
+        """
+        items = list(items)
+        if not self.size and self._old_keys is None:
+            self.reserve(len(items))
+        insert = self.insert
+        return [insert(key, value) for key, value in items]
+    
+    def search_many(self, keys):
+        """Look up a batch of keys; returns values (None if missing) aligned with `keys`"""
+        if self._background and self.advance_on_read:
+            self._background_step()
+        if self._old_keys is not None:
+            search = self.search
+            return [search(key) for key in keys]
+        
+        # Probe loop inlined (same sequence as _probe), stats folded in once
+        table = self.keys
+        values = self.values
+        mask = len(table) - 1
+        results = []
+        total_probes = 0
+        max_probes = self.max_probe_length
+        for key in keys:
+            perturb = hash(key) & _HASH_MASK
+            index = perturb & mask
+            probes = 1
+            while True:
+                k = table[index]
+                if k is _EMPTY:
+                    results.append(None)
+                    break
+                if k is not _DELETED and (k is key or k == key):
+                    results.append(values[index])
+                    break
+                perturb >>= 5
+                index = (5 * index + perturb + 1) & mask
+                probes += 1
+            total_probes += probes
+            if probes > max_probes:
+                max_probes = probes
+        
+        self.total_probes += total_probes
+        self.probe_ops += len(results)
+        self.max_probe_length = max_probes
+        return results
+    
+    def delete_many(self, keys):
+        """Delete a batch of keys; returns bools aligned with `keys`"""
+        delete = self.delete
+        return [delete(key) for key in keys]
+    
+    def _maybe_resize(self):
+        """Start a grow, shrink or tombstone clean-up if the table needs one"""
+        if self._old_keys is not None:
+            # Still draining the previous resize; finish it first
+            self._advance_resize(drain=True)
+        
+        target = max(self._round_capacity(self.size * 2), self.min_capacity)
+        if self.used > self.capacity * self.MAX_LOAD or target < self.capacity:
+            self._start_resize(target)
+    
+    def _start_resize(self, new_capacity):
+        """Swap in an empty table; the old one is drained by later operations"""
+        self._old_keys = self.keys
+        self._old_values = self.values
+        self._resize_pos = 0
+        # Move enough slots per op to finish before the new table fills up
+        self._resize_step = max(self.RESIZE_STEP, 8 * self.capacity // new_capacity)
+        
+        keys, values = self._next_keys, self._next_values
+        self._next_keys = None
+        self._next_values = None
+        if keys is None or 2 * self.capacity != new_capacity:
+            keys, values = [], []
+        keys.extend([_EMPTY] * (new_capacity - len(keys)))
+        values.extend([None] * (new_capacity - len(values)))
+        
+        self.capacity = new_capacity
+        self.keys = keys
+        self.values = values
+        self.used = 0
+        self.generation += 1
+        self.resize_count += 1
+        self._background = True
+    
+    def _start_prealloc(self):
+        """Start allocating the next table, unless reserve() already sized this one"""
+        if self.capacity >= self.PREALLOC_MIN_CAPACITY and self.size >= self._reserved:
+            self._next_keys = []
+            self._next_values = []
+            self._background = True
+    
+    def _background_step(self):
+        """Spread resize work over operations: drain, then pre-allocate and release"""
+        if self._old_keys is not None:
+            self._advance_resize()
+        
+        if self._next_keys is not None and len(self._next_keys) < 2 * self.capacity:
+            chunk = min(self.PREALLOC_STEP, 2 * self.capacity - len(self._next_keys))
+            self._next_keys.extend([_EMPTY] * chunk)
+            self._next_values.extend([None] * chunk)
+        
+        if self._retired:
+            table = self._retired[-1]
+            del table[-self.ALLOC_CHUNK:]
+            if not table:
+                self._retired.pop()
+        
+        self._background = (self._old_keys is not None or bool(self._retired)
+                            or (self._next_keys is not None
+                                and len(self._next_keys) < 2 * self.capacity))
+    
+    def _advance_resize(self, drain=False):
+        """Move the next batch of old slots into the current table"""
+        old_keys = self._old_keys
+        old_values = self._old_values
+        keys = self.keys
+        values = self.values
+        mask = self.capacity - 1
+        
+        start = self._resize_pos
+        end = len(old_keys) if drain else min(start + self._resize_step, len(old_keys))
+        for i in range(start, end):
+            key = old_keys[i]
+            if key is _EMPTY or key is _DELETED:
+                continue
+            perturb = hash(key) & _HASH_MASK
+            index = perturb & mask
+            while keys[index] is not _EMPTY:
+                perturb >>= 5
+                index = (5 * index + perturb + 1) & mask
+            keys[index] = key
+            values[index] = old_values[i]
+            self.used += 1
+            # Tombstone, not empty, so old-table probes still reach later keys
+            old_keys[i] = _DELETED
+            old_values[i] = None
+        self._resize_pos = end
+        
+        if end == len(old_keys):
+            self._retired.extend((old_keys, old_values))
+            self._old_keys = None
+            self._old_values = None
+            self.generation += 1
+            if self.used > self.capacity * self.MAX_LOAD:
+                self._maybe_resize()
+    
+    def reserve(self, n):
+        """Grow capacity up front so `n` items fit without a resize"""
+        self._reserved = max(self._reserved, n)
+        if self._old_keys is not None:
+            self._advance_resize(drain=True)
         
-        for bucket in old_buckets:
-            for key, value in bucket:
-                self.insert(key, value)
+        capacity = self.capacity
+        while n / capacity > self.MAX_LOAD:
+            capacity *= 2
+        if capacity != self.capacity:
+            self._start_resize(capacity)
+            self._advance_resize(drain=True)
+    
+    def bulk_load(self, items):
+        """
+        Replace contents with `items`, sized so loading never resizes.
+        The fresh table has no tombstones and no resize in progress, so
+        each item is placed by a bare probe loop rather than insert().
+        """
+        items = list(items)
+        self.clear()
+        self.reserve(len(items))
+        
+        keys = self.keys
+        values = self.values
+        mask = len(keys) - 1
+        size = 0
+        total_probes = 0
+        max_probes = self.max_probe_length
+        for key, value in items:
+            perturb = hash(key) & _HASH_MASK
+            index = perturb & mask
+            probes = 1
+            while True:
+                k = keys[index]
+                if k is _EMPTY:
+                    keys[index] = key
+                    values[index] = value
+                    size += 1
+                    break
+                if k is key or k == key:
+                    values[index] = value
+                    break
+                perturb >>= 5
+                index = (5 * index + perturb + 1) & mask
+                probes += 1
+            total_probes += probes
+            if probes > max_probes:
+                max_probes = probes
+        
+        self.size = self.used = size
+        self.total_probes += total_probes
+        self.probe_ops += len(items)
+        self.max_probe_length = max_probes
     
     def get_all_items(self):
         """Get all key-value pairs"""
         items = []
-        for bucket in self.buckets:
-            items.extend(bucket)
+        for keys, values in ((self._old_keys, self._old_values), (self.keys, self.values)):
+            if keys is None:
+                continue
+            for key, value in zip(keys, values):
+                if key is not _EMPTY and key is not _DELETED:
+                    items.append((key, value))
+        return items
+    
+    def range(self, lo=None, hi=None, limit=None):
+        """
+        Items with lo <= key < hi in key order (None = unbounded), at most
+        `limit` of them. A hash table has no key order, so every slot is
+        filtered and the matches sorted: O(n + k log k).
+        """
+        items = [(key, value) for key, value in self.get_all_items()
+                 if (lo is None or key >= lo) and (hi is None or key < hi)]
+        if limit is not None and limit < len(items):
+            return nsmallest(limit, items, key=itemgetter(0))
+        items.sort(key=itemgetter(0))
         return items
     
+    def floor(self, key):
+        """Item with the largest key <= `key`, or None (O(n))"""
+        items = [item for item in self.get_all_items() if item[0] <= key]
+        return max(items, key=itemgetter(0)) if items else None
+    
+    def ceiling(self, key):
+        """Item with the smallest key >= `key`, or None (O(n))"""
+        items = [item for item in self.get_all_items() if item[0] >= key]
+        return min(items, key=itemgetter(0)) if items else None
+    
+    def min(self):
+        """Item with the smallest key, or None (O(n))"""
+        items = self.get_all_items()
+        return min(items, key=itemgetter(0)) if items else None
+    
+    def max(self):
+        """Item with the largest key, or None (O(n))"""
+        items = self.get_all_items()
+        return max(items, key=itemgetter(0)) if items else None
+    
+    def items_from(self, key=None):
+        """Yield items in key order from the first key >= `key`, off a sorted snapshot"""
+        yield from self.range(key)
+    
+    def scan(self, cursor=None, count=100):
+        """
+        Resumable slot scan (old table first while a resize is in flight).
+        Returns up to `count` items and the cursor to resume from, or None
+        once the scan is done. At most 16 * `count` slots are visited per
+        call, so a long empty stretch can return fewer items before the end.
+        A resize starting or finishing between calls restarts the scan, so
+        items may be returned twice but never skipped.
+        """
+        tables = [(self.keys, self.values)]
+        if self._old_keys is not None:
+            tables.insert(0, (self._old_keys, self._old_values))
+        
+        pos = 0
+        if cursor is not None and cursor[0] == self.generation:
+            pos = cursor[1]
+        
+        items = []
+        offset = 0
+        stop = pos + 16 * max(count, 1)
+        for keys, values in tables:
+            table_end = offset + len(keys)
+            end = min(table_end, stop)
+            while pos < end and len(items) < count:
+                key = keys[pos - offset]
+                if key is not _EMPTY and key is not _DELETED:
+                    items.append((key, values[pos - offset]))
+                pos += 1
+            offset = table_end
+        
+        next_cursor = (self.generation, pos) if pos < offset else None
+        return items, next_cursor
+    
     def get_load_factor(self):
         """Current load factor"""
         return self.size / self.capacity if self.capacity > 0 else 0
     
-    def get_collision_rate(self):
-        """Collision rate"""
-        return self.collision_count / self.size if self.size > 0 else 0
+    def get_avg_probe_length(self):
+        """Average slots inspected per lookup"""
+        return self.total_probes / self.probe_ops if self.probe_ops > 0 else 0
+    
+    def get_max_probe_length(self):
+        """Longest probe sequence seen"""
+        return self.max_probe_length
+    
+    def is_resizing(self):
+        """True while an incremental resize is draining the old table"""
+        return self._old_keys is not None
     
     def clear(self):
         """Clear all items"""
-        self.buckets = [[] for _ in range(self.capacity)]
+        self.capacity = self.min_capacity
+        self.keys = [_EMPTY] * self.capacity
+        self.values = [None] * self.capacity
         self.size = 0
-        self.collision_count = 0
\ No newline at end of file
+        self.used = 0
+        self._old_keys = None
+        self._old_values = None
+        self._resize_pos = 0
+        self._next_keys = None
+        self._next_values = None
+        self._retired = []
+        self._reserved = 0
+        self._background = False
+        self.generation += 1
+        self.total_probes = 0
+        self.probe_ops = 0
+        self.max_probe_length = 0
+    
+    def release_step(self, max_items=4096):
+        """
+        clear() in bounded steps: the first call empties the map, and each
+        call frees at most `max_items` slots of the detached tables.
+        Returns True once they are all freed.
+        """
+        if self.size or self.capacity != self.min_capacity or self._retired:
+            tables = [self.keys, self.values, self._old_keys, self._old_values,
+                      self._next_keys, self._next_values]
+            releasing = self._retired + [table for table in tables if table is not None]
+            self.clear()
+            self._releasing.extend(releasing)
+        releasing = self._releasing
+        while releasing and max_items > 0:
+            table = releasing[-1]
+            n = min(max_items, len(table))
+            del table[-n:]
+            max_items -= n
+            if not table:
+                releasing.pop()
+        return not releasing
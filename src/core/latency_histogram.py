@@ -0,0 +1,85 @@
+class LatencyHistogram:
+    """
+    Log-bucketed (HDR-style) latency histogram.
+    Values are recorded in nanoseconds; each power of two is split into
+    2**(precision_bits - 1) buckets, so any reported percentile is within
+    about 1 / 2**(precision_bits - 1) of the true value. Buckets are kept
+    sparsely, so memory depends on the spread of latencies, not the count.
+    """
+    
+    PERCENTILES = (('p50', 50), ('p90', 90), ('p99', 99), ('p999', 99.9))
+    
+    def __init__(self, precision_bits=5):
+        self.precision_bits = precision_bits
+        self.counts = {}  # bucket lower bound (ns) -> count
+        self.count = 0
+        self.total = 0
+        self.max_value = 0
+        self.min_value = None
+    
+    def _bucket_width(self, lower):
+        shift = lower.bit_length() - self.precision_bits
+        return 1 << shift if shift > 0 else 1
+    
+    def record(self, seconds, count=1):
+        """Record a latency (in seconds) `count` times"""
+        value = int(seconds * 1e9)
+        if value < 0:
+            value = 0
+        shift = value.bit_length() - self.precision_bits
+        bucket = (value >> shift) << shift if shift > 0 else value  # Small values are exact
+        self.counts[bucket] = self.counts.get(bucket, 0) + count
+        self.count += count
+        self.total += value * count
+        if value > self.max_value:
+            self.max_value = value
+        if self.min_value is None or value < self.min_value:
+            self.min_value = value
+    
+    def merge(self, other):
+        """Add another histogram's samples into this one"""
+        for bucket, n in other.counts.items():
+            self.counts[bucket] = self.counts.get(bucket, 0) + n
+        self.count += other.count
+        self.total += other.total
+        self.max_value = max(self.max_value, other.max_value)
+        if other.min_value is not None:
+            if self.min_value is None or other.min_value < self.min_value:
+                self.min_value = other.min_value
+        return self
+    
+    def snapshot(self):
+        """Independent copy, safe to merge or keep while recording continues"""
+        copy = LatencyHistogram(self.precision_bits)
+        return copy.merge(self)
+    
+    def percentile(self, p):
+        """Latency (seconds) at or below which p percent of samples fall"""
+        if self.count == 0:
+            return 0.0
+        
+        rank = max(1, -(-self.count * p // 100))  # ceil
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= rank:
+                # Report the bucket's upper edge, never above the real max
+                upper = bucket + self._bucket_width(bucket) - 1
+                return min(upper, self.max_value) / 1e9
+        return self.max_value / 1e9
+    
+    def get_summary(self):
+        """Count, mean, p50/p90/p99/p99.9 and max, in seconds"""
+        summary = {'count': self.count}
+        summary['mean'] = self.total / self.count / 1e9 if self.count else 0.0
+        for name, p in self.PERCENTILES:
+            summary[name] = self.percentile(p)
+        summary['max'] = self.max_value / 1e9
+        return summary
+    
+    def clear(self):
+        self.counts = {}
+        self.count = 0
+        self.total = 0
+        self.max_value = 0
+        self.min_value = None
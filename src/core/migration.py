@@ -0,0 +1,78 @@
+import time
+
+
+class IncrementalMigration:
+    """
+    Copies a source structure into a target a bounded chunk at a time.
+    The owner keeps writing to both structures while the copy runs, so the
+    target is complete as soon as the source scan finishes.
+    """
+    
+    def __init__(self, source, target, source_name, target_name, reason, total_ops,
+                 details=None):
+        self.source = source
+        self.target = target
+        self.source_name = source_name
+        self.target_name = target_name
+        self.reason = reason
+        self.details = details
+        self.started_at_op = total_ops
+        
+        self.cursor = None
+        self.done = False
+        self.items_copied = 0
+        self.steps = 0
+        self.copy_time = 0
+        self.started_at = time.perf_counter()
+    
+    def step(self, max_items=256, time_budget=None, chunk_size=32):
+        """
+        Copy up to `max_items` items, stopping early once `time_budget`
+        seconds have been spent. Returns True when the copy is complete.
+        """
+        if self.done:
+            return True
+        
+        start = time.perf_counter()
+        deadline = start + time_budget if time_budget is not None else None
+        remaining = max_items
+        
+        while remaining > 0:
+            items, self.cursor = self.source.scan(self.cursor, min(chunk_size, remaining))
+            for key, value in items:
+                self.target.insert(key, value)
+            
+            self.items_copied += len(items)
+            remaining -= len(items)
+            
+            if self.cursor is None:
+                self.done = True
+                break
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+        
+        self.steps += 1
+        self.copy_time += time.perf_counter() - start
+        return self.done
+    
+    def get_progress(self):
+        """Progress and ETA of the copy"""
+        total = max(self.source.size, 1)
+        progress = 1.0 if self.done else min(self.items_copied / total, 1.0)
+        remaining = max(self.source.size - self.items_copied, 0)
+        
+        elapsed = time.perf_counter() - self.started_at
+        rate = self.items_copied / elapsed if elapsed > 0 else 0
+        eta = remaining / rate if rate > 0 else None
+        
+        return {
+            'from': self.source_name,
+            'to': self.target_name,
+            'reason': self.reason,
+            'items_copied': self.items_copied,
+            'items_total': self.source.size,
+            'progress': progress,
+            'steps': self.steps,
+            'copy_time': self.copy_time,
+            'eta_seconds': 0 if self.done else eta
+        }
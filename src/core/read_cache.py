@@ -0,0 +1,254 @@
+from collections import OrderedDict
+
+MISSING = object()  # get() result for a key that isn't cached
+
+
+class ReadCache:
+    """
+    Bounded key -> value cache consulted before the active structure.
+    Caches found values only and admits one miss in `admit_every`, so keys
+    read once rarely evict hot ones. Subclasses choose what to evict.
+    """
+    
+    policy = None
+    
+    def __init__(self, capacity=16384, admit_every=4):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        if admit_every < 1:
+            raise ValueError("admit_every must be at least 1")
+        self.capacity = capacity
+        self.admit_every = admit_every
+        self._admit_countdown = 1  # The first miss is admitted
+        
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._window_hits = 0  # hits / misses at the last window_hit_ratio() call
+        self._window_misses = 0
+    
+    def lookup(self, key, load):
+        """The cached value of `key`, or load(key), cached if found"""
+        value = self.get(key)
+        if value is MISSING:
+            value = load(key)
+            if value is not None and self._admit():
+                self.put(key, value)
+        return value
+    
+    def _admit(self):
+        self._admit_countdown -= 1
+        if self._admit_countdown > 0:
+            return False
+        self._admit_countdown = self.admit_every
+        return True
+    
+    def lookup_many(self, keys, load_many):
+        """Values aligned with `keys`; the misses are loaded in one load_many() call"""
+        get = self.get
+        values = [get(key) for key in keys]
+        missed = [i for i, value in enumerate(values) if value is MISSING]
+        if missed:
+            loaded = load_many([keys[i] for i in missed])
+            for i, value in zip(missed, loaded):
+                values[i] = value
+                if value is not None and self._admit():
+                    self.put(keys[i], value)
+        return values
+    
+    def update_many(self, items):
+        for key, value in items:
+            self.update(key, value)
+    
+    def invalidate_many(self, keys):
+        for key in keys:
+            self.invalidate(key)
+    
+    def hit_ratio(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+    
+    def window_hit_ratio(self):
+        """Hit ratio since the previous call (the lifetime ratio if there were no lookups since)"""
+        hits = self.hits - self._window_hits
+        misses = self.misses - self._window_misses
+        self._window_hits = self.hits
+        self._window_misses = self.misses
+        return hits / (hits + misses) if hits + misses else self.hit_ratio()
+    
+    def get_stats(self):
+        return {
+            'policy': self.policy,
+            'capacity': self.capacity,
+            'admit_every': self.admit_every,
+            'size': len(self),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hit_ratio(),
+            'evictions': self.evictions,
+            'invalidations': self.invalidations
+        }
+
+
+class LRUCache(ReadCache):
+    """Evicts the least recently used key; a hit moves its key to the back of an OrderedDict"""
+    
+    policy = 'lru'
+    
+    def __init__(self, capacity=16384, admit_every=4):
+        super().__init__(capacity, admit_every)
+        self._data = OrderedDict()
+    
+    def __len__(self):
+        return len(self._data)
+    
+    def lookup(self, key, load):
+        # get() and put() inlined: this runs on every cached search
+        data = self._data
+        value = data.get(key, MISSING)
+        if value is not MISSING:
+            data.move_to_end(key)
+            self.hits += 1
+            return value
+        self.misses += 1
+        value = load(key)
+        self._admit_countdown -= 1
+        if self._admit_countdown <= 0 and value is not None:
+            self._admit_countdown = self.admit_every
+            data[key] = value
+            if len(data) > self.capacity:
+                data.popitem(last=False)
+                self.evictions += 1
+        return value
+    
+    def get(self, key):
+        value = self._data.get(key, MISSING)
+        if value is MISSING:
+            self.misses += 1
+        else:
+            self._data.move_to_end(key)
+            self.hits += 1
+        return value
+    
+    def put(self, key, value):
+        data = self._data
+        data[key] = value
+        if len(data) > self.capacity:
+            data.popitem(last=False)
+            self.evictions += 1
+    
+    def update(self, key, value):
+        """Refresh the value of `key` if it is cached; uncached keys stay out"""
+        if key in self._data:
+            self._data[key] = value
+    
+    def invalidate(self, key):
+        if self._data.pop(key, MISSING) is not MISSING:
+            self.invalidations += 1
+    
+    def clear(self):
+        self._data.clear()
+
+
+class ClockCache(ReadCache):
+    """
+    CLOCK (second chance): a hit only sets its slot's reference bit, so
+    hits never reorder anything; on a full cache the hand sweeps the
+    slots, clearing bits, and evicts the first key whose bit was clear.
+    """
+    
+    policy = 'clock'
+    
+    def __init__(self, capacity=16384, admit_every=4):
+        super().__init__(capacity, admit_every)
+        self._slots = {}  # key -> slot
+        self._keys = []
+        self._values = []
+        self._referenced = bytearray()
+        self._free = []  # Slots emptied by invalidate()
+        self._hand = 0
+    
+    def __len__(self):
+        return len(self._slots)
+    
+    def lookup(self, key, load):
+        slot = self._slots.get(key)
+        if slot is not None:
+            self._referenced[slot] = 1
+            self.hits += 1
+            return self._values[slot]
+        self.misses += 1
+        value = load(key)
+        self._admit_countdown -= 1
+        if self._admit_countdown <= 0 and value is not None:
+            self._admit_countdown = self.admit_every
+            self.put(key, value)
+        return value
+    
+    def get(self, key):
+        slot = self._slots.get(key)
+        if slot is None:
+            self.misses += 1
+            return MISSING
+        self._referenced[slot] = 1
+        self.hits += 1
+        return self._values[slot]
+    
+    def put(self, key, value):
+        slot = self._slots.get(key)
+        if slot is not None:
+            self._values[slot] = value
+            return
+        if self._free:
+            slot = self._free.pop()
+        elif len(self._keys) < self.capacity:
+            slot = len(self._keys)
+            self._keys.append(None)
+            self._values.append(None)
+            self._referenced.append(0)
+        else:
+            slot = self._evict()
+        self._slots[key] = slot
+        self._keys[slot] = key
+        self._values[slot] = value
+        self._referenced[slot] = 0
+    
+    def _evict(self):
+        """Free the next slot without a second chance; returns it"""
+        referenced = self._referenced
+        hand = self._hand
+        while referenced[hand]:
+            referenced[hand] = 0
+            hand = (hand + 1) % self.capacity
+        self._hand = (hand + 1) % self.capacity
+        del self._slots[self._keys[hand]]
+        self.evictions += 1
+        return hand
+    
+    def update(self, key, value):
+        """Refresh the value of `key` if it is cached; uncached keys stay out"""
+        slot = self._slots.get(key)
+        if slot is not None:
+            self._values[slot] = value
+    
+    def invalidate(self, key):
+        slot = self._slots.pop(key, None)
+        if slot is not None:
+            self._keys[slot] = None
+            self._values[slot] = None
+            self._referenced[slot] = 0
+            self._free.append(slot)
+            self.invalidations += 1
+    
+    def clear(self):
+        self._slots.clear()
+        self._keys.clear()
+        self._values.clear()
+        self._referenced.clear()
+        self._free.clear()
+        self._hand = 0
+
+
+POLICIES = {'lru': LRUCache, 'clock': ClockCache}
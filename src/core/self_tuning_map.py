@@ -1,154 +1,1139 @@
 from .bst import BST
 from .avl import AVL
+from .bplustree import BPlusTree
 from .hashmap import HashMap
+from .sorted_array_map import SortedArrayMap, HAS_NUMPY
 from .stats_collector import StatsCollector
 from .decision_engine import DecisionEngine
+from .migration import IncrementalMigration
+from .shadow import ShadowEvaluator
+from .read_cache import ClockCache
+from .bloom_filter import CountingBloomFilter
+from .snapshot import write_snapshot, read_snapshot
+from . import trace as tr
+from operator import itemgetter
+import random
 import time
 
 
+# How a sampled operation is recorded; unsampled ones are only counted
+_TIMED = 2      # perf_counter_ns timing + full stats record
+_RECORDED = 1   # full stats record without timing
+_OFF = 0        # totals only
+
+INSTRUMENTATION_LEVELS = ('full', 'sampled', 'counters', 'off')
+
+_INT64_MIN = -(1 << 63)
+_INT64_MAX = (1 << 63) - 1
+
+
+def _in_cell(name):
+    """Property over the fast paths' closure cell `name`"""
+    return property(lambda self: self._cells[name].cell_contents,
+                    lambda self, value: setattr(self._cells[name], 'cell_contents', value))
+
+
 class SelfTuningMap:
     """
     Main orchestrator - the self-tuning data structure.
-    Automatically switches between BST, AVL, and HashMap based on workload.
+    Automatically switches between BST, AVL, B+ Tree and HashMap based on workload.
+    
+    migration_mode='blocking' copies inside the operation that triggers a
+    switch; 'incremental' copies `migration_batch_size` items per operation.
+    instrumentation is 'full', 'sampled' (one op in `sample_rate`), 'counters'
+    or 'off'. shadow, wal, cache and bloom take an optional ShadowEvaluator,
+    WriteAheadLog, ReadCache and CountingBloomFilter (True for the default).
     """
     
-    def __init__(self, initial_structure='BST'):
-        # Initialize with BST by default
+    BACKENDS = {'BST': BST, 'AVL': AVL, 'BPlusTree': BPlusTree, 'HashMap': HashMap}
+    BACKEND_METHODS = ('insert', 'search', 'delete', 'get_all_items', 'bulk_load', 'scan', 'clear')
+    ORDERED_STRUCTURES = ('BST', 'AVL', 'BPlusTree')  # Keep keys sorted, report a height
+    CACHED_STRUCTURES = ('BST', 'AVL', 'BPlusTree')  # Searches go through the read cache
+    INT64_STRUCTURES = ('SortedArray',)  # Only hold int64 keys
+    INT64_FALLBACK = 'BPlusTree'  # Where a key they can't hold sends the map (if it orders vs ints)
+    MIN_PHASE_OPS = 30  # Fewest recent ops kept in the stats windows after a change
+    BATCH_SAMPLE = 16  # Keys per batch that feed the windows and shadow
+    DETECT_INTERVAL = 16  # Recorded ops between change detector samples
+    COUNTDOWNS = {op: (f'_{op}_left', f'_{op}_gap')  # Sampling state attributes per op type
+                  for op in ('insert', 'search', 'delete', 'range')}
+    FILTER_RESIZE_STEP = 8  # Stored keys refilled into a growing Bloom filter per key written
+    RELEASE_CHUNK = 512  # Items of a retired structure freed between deadline checks
+    
+    # Countdowns of the bound fast paths (see _bind_fast_paths)
+    _insert_left = _in_cell('insert_left')
+    _search_left = _in_cell('search_left')
+    _delete_left = _in_cell('delete_left')
+    
+    def __init__(self, initial_structure='BST', migration_mode='blocking',
+                 migration_batch_size=256, migration_time_budget=None,
+                 instrumentation='full', sample_rate=1024, decision_engine=None,
+                 shadow=None, wal=None, cache=None, bloom=None):
+        if migration_mode not in ('blocking', 'incremental'):
+            raise ValueError(f"Unknown migration mode: {migration_mode}")
+        if instrumentation not in INSTRUMENTATION_LEVELS:
+            raise ValueError(f"Unknown instrumentation level: {instrumentation}")
+        if initial_structure not in self.BACKENDS:
+            raise ValueError(f"Unknown structure: {initial_structure}")
+        
+        # Initialize with BST by default; other structures are built on demand
         self.current_structure = initial_structure
-        self.structures = {
-            'BST': BST(),
-            'AVL': AVL(),
-            'HashMap': HashMap()
-        }
-        self.active_ds = self.structures[initial_structure]
+        self.active_ds = self._new_structure(initial_structure)
         
         # Monitoring components
         self.stats = StatsCollector()
-        self.decision_engine = DecisionEngine()
+        self.stats.set_structure(initial_structure)
+        self.decision_engine = decision_engine or DecisionEngine()
+        self.instrumentation = instrumentation
+        self.sample_rate = max(1, sample_rate)
+        self._next_detect = 0  # recorded_ops at which the change detector is next fed
+        # Per op type: ops left until the next recorded one, counting down
+        # from `gap`; the difference is the fast-path ops not yet counted
+        self._bind_fast_paths()
+        self._insert_gap = self._search_gap = self._delete_gap = 1
+        self._range_left = self._range_gap = 1
+        self.shadow = ShadowEvaluator() if shadow is True else shadow
+        self.wal = wal
+        if wal is not None:
+            wal.state_source = self._snapshot_state
+        self.trace = None
+        self.cache = ClockCache() if cache is True else cache
+        self.bloom = CountingBloomFilter() if bloom is True else bloom
+        self._filter_cursor = None  # Scan position of a stepped Bloom filter resize
+        self._route_reads()
+        
+        # Migration
+        self.migration_mode = migration_mode
+        self.migration_batch_size = migration_batch_size
+        self.migration_time_budget = migration_time_budget
+        self.migration = None
+        self.retired = []  # Structures no longer live, freed a step per operation
+        self._route_writes()
         
         # Metrics
         self.migration_count = 0
+        self.aborted_migrations = 0
         self.total_migration_time = 0
+        self.peak_items_held = 0  # Most items held across all live structures at once
+    
+    @classmethod
+    def register_backend(cls, name, factory, ordered=False):
+        """
+        Make another structure available to migrations and force_switch().
+        `factory()` must return an empty structure with a `size` attribute
+        and the BACKEND_METHODS; `ordered` marks one whose get_all_items()
+        and scan() return keys in sorted order. The DecisionEngine only
+        proposes the structures its cost model knows about.
+        """
+        ds = factory()
+        missing = [m for m in cls.BACKEND_METHODS if not callable(getattr(ds, m, None))]
+        if missing or not hasattr(ds, 'size'):
+            raise TypeError(f"Backend {name} is missing {', '.join(missing) or 'size'}")
+        
+        # Copy rather than mutate, so a subclass's registry stays its own
+        cls.BACKENDS = {**cls.BACKENDS, name: factory}
+        if ordered and name not in cls.ORDERED_STRUCTURES:
+            cls.ORDERED_STRUCTURES = cls.ORDERED_STRUCTURES + (name,)
+    
+    def _new_structure(self, name):
+        """Create an empty backend structure"""
+        return self.BACKENDS[name]()
+    
+    def _route_reads(self):
+        """Send searches through the cache only while a tree is active"""
+        cached = self.cache is not None and self.current_structure in self.CACHED_STRUCTURES
+        self._read_cache = self.cache if cached else None
+        self._guarded = cached or self.bloom is not None
+    
+    def _route_writes(self):
+        """Check inserted keys while an int64-only structure is active or being filled"""
+        target = self.migration.target_name if self.migration is not None else None
+        int64 = self.INT64_STRUCTURES
+        self._int64_only = self.current_structure in int64 or target in int64
+        self._route_ops()
+    
+    def _check_key(self, key):
+        """Note a key that isn't an int64 and move off an int64-only structure before it arrives"""
+        if type(key) is int and _INT64_MIN <= key <= _INT64_MAX:
+            return
+        self.stats.int_keys = False
+        if not self._int64_only:
+            return
+        reason = f"Key {key!r} is not an int64"
+        if self.migration is not None:
+            self._abort_migration(reason)
+        if self.current_structure in self.INT64_STRUCTURES:
+            try:
+                key < 0
+                target = self.INT64_FALLBACK
+            except TypeError:
+                target = 'HashMap'  # Can't be ordered against the int keys already held
+            self._rebuild_as(target, reason, self.stats.total_ops)
+    
+    def _guarded_search(self, key):
+        """Search through the read cache and the Bloom filter, whichever are on"""
+        load = self.active_ds.search if self.bloom is None else self._filtered_search
+        cache = self._read_cache
+        return load(key) if cache is None else cache.lookup(key, load)
+    
+    def _filtered_search(self, key):
+        bloom = self.bloom
+        if not bloom.might_contain(key):
+            bloom.negatives += 1
+            return None
+        result = self.active_ds.search(key)
+        if result is None:
+            bloom.false_positives += 1
+        return result
+    
+    def _filter_add(self, key):
+        bloom = self.bloom
+        bloom.add(key)
+        if bloom.pending is not None:
+            self._resize_filter_step(self.FILTER_RESIZE_STEP)
+        elif bloom.count > bloom.capacity:
+            self._start_filter_resize()
+    
+    def _filter_remove(self, key):
+        bloom = self.bloom
+        bloom.remove(key)
+        if bloom.pending is not None:
+            self._resize_filter_step(self.FILTER_RESIZE_STEP)
+    
+    def _start_filter_resize(self):
+        """Start growing the Bloom filter over the active structure's keys, a slice per write"""
+        self.bloom.start_resize(self.active_ds.size)
+        self._filter_cursor = None
+        self._resize_filter_step(self.FILTER_RESIZE_STEP)
+    
+    def _resize_filter_step(self, n):
+        items, self._filter_cursor = self.active_ds.scan(self._filter_cursor, n)
+        self.bloom.refill(key for key, _ in items)
+        if self._filter_cursor is None:
+            self.bloom.finish_resize(self.active_ds.size)
+    
+    def _rebuild_filter(self, items=None):
+        """Resize the Bloom filter for the current keys and refill it"""
+        items = self.active_ds.get_all_items() if items is None else items
+        self.bloom.rebuild(key for key, _ in items)
+    
+    def _note_memory(self, items_held):
+        if items_held > self.peak_items_held:
+            self.peak_items_held = items_held
+    
+    def _route_ops(self):
+        """
+        Point unsampled operations straight at the active structure, unless
+        a trace, cache, filter, log, migration or release has to see them.
+        """
+        ds = self.active_ds
+        busy = self.trace is not None or self.migration is not None or bool(self.retired)
+        self._search = self._search_unsampled if busy or self._guarded else ds.search
+        extras = (busy or self._int64_only or self.cache is not None or self.bloom is not None
+                  or self.wal is not None)
+        self._insert = self._insert_unsampled if extras else ds.insert
+        self._delete = self._delete_unsampled if extras else ds.delete
+        cells = self._cells
+        cells['insert_route'].cell_contents = self._insert
+        cells['search_route'].cell_contents = self._search
+        cells['delete_route'].cell_contents = self._delete
+    
+    # Unsampled fast paths: count the operation and call the route
+    
+    def _bind_fast_paths(self):
+        """
+        Bind insert, search and delete on the instance as closures, whose
+        countdown and route sit in cells: cheaper per operation than the
+        attributes the methods below use. A subclass that overrides one
+        keeps its own; either way the countdowns share the cells.
+        """
+        stats = self.stats
+        check_key = self._check_key
+        monitored_insert = self._monitored_insert
+        monitored_search = self._monitored_search
+        monitored_delete = self._monitored_delete
+        insert_left = search_left = delete_left = 1
+        insert_route = search_route = delete_route = None  # Set by _route_ops
+        
+        def insert(key, value):
+            """Insert operation with monitoring"""
+            nonlocal insert_left
+            left = insert_left - 1
+            if left:
+                insert_left = left
+                if type(key) is not int and stats.int_keys:
+                    check_key(key)
+                return insert_route(key, value)
+            return monitored_insert(key, value)
+        
+        def search(key):
+            """Search operation with monitoring"""
+            nonlocal search_left
+            left = search_left - 1
+            if left:
+                search_left = left
+                return search_route(key)
+            return monitored_search(key)
+        
+        def delete(key):
+            """Delete operation with monitoring"""
+            nonlocal delete_left
+            left = delete_left - 1
+            if left:
+                delete_left = left
+                return delete_route(key)
+            return monitored_delete(key)
+        
+        self._cells = {}
+        for fast_path in (insert, search, delete):
+            self._cells.update(zip(fast_path.__code__.co_freevars, fast_path.__closure__))
+            name = fast_path.__name__
+            if getattr(type(self), name) is getattr(SelfTuningMap, name):
+                setattr(self, name, fast_path)
     
     def insert(self, key, value):
         """Insert operation with monitoring"""
-        start = time.time()
+        left = self._insert_left - 1
+        if left:
+            self._insert_left = left
+            if type(key) is not int and self.stats.int_keys:
+                self._check_key(key)
+            return self._insert(key, value)
+        return self._monitored_insert(key, value)
+    
+    def search(self, key):
+        """Search operation with monitoring"""
+        left = self._search_left - 1
+        if left:
+            self._search_left = left
+            return self._search(key)
+        return self._monitored_search(key)
+    
+    def delete(self, key):
+        """Delete operation with monitoring"""
+        left = self._delete_left - 1
+        if left:
+            self._delete_left = left
+            return self._delete(key)
+        return self._monitored_delete(key)
+    
+    def _insert_unsampled(self, key, value):
+        if self.trace is not None:
+            self.trace.record(tr.INSERT, key)
+        if self._int64_only:
+            self._check_key(key)
         result = self.active_ds.insert(key, value)
-        duration = time.time() - start
+        if self.cache is not None:
+            self.cache.update(key, value)
+        if self.bloom is not None and result is not False:
+            self._filter_add(key)
+        if self.migration is not None:
+            self.migration.target.insert(key, value)
+            self._advance_migration()
+        elif self.retired:
+            self._advance_release()
+        if self.wal is not None:
+            self.wal.log_insert(key, value)
+        return result
+    
+    def _search_unsampled(self, key):
+        if self.trace is not None:
+            self.trace.record(tr.SEARCH, key)
+        if self.migration is not None:
+            self._advance_migration()
+        elif self.retired:
+            self._advance_release()
+        if self._guarded:
+            return self._guarded_search(key)
+        return self.active_ds.search(key)
+    
+    def _delete_unsampled(self, key):
+        if self.trace is not None:
+            self.trace.record(tr.DELETE, key)
+        result = self.active_ds.delete(key)
+        if self.cache is not None:
+            self.cache.invalidate(key)
+        if result and self.bloom is not None:
+            self._filter_remove(key)
+        if self.migration is not None:
+            self.migration.target.delete(key)
+            self._advance_migration()
+        elif self.retired:
+            self._advance_release()
+        if result and self.wal is not None:
+            self.wal.log_delete(key)
+        return result
+    
+    # Sampled operations: timed, recorded and followed by the switch check
+    
+    def _monitored_insert(self, key, value):
+        if self.trace is not None:
+            self.trace.record(tr.INSERT, key)
+        if self._int64_only or (type(key) is not int and self.stats.int_keys):
+            self._check_key(key)
+        mode = self._op_mode('insert')
+        start = time.perf_counter_ns() if mode == _TIMED else 0
+        result = self.active_ds.insert(key, value)
+        if self.cache is not None:
+            self.cache.update(key, value)
+        if self.bloom is not None and result is not False:
+            self._filter_add(key)
+        if self.migration is not None:
+            self.migration.target.insert(key, value)
         
-        self.stats.record_insert(key, duration)
+        self._record('insert', key, mode, start, value)
+        if self.wal is not None:
+            self.wal.log_insert(key, value)
         self._maybe_switch()
         return result
     
-    def search(self, key):
-        """Search operation with monitoring"""
-        start = time.time()
-        result = self.active_ds.search(key)
-        duration = time.time() - start
+    def _monitored_search(self, key):
+        if self.trace is not None:
+            self.trace.record(tr.SEARCH, key)
+        mode = self._op_mode('search')
+        start = time.perf_counter_ns() if mode == _TIMED else 0
+        if self._guarded:
+            result = self._guarded_search(key)
+        else:
+            result = self.active_ds.search(key)
         
-        self.stats.record_search(key, duration)
+        self._record('search', key, mode, start)
         self._maybe_switch()
         return result
     
-    def delete(self, key):
-        """Delete operation with monitoring"""
-        start = time.time()
+    def _monitored_delete(self, key):
+        if self.trace is not None:
+            self.trace.record(tr.DELETE, key)
+        mode = self._op_mode('delete')
+        start = time.perf_counter_ns() if mode == _TIMED else 0
         result = self.active_ds.delete(key)
-        duration = time.time() - start
+        if self.cache is not None:
+            self.cache.invalidate(key)
+        if result and self.bloom is not None:
+            self._filter_remove(key)
+        if self.migration is not None:
+            self.migration.target.delete(key)
         
-        self.stats.record_delete(key, duration)
+        self._record('delete', key, mode, start)
+        if result and self.wal is not None:
+            self.wal.log_delete(key)
         self._maybe_switch()
         return result
     
-    def _maybe_switch(self):
-        """Check if we should switch data structures"""
-        total_ops = self.stats.total_inserts + self.stats.total_searches + self.stats.total_deletes
+    def range(self, lo=None, hi=None, limit=None):
+        """Items with lo <= key < hi in key order (None = unbounded), at most `limit`"""
+        items = self._ordered_read(lo, 'range', lo, hi, limit)
+        self.stats.record_range_items(len(items))
+        if self.trace is not None:
+            self.trace.record(tr.RANGE, lo, len(items))
+        return items
+    
+    def floor(self, key):
+        """Item with the largest key <= `key`, or None"""
+        if self.trace is not None:
+            self.trace.record(tr.FLOOR, key)
+        return self._ordered_read(key, 'floor', key)
+    
+    def ceiling(self, key):
+        """Item with the smallest key >= `key`, or None"""
+        if self.trace is not None:
+            self.trace.record(tr.CEILING, key)
+        return self._ordered_read(key, 'ceiling', key)
+    
+    def min(self):
+        """Item with the smallest key, or None"""
+        if self.trace is not None:
+            self.trace.record(tr.MIN, None)
+        return self._ordered_read(None, 'min')
+    
+    def max(self):
+        """Item with the largest key, or None"""
+        if self.trace is not None:
+            self.trace.record(tr.MAX, None)
+        return self._ordered_read(None, 'max')
+    
+    def items_from(self, key=None, chunk_size=64):
+        """
+        Lazily iterate items in key order from the first key >= `key`
+        (None = from the smallest). Monitored as one ordered read. Each chunk
+        of `chunk_size` items comes from whichever structure is active at
+        the time, so iteration survives switches and interleaved writes.
+        """
+        if self.trace is not None:
+            self.trace.record(tr.ITERATE, key)
+        self._ordered_read(key, None)
+        return self._iterate_from(key, chunk_size)
+    
+    def _iterate_from(self, key, chunk_size):
+        items = self.active_ds.range(key, None, chunk_size)
+        while items:
+            self.stats.record_range_items(len(items))
+            yield from items
+            if len(items) < chunk_size:
+                return
+            last = items[-1][0]
+            items = self.active_ds.range(last, None, chunk_size + 1)
+            if items and items[0][0] == last:
+                items = items[1:]
+    
+    def _ordered_read(self, key, method, *args):
+        """Run an ordered read on the active structure, monitored as a 'range' op"""
+        left = self._range_left - 1
+        if left:
+            self._range_left = left
+            if self.migration is not None:
+                self._advance_migration()
+            elif self.retired:
+                self._advance_release()
+            return getattr(self.active_ds, method)(*args) if method else None
+        
+        mode = self._op_mode('range')
+        start = time.perf_counter_ns() if mode == _TIMED else 0
+        result = getattr(self.active_ds, method)(*args) if method else None
+        
+        self._record('range', key, mode, start)
+        self._maybe_switch()
+        return result
+    
+    def insert_many(self, items):
+        """
+        Insert a batch of (key, value) pairs; returns bools aligned with
+        `items` (True = new key). Timing, stats and the switch check run once
+        for the whole batch.
+        """
+        items = list(items)
+        if not items:
+            return []
+        if self.trace is not None:
+            self.trace.record_many(tr.INSERT, [key for key, _ in items])
+        if self._int64_only:
+            for key, _ in items:
+                self._check_key(key)
+        
+        mode = self._op_mode('insert')
+        start = time.perf_counter_ns() if mode == _TIMED else 0
+        results = self.active_ds.insert_many(items)
+        if self.cache is not None:
+            self.cache.update_many(items)
+        if self.bloom is not None:
+            self._filter_add_many(items, results)
+        if self.migration is not None:
+            self.migration.target.insert_many(items)
+        
+        self._record_batch('insert', [key for key, _ in items], mode, start, items)
+        if self.wal is not None:
+            self.wal.log_insert_many(items)
+        self._maybe_switch(len(items))
+        return results
+    
+    def search_many(self, keys):
+        """Look up a batch of keys; returns values (None if missing) aligned with `keys`"""
+        keys = list(keys)
+        if not keys:
+            return []
+        if self.trace is not None:
+            self.trace.record_many(tr.SEARCH, keys)
+        
+        mode = self._op_mode('search')
+        start = time.perf_counter_ns() if mode == _TIMED else 0
+        if self._guarded:
+            results = self._guarded_search_many(keys)
+        else:
+            results = self.active_ds.search_many(keys)
+        
+        self._record_batch('search', keys, mode, start)
+        self._maybe_switch(len(keys))
+        return results
+    
+    def _guarded_search_many(self, keys):
+        load = self.active_ds.search_many if self.bloom is None else self._filtered_search_many
+        cache = self._read_cache
+        return load(keys) if cache is None else cache.lookup_many(keys, load)
+    
+    def _filtered_search_many(self, keys):
+        """search_many for the keys the Bloom filter doesn't rule out; None for the rest"""
+        bloom = self.bloom
+        might_contain = bloom.might_contain
+        passed = [i for i, key in enumerate(keys) if might_contain(key)]
+        results = [None] * len(keys)
+        if passed:
+            for i, value in zip(passed, self.active_ds.search_many([keys[i] for i in passed])):
+                results[i] = value
+                if value is None:
+                    bloom.false_positives += 1
+        bloom.negatives += len(keys) - len(passed)
+        return results
+    
+    def _filter_add_many(self, items, results):
+        bloom = self.bloom
+        for (key, _), inserted in zip(items, results):
+            if inserted is not False:
+                bloom.add(key)
+        self._filter_batch_step(len(items))
+    
+    def _filter_batch_step(self, n):
+        bloom = self.bloom
+        if bloom.pending is None and bloom.count > bloom.capacity:
+            self._start_filter_resize()
+        if bloom.pending is not None:
+            self._resize_filter_step(self.FILTER_RESIZE_STEP * n)
+    
+    def delete_many(self, keys):
+        """Delete a batch of keys; returns bools aligned with `keys`"""
+        keys = list(keys)
+        if not keys:
+            return []
+        if self.trace is not None:
+            self.trace.record_many(tr.DELETE, keys)
+        
+        mode = self._op_mode('delete')
+        start = time.perf_counter_ns() if mode == _TIMED else 0
+        results = self.active_ds.delete_many(keys)
+        if self.cache is not None:
+            self.cache.invalidate_many(keys)
+        if self.bloom is not None:
+            for key, deleted in zip(keys, results):
+                if deleted:
+                    self.bloom.remove(key)
+            self._filter_batch_step(len(keys))
+        if self.migration is not None:
+            self.migration.target.delete_many(keys)
+        
+        self._record_batch('delete', keys, mode, start)
+        if self.wal is not None:
+            self.wal.log_delete_many([key for key, deleted in zip(keys, results) if deleted])
+        self._maybe_switch(len(keys))
+        return results
+    
+    def _op_mode(self, op):
+        """How to record this `op`; also schedules the next recorded op of its type"""
+        left, drawn = self.COUNTDOWNS[op]
+        unsampled = getattr(self, drawn) - getattr(self, left)
+        if unsampled:
+            self.stats.count(op, unsampled)
+        level = self.instrumentation
+        if level == 'sampled':
+            # Random gaps with mean sample_rate, so periodic workloads can't alias
+            gap = int(random.random() * (2 * self.sample_rate - 1)) + 1
+            mode = _TIMED
+        elif level == 'off':
+            gap, mode = 1 << 29, _OFF  # Still a one-digit int, so cheap to count down
+        else:
+            gap, mode = 1, _TIMED if level == 'full' else _RECORDED
+        setattr(self, left, gap)
+        setattr(self, drawn, gap)
+        return mode
+    
+    def _record(self, op, key, mode, start, value=None):
+        if mode == _TIMED:
+            duration = (time.perf_counter_ns() - start) / 1e9
+            self.stats.record(op, key, duration)
+            if self.shadow is not None:
+                self.shadow.observe(op, key, value, duration)
+        elif mode == _RECORDED:
+            duration = None
+            self.stats.record(op, key)
+        else:
+            self.stats.count(op)
+        
+        if self.stats.recorded_ops >= self._next_detect and mode != _OFF:
+            self._detect_change()
+    
+    def _detect_change(self):
+        """Feed the change detector the aggregates of the last DETECT_INTERVAL recorded ops"""
+        self._flush_unsampled()
+        stats = self.stats
+        self._next_detect = stats.recorded_ops + self.DETECT_INTERVAL
+        if not self.decision_engine.adaptive:
+            return
+        change = self.decision_engine.observe(stats.get_totals(), stats.total_ops)
+        if change is not None and change['signal'] != 'latency':
+            # Judge the new phase on its own operations only
+            stats.keep_recent(max(change['age'], self.MIN_PHASE_OPS),
+                              key_order=change['signal'] == 'order')
+    
+    def _record_batch(self, op, keys, mode, start, items=None):
+        """
+        Record a batch: totals and latency cover every key, while windows
+        and shadow see only its last BATCH_SAMPLE keys.
+        """
+        if mode == _TIMED:
+            duration = (time.perf_counter_ns() - start) / 1e9
+            self.stats.record_batch(op, keys, duration, self.BATCH_SAMPLE)
+        elif mode == _RECORDED:
+            duration = None
+            self.stats.record_batch(op, keys, sample=self.BATCH_SAMPLE)
+        else:
+            self.stats.count(op, len(keys))
+        if mode == _OFF:
+            return
+        
+        n = len(keys)
+        if duration is not None and self.shadow is not None:
+            per_op = duration / n
+            for i in range(max(n - self.BATCH_SAMPLE, 0), n):
+                self.shadow.observe(op, keys[i], items[i][1] if items else None, per_op)
+        if self.stats.recorded_ops >= self._next_detect:
+            self._detect_change()
+    
+    def _flush_unsampled(self):
+        """
+        Fold fast-path op counts into the StatsCollector totals. A recorded
+        op folds those of its own type; the rest wait for a reader.
+        """
+        left = self._insert_left
+        if self._insert_gap != left:
+            self.stats.count('insert', self._insert_gap - left)
+            self._insert_gap = left
+        left = self._search_left
+        if self._search_gap != left:
+            self.stats.count('search', self._search_gap - left)
+            self._search_gap = left
+        left = self._delete_left
+        if self._delete_gap != left:
+            self.stats.count('delete', self._delete_gap - left)
+            self._delete_gap = left
+        left = self._range_left
+        if self._range_gap != left:
+            self.stats.count('range', self._range_gap - left)
+            self._range_gap = left
+    
+    def _advance_migration(self, ops=1):
+        if self.migration_batch_size > 0:
+            self.migration_step(self.migration_batch_size * ops, self.migration_time_budget)
+    
+    def _advance_release(self, ops=1):
+        if self.migration_batch_size > 0:
+            self.release_step(self.migration_batch_size * ops, self.migration_time_budget)
+    
+    def _maybe_switch(self, ops=1):
+        """Check if we should switch data structures (after `ops` operations)"""
+        total_ops = self.stats.total_ops
+        
+        if self.migration is not None:
+            if not self._veto_migration():
+                self._advance_migration(ops)
+        elif self.retired:
+            self._advance_release(ops)
+        
+        if self.instrumentation == 'off':
+            return
         
         if not self.decision_engine.should_check(total_ops):
             return
+        self._flush_unsampled()
+        total_ops = self.stats.total_ops
         
         # Get current stats
         stats_summary = self.stats.get_summary()
+        if self.cache is not None:
+            stats_summary['cache_hit_ratio'] = self.cache.window_hit_ratio()
+            stats_summary['cached_structures'] = self.CACHED_STRUCTURES
         
         # Get current height if tree-based
         current_height = None
-        if self.current_structure in ['BST', 'AVL']:
-            current_height = self.active_ds.get_height()
+        probe_length = None
+        if self.current_structure in self.ORDERED_STRUCTURES:
+            current_height = self._tree_height()
+        elif self.current_structure == 'HashMap':
+            probe_length = self.active_ds.get_avg_probe_length()
         
         # Ask decision engine
         should_switch, target, reason = self.decision_engine.decide_structure(
             self.current_structure,
             stats_summary,
-            current_height
+            current_height,
+            self.active_ds.size,
+            probe_length,
+            self.shadow
         )
         
+        if self.migration is not None:
+            # Keep going only while the engine still wants this target
+            if should_switch and target == self.migration.target_name:
+                return
+            self._abort_migration(f"DecisionEngine now prefers {target}" if should_switch else reason)
+        
         if should_switch and target != self.current_structure:
-            self._migrate_to(target, reason, total_ops)
+            self._migrate_to(target, reason, total_ops, self.decision_engine.last_decision)
+    
+    def _tree_height(self):
+        """Height of the active tree, or the O(1) upper bound a backend keeps instead"""
+        get_bound = getattr(self.active_ds, 'get_height_bound', None)
+        return get_bound() if get_bound is not None else self.active_ds.get_height()
     
-    def _migrate_to(self, target_structure, reason, total_ops):
+    def _migrate_to(self, target_structure, reason, total_ops, details=None):
         """Migrate data to new structure"""
+        if self.migration_mode == 'incremental':
+            self._start_migration(target_structure, reason, total_ops, details)
+            return
+        self._rebuild_as(target_structure, reason, total_ops, details)
+    
+    def _rebuild_as(self, target_structure, reason, total_ops, details=None):
+        """Blocking migration: copy everything into the target inside this call"""
         print(f"\n🔄 SWITCHING: {self.current_structure} → {target_structure}")
         print(f"   Reason: {reason}")
         
         start = time.time()
         
-        # Get all data from current structure
-        items = self.active_ds.get_all_items()
+        # Get all data from current structure (trees already yield key order)
+        source = self.active_ds
+        items = source.get_all_items()
+        ordered = self.ORDERED_STRUCTURES
+        if self.current_structure not in ordered and target_structure in ordered:
+            items.sort(key=itemgetter(0))
+        self._note_memory(source.size + len(items))
         
-        # Clear target structure and insert all items
-        target_ds = self.structures[target_structure]
-        target_ds.clear()
+        # Release the source first: the item list is the one transient copy
+        source.clear()
         
-        for key, value in items:
-            target_ds.insert(key, value)
+        # Rebuild target in one pass: balanced trees in O(n), presized HashMap
+        target_ds = self._new_structure(target_structure)
+        try:
+            target_ds.bulk_load(items)
+        except TypeError:
+            source.bulk_load(items)
+            if target_structure not in self.INT64_STRUCTURES:
+                raise
+            # A key that doesn't fit: keep the source, and stop proposing the target
+            self.stats.int_keys = False
+            self.aborted_migrations += 1
+            print(f"   Migration to {target_structure} aborted: keys are not all int64\n")
+            return
+        except Exception:
+            source.bulk_load(items)
+            raise
+        self._note_memory(target_ds.size + len(items))
         
         # Switch active structure
+        from_structure = self.current_structure
         self.current_structure = target_structure
         self.active_ds = target_ds
+        self.stats.set_structure(target_structure)
+        self._route_reads()
+        self._route_writes()
+        if self.bloom is not None:
+            self._rebuild_filter(items)  # Free resize: every key is listed already
         
         # Record metrics
         migration_time = time.time() - start
+        self.stats.record_migration_pause(migration_time)
         self.migration_count += 1
         self.total_migration_time += migration_time
         
+        self.decision_engine.cost_model.observe_migration(
+            from_structure, target_structure, len(items), migration_time
+        )
         self.decision_engine.record_switch(
-            self.current_structure,
+            from_structure,
             target_structure,
             reason,
-            total_ops
+            total_ops,
+            details
         )
         
         print(f"   Migration completed in {migration_time*1000:.2f}ms")
         print(f"   Migrated {len(items)} items\n")
     
+    def _start_migration(self, target_structure, reason, total_ops, details=None):
+        """Begin an incremental migration; reads stay on the source until commit"""
+        print(f"\n🔄 SWITCHING (incremental): {self.current_structure} → {target_structure}")
+        print(f"   Reason: {reason}")
+        
+        target_ds = self._new_structure(target_structure)
+        self._prepare_target(target_ds, self.active_ds.size)
+        
+        self.migration = IncrementalMigration(
+            self.active_ds,
+            target_ds,
+            self.current_structure,
+            target_structure,
+            reason,
+            total_ops,
+            details
+        )
+        self._route_writes()
+    
+    def _prepare_target(self, target_ds, n):
+        """Presize a migration target for `n` items, if it supports that"""
+        if hasattr(target_ds, 'reserve'):
+            target_ds.reserve(n)
+    
+    def _release(self, ds):
+        """Retire a structure that is no longer live; later operations free it"""
+        self.retired.append(ds)
+        self._route_ops()
+    
+    def release_step(self, max_items, time_budget=None):
+        """
+        Free up to `max_items` items of retired structures, stopping early
+        once `time_budget` seconds have been spent. Backends without a
+        release_step() are cleared in one go. Returns True once nothing is
+        left to free.
+        """
+        deadline = time.perf_counter() + time_budget if time_budget is not None else None
+        remaining = max_items
+        while self.retired and remaining > 0:
+            ds = self.retired[0]
+            release_step = getattr(ds, 'release_step', None)
+            step = min(self.RELEASE_CHUNK, remaining)
+            if release_step is None:
+                ds.clear()
+                done = True
+            else:
+                done = release_step(step)
+            remaining -= step
+            if done:
+                self.retired.pop(0)
+                if not self.retired:
+                    self._route_ops()
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+        return not self.retired
+    
+    def migration_step(self, max_items=None, time_budget=None):
+        """
+        Advance an in-flight incremental migration.
+        Commits the switch once the copy is complete. Returns True if no
+        migration is left in flight.
+        """
+        if self.migration is None:
+            return True
+        
+        if max_items is None:
+            max_items = self.migration_batch_size
+        copy_time = self.migration.copy_time
+        try:
+            done = self.migration.step(max_items, time_budget)
+        except TypeError:
+            if self.migration.target_name not in self.INT64_STRUCTURES:
+                raise
+            self.stats.int_keys = False
+            self._abort_migration("Keys are not all int64")
+            return True
+        self.stats.record_migration_pause(self.migration.copy_time - copy_time)
+        if done and not self._veto_migration():
+            self._commit_migration()
+        return done
+    
+    def _veto_migration(self):
+        """Abort the migration if the range veto now rules out its target; True if it did"""
+        target = self.migration.target_name
+        if not self.decision_engine.rules_out(target, self.stats.get_range_ratio()):
+            return False
+        self._abort_migration(f"Range-heavy workload rules out {target}")
+        return True
+    
+    def _commit_migration(self):
+        """Atomically make the migration target the active structure"""
+        migration = self.migration
+        self.migration = None
+        
+        self.current_structure = migration.target_name
+        self.active_ds = migration.target
+        self.stats.set_structure(migration.target_name)
+        self._route_reads()
+        self._route_writes()
+        bloom = self.bloom
+        if bloom is not None and (bloom.pending is not None or bloom.needs_resize(self.active_ds.size)):
+            self._start_filter_resize()  # Over the new structure, from the start
+        
+        # Both copies are complete right now; then the source goes
+        self._note_memory(migration.source.size + migration.target.size)
+        self._release(migration.source)
+        migration.source = None
+        
+        self.migration_count += 1
+        self.total_migration_time += migration.copy_time
+        
+        self.decision_engine.cost_model.observe_migration(
+            migration.source_name, migration.target_name,
+            migration.items_copied, migration.copy_time
+        )
+        self.decision_engine.record_switch(
+            migration.source_name,
+            migration.target_name,
+            migration.reason,
+            self.stats.total_ops,
+            migration.details
+        )
+        
+        print(f"   Incremental migration to {migration.target_name} committed: "
+              f"{migration.items_copied} items in {migration.steps} steps "
+              f"({migration.copy_time*1000:.2f}ms copying)\n")
+    
+    def abort_migration(self, reason="Aborted"):
+        """Drop an in-flight migration and keep the current structure"""
+        return self._abort_migration(reason)
+    
+    def _abort_migration(self, reason):
+        if self.migration is None:
+            return False
+        
+        migration = self.migration
+        self.migration = None
+        self._route_writes()
+        self._note_memory(migration.source.size + migration.target.size)
+        self._release(migration.target)
+        migration.target = None
+        
+        self.aborted_migrations += 1
+        self.total_migration_time += migration.copy_time
+        
+        print(f"   Migration to {migration.target_name} aborted: {reason}\n")
+        return True
+    
+    def get_memory_stats(self):
+        """Structures alive now and items held across them, now and at peak"""
+        return self._memory_stats()
+    
+    def _memory_stats(self):
+        live = [self.current_structure]
+        items_held = self.active_ds.size
+        if self.migration is not None:
+            live.append(self.migration.target_name)
+            items_held += self.migration.target.size
+        peak = max(self.peak_items_held, items_held)
+        return {
+            'live_structures': live,
+            'items_held': items_held,
+            'peak_items_held': peak,
+            # Copies of the current dataset at the peak (2.0 = one transient copy)
+            'peak_copies': peak / self.active_ds.size if self.active_ds.size else 0.0,
+            'retired_structures': len(self.retired)  # Still being freed
+        }
+    
     def get_current_structure(self):
         """Get name of current structure"""
         return self.current_structure
     
     def get_stats(self):
         """Get all statistics"""
+        self._flush_unsampled()
         stats = self.stats.get_summary()
         stats['current_structure'] = self.current_structure
+        stats['instrumentation'] = self.instrumentation
         stats['migration_count'] = self.migration_count
+        stats['aborted_migrations'] = self.aborted_migrations
         stats['total_migration_time'] = self.total_migration_time
+        stats['migration'] = self.migration.get_progress() if self.migration else None
+        stats['memory'] = self._memory_stats()
         stats['switch_history'] = self.decision_engine.get_switch_history()
+        stats['checks'] = self.decision_engine.get_check_stats()
+        stats['latency'] = self.stats.get_latency_stats()
+        stats['shadow'] = self.shadow.get_report() if self.shadow is not None else None
+        stats['wal'] = self.wal.get_stats() if self.wal is not None else None
+        stats['cache'] = self.cache.get_stats() if self.cache is not None else None
+        stats['bloom'] = self.bloom.get_stats() if self.bloom is not None else None
         
         # Add structure-specific stats
-        if self.current_structure in ['BST', 'AVL']:
-            stats['tree_height'] = self.active_ds.get_height()
+        if self.current_structure in self.ORDERED_STRUCTURES:
+            stats['tree_height'] = self._tree_height()
             if self.current_structure == 'AVL':
                 stats['rotation_count'] = self.active_ds.rotation_count
+            elif self.current_structure == 'BPlusTree':
+                stats['node_splits'] = self.active_ds.split_count
+                stats['node_merges'] = self.active_ds.merge_count
+            elif self.current_structure == 'SortedArray':
+                stats['pending_writes'] = self.active_ds.get_pending()
+                stats['array_merges'] = self.active_ds.merge_count
         elif self.current_structure == 'HashMap':
             stats['load_factor'] = self.active_ds.get_load_factor()
-            stats['collision_rate'] = self.active_ds.get_collision_rate()
+            stats['avg_probe_length'] = self.active_ds.get_avg_probe_length()
+            stats['max_probe_length'] = self.active_ds.get_max_probe_length()
         
         return stats
     
     def force_switch(self, target_structure):
         """Manually force a switch (for experimentation)"""
-        if target_structure not in self.structures:
+        if target_structure not in self.BACKENDS:
             raise ValueError(f"Unknown structure: {target_structure}")
         
+        if self.migration is not None:
+            if self.migration.target_name == target_structure:
+                return
+            self._abort_migration("Manual switch")
+        
         if target_structure != self.current_structure:
-            total_ops = self.stats.total_inserts + self.stats.total_searches
-            self._migrate_to(target_structure, "Manual switch", total_ops)
\ No newline at end of file
+            self._flush_unsampled()
+            self._migrate_to(target_structure, "Manual switch", self.stats.total_ops)
+    
+    def save(self, path):
+        """
+        Write the data and what the map has learned about its workload (the
+        structure, DecisionEngine and StatsCollector) to a binary snapshot
+        at `path`. During a switch the current structure, which is still
+        complete, is saved. Returns the number of items written.
+        """
+        return write_snapshot(path, self.active_ds.get_all_items(), self._snapshot_state(),
+                              ordered=self.current_structure in self.ORDERED_STRUCTURES)
+    
+    def _snapshot_state(self):
+        """What a snapshot keeps besides the data: the structure and what was learned"""
+        self._flush_unsampled()
+        return {
+            'structure': self.current_structure,
+            'decision_engine': self.decision_engine.get_state(),
+            'stats': self.stats.get_state()
+        }
+    
+    @classmethod
+    def load(cls, path, **kwargs):
+        """
+        Restore a map from a snapshot written by save(), bulk-loading the
+        data and resuming from the saved tuning state. `kwargs` go to the
+        constructor. The data is unpickled: load only trusted snapshots.
+        """
+        state, keys, values = read_snapshot(path)
+        structure = state['structure']
+        if structure not in cls.BACKENDS:
+            structure = 'BPlusTree'
+        if kwargs.get('decision_engine') is None:
+            kwargs['decision_engine'] = DecisionEngine.from_state(state['decision_engine'])
+        
+        stm = cls(initial_structure=structure, **kwargs)
+        stm.stats.set_state(state['stats'])
+        stm.active_ds.bulk_load(zip(keys, values))
+        if stm.bloom is not None:
+            stm.bloom.rebuild(keys)
+        stm._note_memory(stm.active_ds.size)
+        return stm
+    
+    def start_trace(self, path):
+        """Record every operation from now on to a binary trace at `path`"""
+        self.stop_trace()
+        self.trace = tr.TraceRecorder(path)
+        self._route_ops()
+    
+    def stop_trace(self):
+        """Stop recording and close the trace; returns the number of operations recorded"""
+        recorder, self.trace = self.trace, None
+        self._route_ops()
+        return recorder.close() if recorder is not None else 0
+    
+    @classmethod
+    def recover(cls, wal, **kwargs):
+        """
+        Rebuild a map after a crash or restart: load the latest snapshot in
+        `wal`'s directory (or start empty) and replay the log written since
+        straight into the structure, then keep logging to `wal`. `kwargs`
+        go to load() or the constructor.
+        """
+        snapshot = wal.snapshot_path()
+        kwargs['wal'] = wal
+        stm = cls.load(snapshot, **kwargs) if snapshot is not None else cls(**kwargs)
+        
+        for op, key, value in wal.replay():
+            if op == 'insert':
+                if stm._int64_only or type(key) is not int:
+                    stm._check_key(key)
+                stm.active_ds.insert(key, value)
+            else:
+                stm.active_ds.delete(key)
+        if stm.bloom is not None:
+            stm._rebuild_filter()
+        stm._note_memory(stm.active_ds.size)
+        return stm
+
+
+if HAS_NUMPY:
+    SelfTuningMap.register_backend('SortedArray', SortedArrayMap, ordered=True)
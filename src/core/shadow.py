@@ -0,0 +1,139 @@
+import time
+
+from .bst import BST
+from .avl import AVL
+from .bplustree import BPlusTree
+from .hashmap import HashMap
+
+
+_MASK64 = (1 << 64) - 1
+_FIBONACCI = 0x9E3779B97F4A7C15  # 2**64 / golden ratio, odd
+
+
+class ShadowEvaluator:
+    """
+    Replays a sampled slice of live traffic against small candidate structures.
+    Only keys in a fixed hash-selected subset are replayed (so searches hit
+    the same keys the inserts put there), the subset is capped at `max_keys`,
+    and replay stops whenever shadow time exceeds `cpu_budget` times the
+    main structure's time. The measured per-op latencies tell the
+    DecisionEngine how each candidate really performs on our key types.
+    """
+    
+    FACTORIES = {'BST': BST, 'AVL': AVL, 'BPlusTree': BPlusTree, 'HashMap': HashMap}
+    REPLAYED_OPS = ('insert', 'search', 'delete')  # Ordered reads aren't replayed
+    
+    def __init__(self, structures=('BST', 'AVL', 'BPlusTree', 'HashMap'), key_sample=16,
+                 max_keys=2000, cpu_budget=0.1, min_samples=50):
+        self.structures = {name: self.FACTORIES[name]() for name in structures}
+        self.key_sample = key_sample  # Replay roughly 1 in key_sample keys
+        self.max_keys = max_keys
+        self.cpu_budget = cpu_budget
+        self.min_samples = min_samples
+        
+        # Per structure and op: [total seconds, count]
+        self.timings = {name: {'insert': [0.0, 0], 'search': [0.0, 0], 'delete': [0.0, 0]}
+                        for name in structures}
+        self.shadow_time = 0.0
+        self.main_time = 0.0
+        self.replayed = 0
+        self.skipped_budget = 0
+    
+    def _sampled(self, key):
+        # Mix the hash first: ints hash to themselves, so a plain modulo
+        # would never replay keys strided by a multiple of key_sample
+        return ((hash(key) * _FIBONACCI) & _MASK64) * self.key_sample >> 64 == 0
+    
+    def observe(self, op, key, value=None, main_duration=0.0):
+        """Replay one live operation if its key is in the shadow subset"""
+        self.main_time += main_duration
+        if op not in self.REPLAYED_OPS or not self._sampled(key):
+            return
+        
+        if self.shadow_time > self.cpu_budget * self.main_time:
+            self.skipped_budget += 1
+            return
+        
+        start = time.perf_counter()
+        for name, ds in self.structures.items():
+            if op == 'insert':
+                if ds.size >= self.max_keys and ds.search(key) is None:
+                    continue
+                t = time.perf_counter()
+                ds.insert(key, value)
+            elif op == 'search':
+                t = time.perf_counter()
+                ds.search(key)
+            else:
+                t = time.perf_counter()
+                ds.delete(key)
+            timing = self.timings[name][op]
+            timing[0] += time.perf_counter() - t
+            timing[1] += 1
+        
+        self.shadow_time += time.perf_counter() - start
+        self.replayed += 1
+    
+    def get_report(self):
+        """Measured latency per candidate, plus the overhead spent measuring"""
+        candidates = {}
+        for name, ds in self.structures.items():
+            ops = self.timings[name]
+            candidates[name] = {
+                'op_cost': {op: total / count if count else None
+                            for op, (total, count) in ops.items()},
+                'samples': sum(count for _, count in ops.values()),
+                'reliable': self.is_reliable(name),
+                'size': ds.size,
+                'height': ds.get_height() if name != 'HashMap' else None,
+                'probe_length': ds.get_avg_probe_length() if name == 'HashMap' else None
+            }
+        
+        return {
+            'candidates': candidates,
+            'replayed': self.replayed,
+            'skipped_budget': self.skipped_budget,
+            'shadow_time': self.shadow_time,
+            'cpu_overhead': self.shadow_time / self.main_time if self.main_time > 0 else 0.0,
+            'keys': max((ds.size for ds in self.structures.values()), default=0),
+            'max_keys': self.max_keys
+        }
+    
+    def is_reliable(self, name):
+        """Enough replayed samples to trust this candidate's numbers"""
+        if name not in self.timings:
+            return False
+        return sum(count for _, count in self.timings[name].values()) >= self.min_samples
+    
+    def mixed_cost(self, name, stats_summary):
+        """Measured cost of a candidate under the current op mix, or None"""
+        report = self.timings[name]
+        weights = {
+            'search': stats_summary['search_ratio'],
+            'insert': stats_summary['insert_ratio'],
+            'delete': stats_summary.get(
+                'delete_ratio',
+                max(0.0, 1.0 - stats_summary['search_ratio'] - stats_summary['insert_ratio'])
+            )
+        }
+        cost = 0.0
+        covered = 0.0
+        for op, weight in weights.items():
+            total, count = report[op]
+            if weight > 0 and count > 0:
+                cost += weight * total / count
+                covered += weight
+        # Ops the shadow hasn't seen yet are left out of the mix
+        return cost / covered if covered > 0 else None
+    
+    def clear(self):
+        for ds in self.structures.values():
+            ds.clear()
+        for ops in self.timings.values():
+            for timing in ops.values():
+                timing[0] = 0.0
+                timing[1] = 0
+        self.shadow_time = 0.0
+        self.main_time = 0.0
+        self.replayed = 0
+        self.skipped_budget = 0
@@ -0,0 +1,226 @@
+from bisect import bisect_left, bisect_right
+from heapq import merge
+from itertools import islice
+from operator import itemgetter
+from .self_tuning_map import SelfTuningMap
+
+_MASK64 = (1 << 64) - 1
+_FIBONACCI = 0x9E3779B97F4A7C15
+
+
+class ShardedSelfTuningMap:
+    """
+    Partitions keys across independent SelfTuningMap shards, so each shard
+    picks its own structure and a switch migrates only its data.
+    partition='hash' spreads keys evenly; 'range' splits them at the sorted
+    `boundaries`. shard_factory() builds each shard.
+    """
+    
+    PARTITIONS = ('hash', 'range')
+    
+    def __init__(self, n_shards=8, partition='hash', boundaries=None, initial_structure='BST',
+                 shard_factory=None):
+        if partition not in self.PARTITIONS:
+            raise ValueError(f"Unknown partition: {partition}")
+        if n_shards < 1:
+            raise ValueError("n_shards must be at least 1")
+        if partition == 'range':
+            if boundaries is None or len(boundaries) != n_shards - 1:
+                raise ValueError(f"Range partition needs {n_shards - 1} boundaries")
+            boundaries = list(boundaries)
+            if any(a >= b for a, b in zip(boundaries, boundaries[1:])):
+                raise ValueError("Boundaries must be strictly increasing")
+        
+        self.n_shards = n_shards
+        self.partition = partition
+        self.boundaries = boundaries
+        if shard_factory is None:
+            shard_factory = lambda: SelfTuningMap(initial_structure=initial_structure)
+        self.shards = [shard_factory() for _ in range(n_shards)]
+    
+    def shard_index(self, key):
+        """Index of the shard that owns `key`"""
+        if self.partition == 'range':
+            return bisect_right(self.boundaries, key)
+        # Mix the hash first: shards must not all inherit the same low bits,
+        # or a HashMap shard would only ever use 1/N of its slots
+        return ((hash(key) * _FIBONACCI) & _MASK64) * self.n_shards >> 64
+    
+    def shard_for(self, key):
+        """The shard that owns `key`"""
+        return self.shards[self.shard_index(key)]
+    
+    def insert(self, key, value):
+        """Insert into the owning shard"""
+        return self.shards[self.shard_index(key)].insert(key, value)
+    
+    def search(self, key):
+        """Search the owning shard"""
+        return self.shards[self.shard_index(key)].search(key)
+    
+    def delete(self, key):
+        """Delete from the owning shard"""
+        return self.shards[self.shard_index(key)].delete(key)
+    
+    def _group(self, keys):
+        """Positions of `keys` per shard index"""
+        groups = {}
+        shard_index = self.shard_index
+        for i, key in enumerate(keys):
+            groups.setdefault(shard_index(key), []).append(i)
+        return groups
+    
+    def insert_many(self, items):
+        """Insert a batch of (key, value) pairs, one sub-batch per shard; bools aligned with `items`"""
+        items = list(items)
+        results = [None] * len(items)
+        for index, positions in self._group([key for key, _ in items]).items():
+            batch = self.shards[index].insert_many([items[i] for i in positions])
+            for i, result in zip(positions, batch):
+                results[i] = result
+        return results
+    
+    def search_many(self, keys):
+        """Look up a batch of keys, one sub-batch per shard; values aligned with `keys`"""
+        keys = list(keys)
+        results = [None] * len(keys)
+        for index, positions in self._group(keys).items():
+            batch = self.shards[index].search_many([keys[i] for i in positions])
+            for i, result in zip(positions, batch):
+                results[i] = result
+        return results
+    
+    def delete_many(self, keys):
+        """Delete a batch of keys, one sub-batch per shard; bools aligned with `keys`"""
+        keys = list(keys)
+        results = [None] * len(keys)
+        for index, positions in self._group(keys).items():
+            batch = self.shards[index].delete_many([keys[i] for i in positions])
+            for i, result in zip(positions, batch):
+                results[i] = result
+        return results
+    
+    def _shards_between(self, lo, hi):
+        """Shards whose key range can hold keys in [lo, hi), in key order"""
+        if self.partition == 'hash':
+            return self.shards
+        first = 0 if lo is None else bisect_right(self.boundaries, lo)
+        last = self.n_shards - 1 if hi is None else bisect_left(self.boundaries, hi)
+        return self.shards[first:last + 1]
+    
+    def range(self, lo=None, hi=None, limit=None):
+        """Items with lo <= key < hi in key order (None = unbounded), at most `limit`"""
+        if self.partition == 'range':
+            items = []
+            for shard in self._shards_between(lo, hi):
+                items.extend(shard.range(lo, hi, None if limit is None else limit - len(items)))
+                if limit is not None and len(items) >= limit:
+                    break
+            return items
+        parts = [shard.range(lo, hi, limit) for shard in self.shards]
+        return list(islice(merge(*parts, key=itemgetter(0)), limit))
+    
+    def floor(self, key):
+        """Item with the largest key <= `key`, or None"""
+        if self.partition == 'range':
+            for shard in reversed(self.shards[:self.shard_index(key) + 1]):
+                item = shard.floor(key)
+                if item is not None:
+                    return item
+            return None
+        items = [item for item in (shard.floor(key) for shard in self.shards) if item is not None]
+        return max(items, key=itemgetter(0)) if items else None
+    
+    def ceiling(self, key):
+        """Item with the smallest key >= `key`, or None"""
+        if self.partition == 'range':
+            for shard in self._shards_between(key, None):
+                item = shard.ceiling(key)
+                if item is not None:
+                    return item
+            return None
+        items = [item for item in (shard.ceiling(key) for shard in self.shards) if item is not None]
+        return min(items, key=itemgetter(0)) if items else None
+    
+    def min(self):
+        """Item with the smallest key, or None"""
+        return self._first_item(self.shards, 'min', min)
+    
+    def max(self):
+        """Item with the largest key, or None"""
+        return self._first_item(reversed(self.shards), 'max', max)
+    
+    def _first_item(self, shards, method, pick):
+        if self.partition == 'range':
+            # Shards are in key order: the first non-empty one has the answer
+            for shard in shards:
+                item = getattr(shard, method)()
+                if item is not None:
+                    return item
+            return None
+        items = [item for item in (getattr(shard, method)() for shard in shards) if item is not None]
+        return pick(items, key=itemgetter(0)) if items else None
+    
+    def items_from(self, key=None, chunk_size=64):
+        """Lazily iterate items in key order from the first key >= `key` (None = from the smallest)"""
+        if self.partition == 'range':
+            return (item for shard in self._shards_between(key, None)
+                    for item in shard.items_from(key, chunk_size))
+        return merge(*(shard.items_from(key, chunk_size) for shard in self.shards),
+                     key=itemgetter(0))
+    
+    def force_switch(self, target_structure, shard=None):
+        """Manually switch every shard, or only shard index `shard`"""
+        shards = self.shards if shard is None else [self.shards[shard]]
+        for s in shards:
+            s.force_switch(target_structure)
+    
+    def get_structures(self):
+        """Current structure of each shard"""
+        return [shard.get_current_structure() for shard in self.shards]
+    
+    def get_shard_stats(self):
+        """Full get_stats() of each shard"""
+        return [shard.get_stats() for shard in self.shards]
+    
+    def get_stats(self):
+        """Totals and workload ratios across all shards, plus per-shard summaries"""
+        shard_stats = self.get_shard_stats()
+        total_ops = sum(s['total_ops'] for s in shard_stats)
+        structures = {}
+        for s in shard_stats:
+            structures[s['current_structure']] = structures.get(s['current_structure'], 0) + 1
+        
+        stats = {
+            'n_shards': self.n_shards,
+            'partition': self.partition,
+            'total_ops': total_ops,
+            'inserts': sum(s['inserts'] for s in shard_stats),
+            'searches': sum(s['searches'] for s in shard_stats),
+            'deletes': sum(s['deletes'] for s in shard_stats),
+            'ranges': sum(s['ranges'] for s in shard_stats),
+            'size': sum(shard.active_ds.size for shard in self.shards),
+            'structures': structures,
+            'migration_count': sum(s['migration_count'] for s in shard_stats),
+            'aborted_migrations': sum(s['aborted_migrations'] for s in shard_stats),
+            'total_migration_time': sum(s['total_migration_time'] for s in shard_stats),
+            'shards': [
+                {
+                    'current_structure': s['current_structure'],
+                    'size': shard.active_ds.size,
+                    'total_ops': s['total_ops'],
+                    'search_ratio': s['search_ratio'],
+                    'insert_ratio': s['insert_ratio'],
+                    'range_ratio': s['range_ratio'],
+                    'order_score': s['order_score'],
+                    'migration_count': s['migration_count'],
+                    'migration': s['migration']
+                }
+                for shard, s in zip(self.shards, shard_stats)
+            ]
+        }
+        # Op mix over all shards, weighting each shard's window by its traffic
+        for ratio in ('search_ratio', 'insert_ratio', 'delete_ratio', 'range_ratio'):
+            stats[ratio] = (sum(s[ratio] * s['total_ops'] for s in shard_stats) / total_ops
+                            if total_ops else 0.0)
+        return stats
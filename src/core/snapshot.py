@@ -0,0 +1,117 @@
+from array import array
+import json
+import mmap
+from operator import itemgetter
+import os
+import pickle
+import struct
+import sys
+
+# File layout (little-endian):
+#   header  magic, format version, key format, reserved byte, item count
+#   state   u64 length + JSON object of plain data (structure, engine and stats state)
+#   keys    u64 length + int64 array, or a pickled list if any key isn't an int64
+#   values  u64 length + pickled list, aligned with the keys
+# Only the data itself is pickled, and unpickling can run arbitrary code:
+# read snapshots only from trusted files.
+MAGIC = b'STMSNAP\x00'
+VERSION = 2
+HEADER = struct.Struct('<8sHBxQ')
+BLOCK_LENGTH = struct.Struct('<Q')
+
+KEYS_INT64 = 0
+KEYS_PICKLED = 1
+
+
+def _int64_keys(keys):
+    """Keys as an int64 array, or None if any of them is not an int that fits"""
+    if any(type(key) is not int for key in keys):
+        return None
+    try:
+        packed = array('q', keys)
+    except OverflowError:
+        return None
+    if sys.byteorder == 'big':
+        packed.byteswap()
+    return packed
+
+
+def write_snapshot(path, items, state, ordered=False):
+    """
+    Write `items` in key order, plus the `state` dict (JSON-serializable), to `path`.
+    Items are sorted first unless `ordered` says they already are. The
+    file is written beside `path` and renamed over it, so a crash
+    mid-write leaves the previous snapshot intact. Returns the item count.
+    """
+    items = items if isinstance(items, list) else list(items)
+    if not ordered:
+        items.sort(key=itemgetter(0))
+    keys = [key for key, _ in items]
+    values = [value for _, value in items]
+    
+    packed = _int64_keys(keys)
+    if packed is not None:
+        key_format, key_block = KEYS_INT64, packed.tobytes()
+    else:
+        key_format, key_block = KEYS_PICKLED, pickle.dumps(keys, pickle.HIGHEST_PROTOCOL)
+    
+    tmp = f"{path}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, key_format, len(items)))
+        for block in (json.dumps(state).encode(), key_block,
+                      pickle.dumps(values, pickle.HIGHEST_PROTOCOL)):
+            f.write(BLOCK_LENGTH.pack(len(block)))
+            f.write(block)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return len(items)
+
+
+def read_snapshot(path):
+    """
+    Read a snapshot written by write_snapshot() through a read-only mmap.
+    Returns (state, keys, values) with keys in ascending order. Raises ValueError if `path` is
+    not a snapshot or is truncated. Keys and values are unpickled: `path`
+    must be trusted.
+    """
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size < HEADER.size:
+            raise ValueError(f"{path} is not a SelfTuningMap snapshot")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as view:
+            magic, version, key_format, count = HEADER.unpack_from(view)
+            if magic != MAGIC:
+                raise ValueError(f"{path} is not a SelfTuningMap snapshot")
+            if version != VERSION:
+                raise ValueError(f"Unsupported snapshot version {version}")
+            
+            blocks = []
+            offset = HEADER.size
+            for _ in range(3):
+                if offset + BLOCK_LENGTH.size > len(view):
+                    raise ValueError(f"Truncated snapshot: {path}")
+                (length,) = BLOCK_LENGTH.unpack_from(view, offset)
+                offset += BLOCK_LENGTH.size
+                if offset + length > len(view):
+                    raise ValueError(f"Truncated snapshot: {path}")
+                blocks.append((offset, offset + length))
+                offset += length
+            
+            (state_at, state_end), (keys_at, keys_end), (values_at, values_end) = blocks
+            state = json.loads(bytes(view[state_at:state_end]))
+            if key_format == KEYS_INT64:
+                keys = array('q')
+                with view[keys_at:keys_end] as block:
+                    keys.frombytes(block)
+                if sys.byteorder == 'big':
+                    keys.byteswap()
+                keys = keys.tolist()
+            else:
+                with view[keys_at:keys_end] as block:
+                    keys = pickle.loads(block)
+            with view[values_at:values_end] as block:
+                values = pickle.loads(block)
+    
+    if len(keys) != count or len(values) != count:
+        raise ValueError(f"Corrupt snapshot: {path}")
+    return state, keys, values
@@ -0,0 +1,329 @@
+from bisect import bisect_left, bisect_right, insort
+from heapq import merge as merge_sorted
+from itertools import islice
+from operator import itemgetter
+
+try:
+    import numpy as np
+except ImportError:  # Optional: without NumPy this backend is unavailable
+    np = None
+
+HAS_NUMPY = np is not None
+
+_MISSING = object()
+_INT64_MIN = -(1 << 63)
+_INT64_MAX = (1 << 63) - 1
+
+
+class SortedArrayMap:
+    """
+    Read-optimized map for integer keys: sorted int64 NumPy key array with
+    a parallel object array of values. Lookups are a searchsorted, and
+    search_many resolves a whole batch in one vectorized call.
+    Writes don't touch the arrays: new keys go to an insert buffer and
+    deleted keys to a tombstone set, both merged in with one O(n) pass once
+    they reach MERGE_FRACTION of the array (at least MIN_BUFFER). Ordered
+    reads merge the arrays with the sorted buffer on the fly instead.
+    """
+    
+    MERGE_FRACTION = 1 / 16
+    MIN_BUFFER = 256
+    READ_BLOCK = 64  # Array items converted at a time by a merging ordered read
+    
+    def __init__(self):
+        if np is None:
+            raise ImportError("SortedArrayMap requires NumPy")
+        self.keys = np.empty(0, dtype=np.int64)
+        self.values = np.empty(0, dtype=object)
+        self.buffer = {}  # Keys not in the arrays yet -> value
+        self.buffer_keys = []  # The buffer's keys, sorted
+        self.deleted = set()  # Keys still in the arrays but deleted
+        self.size = 0
+        self.merge_count = 0
+    
+    @staticmethod
+    def _is_key(key):
+        return (type(key) is int or isinstance(key, np.integer)) and _INT64_MIN <= key <= _INT64_MAX
+    
+    def _index(self, key):
+        """Position of key in the arrays (tombstoned or not), or -1"""
+        keys = self.keys
+        i = keys.searchsorted(key)
+        if i < len(keys) and keys[i] == key:
+            return i
+        return -1
+    
+    def _merge_limit(self):
+        return max(self.MIN_BUFFER, int(len(self.keys) * self.MERGE_FRACTION))
+    
+    def insert(self, key, value):
+        """Insert key-value pair (into the buffer if the key is new)"""
+        buffer = self.buffer
+        if key in buffer:
+            buffer[key] = value
+            return False
+        if not self._is_key(key):
+            raise TypeError(f"SortedArrayMap keys must be int64, got {key!r}")
+        
+        i = self._index(key)
+        if i >= 0:
+            self.values[i] = value
+            if key in self.deleted:
+                self.deleted.discard(key)
+                self.size += 1
+                return True
+            return False
+        
+        buffer[key] = value
+        insort(self.buffer_keys, key)
+        self.size += 1
+        if len(buffer) >= self._merge_limit():
+            self.merge()
+        return True
+    
+    def search(self, key):
+        """Search for key"""
+        if self.buffer:
+            value = self.buffer.get(key, _MISSING)
+            if value is not _MISSING:
+                return value
+        if not self._is_key(key) or key in self.deleted:
+            return None
+        i = self._index(key)
+        return self.values[i] if i >= 0 else None
+    
+    def delete(self, key):
+        """Delete key (tombstoned until the next merge)"""
+        if key in self.buffer:
+            del self.buffer[key]
+            del self.buffer_keys[bisect_left(self.buffer_keys, key)]
+            self.size -= 1
+            return True
+        if not self._is_key(key) or key in self.deleted or self._index(key) < 0:
+            return False
+        
+        self.deleted.add(key)
+        self.size -= 1
+        if len(self.deleted) >= self._merge_limit():
+            self.merge()
+        return True
+    
+    def merge(self):
+        """Fold the insert buffer and tombstones into the arrays: O(n + b log b)"""
+        if not self.buffer and not self.deleted:
+            return
+        keys = self.keys
+        values = self.values
+        
+        if self.deleted:
+            gone = np.fromiter(self.deleted, dtype=np.int64, count=len(self.deleted))
+            keep = ~np.isin(keys, gone)
+            keys = keys[keep]
+            values = values[keep]
+        
+        if self.buffer:
+            buffer = self.buffer
+            n = len(buffer)
+            new_keys = np.fromiter(self.buffer_keys, dtype=np.int64, count=n)
+            new_values = np.fromiter((buffer[key] for key in self.buffer_keys), dtype=object,
+                                     count=n)
+            positions = keys.searchsorted(new_keys)
+            keys = np.insert(keys, positions, new_keys)
+            values = np.insert(values, positions, new_values)
+        
+        self.keys = keys
+        self.values = values
+        self.buffer = {}
+        self.buffer_keys = []
+        self.deleted = set()
+        self.merge_count += 1
+    
+    def insert_many(self, items):
+        """Insert a batch of (key, value) pairs; returns bools aligned with `items`"""
+        insert = self.insert
+        return [insert(key, value) for key, value in items]
+    
+    def search_many(self, keys):
+        """
+        Look up a batch of keys with one vectorized searchsorted over the
+        sorted batch; returns values (None if missing) aligned with `keys`.
+        """
+        keys = list(keys)
+        if not keys:
+            return []
+        query = np.asarray(keys)
+        if query.dtype.kind != 'i' or query.ndim != 1:
+            search = self.search
+            return [search(key) for key in keys]
+        
+        results = np.full(len(keys), None, dtype=object)
+        if len(self.keys):
+            # Sorted needles let each search start near the last one
+            order = np.argsort(query)
+            idx = np.empty_like(order)
+            idx[order] = self.keys.searchsorted(query[order])
+            np.minimum(idx, len(self.keys) - 1, out=idx)
+            found = self.keys[idx] == query
+            if self.deleted:
+                gone = np.fromiter(self.deleted, dtype=np.int64, count=len(self.deleted))
+                found &= ~np.isin(query, gone)
+            results[found] = self.values[idx[found]]
+        
+        if self.buffer:
+            buffer = self.buffer
+            pending = np.fromiter(buffer, dtype=np.int64, count=len(buffer))
+            for i in np.flatnonzero(np.isin(query, pending)).tolist():
+                results[i] = buffer[keys[i]]
+        return results.tolist()
+    
+    def delete_many(self, keys):
+        """Delete a batch of keys; returns bools aligned with `keys`"""
+        delete = self.delete
+        return [delete(key) for key in keys]
+    
+    def get_height(self):
+        """A flat array: every lookup is one level"""
+        return 1
+    
+    def _items(self, i, j):
+        return list(zip(self.keys[i:j].tolist(), self.values[i:j].tolist()))
+    
+    def _live(self, i, j, block):
+        """Array items i..j-1 not tombstoned, converted `block` at a time"""
+        deleted = self.deleted
+        while i < j:
+            end = min(i + block, j)
+            for item in self._items(i, end):
+                if item[0] not in deleted:
+                    yield item
+            i = end
+    
+    def _ordered(self, lo, hi, limit):
+        """Items with lo <= key < hi in key order, at most `limit`, buffer merged in on the fly"""
+        keys = self.keys
+        i = 0 if lo is None else int(keys.searchsorted(lo))
+        j = len(keys) if hi is None else int(keys.searchsorted(hi))
+        if limit is not None:
+            if limit <= 0:
+                return []
+            if not self.deleted:
+                j = min(j, i + limit)
+        if not self.buffer and not self.deleted:
+            return self._items(i, max(i, j))
+        
+        buffer = self.buffer
+        pending = self.buffer_keys
+        a = 0 if lo is None else bisect_left(pending, lo)
+        b = len(pending) if hi is None else bisect_left(pending, hi)
+        if limit is not None:
+            b = min(b, a + limit)
+        buffered = [(key, buffer[key]) for key in pending[a:b]]
+        if i >= j:
+            return buffered
+        live = self._live(i, j, j - i if limit is None else limit + self.READ_BLOCK)
+        return list(islice(merge_sorted(live, buffered, key=itemgetter(0)), limit))
+    
+    def get_all_items(self):
+        """Get all key-value pairs (in key order)"""
+        return self._ordered(None, None, None)
+    
+    def range(self, lo=None, hi=None, limit=None):
+        """
+        Items with lo <= key < hi in key order (None = unbounded), at most
+        `limit` of them: two binary searches and one slice, plus a merge
+        with the write buffer if it isn't empty.
+        """
+        return self._ordered(lo, hi, limit)
+    
+    def floor(self, key):
+        """Item with the largest key <= `key`, or None"""
+        i = int(self.keys.searchsorted(key, side='right')) - 1
+        deleted = self.deleted
+        while i >= 0 and int(self.keys[i]) in deleted:
+            i -= 1
+        best = (int(self.keys[i]), self.values[i]) if i >= 0 else None
+        b = bisect_right(self.buffer_keys, key) - 1
+        if b >= 0 and (best is None or self.buffer_keys[b] > best[0]):
+            best = (self.buffer_keys[b], self.buffer[self.buffer_keys[b]])
+        return best
+    
+    def ceiling(self, key):
+        """Item with the smallest key >= `key`, or None"""
+        items = self._ordered(key, None, 1)
+        return items[0] if items else None
+    
+    def min(self):
+        """Item with the smallest key, or None"""
+        items = self._ordered(None, None, 1)
+        return items[0] if items else None
+    
+    def max(self):
+        """Item with the largest key, or None"""
+        if not self.size:
+            return None
+        return self.floor(_INT64_MAX)
+    
+    def items_from(self, key=None, chunk_size=64):
+        """
+        Lazily yield items in key order from the first key >= `key` (None =
+        from the smallest). Items are fetched `chunk_size` at a time through
+        scan(), so writes between items are tolerated: nothing is skipped,
+        though an item deleted after its chunk was fetched is still yielded.
+        """
+        item = self.min() if key is None else self.ceiling(key)
+        if item is None:
+            return
+        yield item
+        
+        cursor = item[0]
+        while cursor is not None:
+            items, cursor = self.scan(cursor, chunk_size)
+            yield from items
+    
+    def bulk_load(self, sorted_items):
+        """Replace contents with `items` (sorted here if they aren't) in O(n)"""
+        items = list(sorted_items)
+        bad = next(islice((key for key, _ in items if not self._is_key(key)), 1), _MISSING)
+        if bad is not _MISSING:
+            raise TypeError(f"SortedArrayMap keys must be int64, got {bad!r}")
+        
+        keys = np.fromiter((key for key, _ in items), dtype=np.int64, count=len(items))
+        values = np.fromiter((value for _, value in items), dtype=object, count=len(items))
+        if len(keys) > 1 and not (keys[1:] > keys[:-1]).all():
+            order = np.argsort(keys, kind='stable')
+            keys = keys[order]
+            values = values[order]
+        
+        self.clear()
+        self.keys = keys
+        self.values = values
+        self.size = len(items)
+    
+    def scan(self, cursor=None, count=100):
+        """
+        Resumable in-order scan.
+        Returns up to `count` items with keys after `cursor` (None = from the
+        start) and the cursor to resume from, or None once the scan is done.
+        Safe to interleave with inserts and deletes.
+        """
+        if cursor == _INT64_MAX:
+            return [], None
+        count = max(count, 1)
+        items = self._ordered(None if cursor is None else cursor + 1, None, count + 1)
+        if len(items) <= count:
+            return items, None
+        items.pop()
+        return items, items[-1][0]
+    
+    def get_pending(self):
+        """Buffered inserts and tombstones not merged into the arrays yet"""
+        return len(self.buffer) + len(self.deleted)
+    
+    def clear(self):
+        self.keys = np.empty(0, dtype=np.int64)
+        self.values = np.empty(0, dtype=object)
+        self.buffer = {}
+        self.buffer_keys = []
+        self.deleted = set()
+        self.size = 0
+        self.merge_count = 0
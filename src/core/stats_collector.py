@@ -1,89 +1,321 @@
 from collections import deque
+from math import log2
+from .latency_histogram import LatencyHistogram
 import time
 
 
+def _plain_key(key):
+    return key if type(key) in (int, float, str) else None
+
+
 class StatsCollector:
-    """Collects and analyzes workload statistics"""
+    """
+    Collects and analyzes workload statistics.
+    Fixed footprint: every window is a bounded ring buffer with running
+    counters, so recording and every getter are O(1) however long it runs.
+    """
     
-    def __init__(self, window_size=100):
+    def __init__(self, window_size=100, order_window=50):
         self.window_size = window_size
         self.recent_ops = deque(maxlen=window_size)
+        self.window_counts = {'insert': 0, 'search': 0, 'delete': 0, 'range': 0}
         
         # Counters
         self.total_inserts = 0
         self.total_searches = 0
         self.total_deletes = 0
+        self.total_ranges = 0  # Ordered reads: range, floor/ceiling, min/max, iteration
+        self.range_items = 0  # Items returned by those reads
+        self.total_ops = 0
+        self.recorded_ops = 0  # Operations that went through the windows
         
-        # Key analysis
-        self.inserted_keys = []
+        # Ordered reads are rare but expensive on a HashMap, so besides the
+        # window their rate is also kept decayed over ~10 windows
+        self.range_rate_alpha = 1.0 / (10 * window_size)
+        self.range_rate = 0.0
+        self.range_rate_at = 0
+        
+        # Key analysis: last inserted key plus the direction of each recent
+        # consecutive pair (+1 ascending, -1 descending, 0 equal)
+        self.order_window = order_window
+        self.last_key = None
+        self.recent_keys_count = 0
+        self.pair_directions = deque(maxlen=order_window - 1)
+        self.ascending_pairs = 0
+        self.descending_pairs = 0
+        self.total_pairs = 0  # Every pair so far, for the change detector
+        self.total_ascending_pairs = 0
         self.max_key = None
         self.min_key = None
+        self.int_keys = True  # No non-int key inserted yet
         
         # Timing
-        self.operation_times = []
+        self.operation_times = deque(maxlen=window_size)
+        self.operation_time_sum = 0.0
         
+        # Latency histograms per (operation, structure), plus migration pauses
+        self.structure = None
+        self.latency = {}
+        self.migration_latency = LatencyHistogram()
+        # Per operation: timed count and sum of log2(ns), for the change detector
+        self.timed_counts = {'insert': 0, 'search': 0, 'delete': 0, 'range': 0}
+        self.log_latency_sums = {'insert': 0.0, 'search': 0.0, 'delete': 0.0, 'range': 0.0}
+    
+    def set_structure(self, structure):
+        """Label subsequent latencies with the backing structure"""
+        self.structure = structure
+    
+    def _record_key_order(self, key):
+        if self.last_key is not None:
+            try:
+                direction = (key > self.last_key) - (key < self.last_key)
+            except TypeError:  # Keys of types that don't order against each other
+                direction = 0
+            pairs = self.pair_directions
+            if len(pairs) == pairs.maxlen:
+                evicted = pairs[0]
+                if evicted > 0:
+                    self.ascending_pairs -= 1
+                elif evicted < 0:
+                    self.descending_pairs -= 1
+            pairs.append(direction)
+            self.total_pairs += 1
+            if direction > 0:
+                self.ascending_pairs += 1
+                self.total_ascending_pairs += 1
+            elif direction < 0:
+                self.descending_pairs += 1
+        self.last_key = key
+        if self.recent_keys_count < self.order_window:
+            self.recent_keys_count += 1
+    
     def record_insert(self, key, duration=0):
         """Record an insert operation"""
-        self.recent_ops.append('insert')
-        self.total_inserts += 1
-        self.inserted_keys.append(key)
-        self.operation_times.append(duration)
-        
-        if self.max_key is None or key > self.max_key:
-            self.max_key = key
-        if self.min_key is None or key < self.min_key:
-            self.min_key = key
+        self.record('insert', key, duration)
+    
+    def _record_key_range(self, low, high):
+        try:
+            if self.max_key is None or high > self.max_key:
+                self.max_key = high
+            if self.min_key is None or low < self.min_key:
+                self.min_key = low
+        except TypeError:  # Keys of types that don't order against each other
+            pass
     
     def record_search(self, key, duration=0):
         """Record a search operation"""
-        self.recent_ops.append('search')
-        self.total_searches += 1
-        self.operation_times.append(duration)
+        self.record('search', key, duration)
     
     def record_delete(self, key, duration=0):
         """Record a delete operation"""
-        self.recent_ops.append('delete')
-        self.total_deletes += 1
-        self.operation_times.append(duration)
+        self.record('delete', key, duration)
+    
+    def record_range(self, key, duration=0):
+        """Record an ordered read (range, floor/ceiling, min/max, iteration)"""
+        self.record('range', key, duration)
+    
+    def record_range_items(self, n):
+        """Add the number of items an ordered read returned"""
+        self.range_items += n
+    
+    def record(self, op, key, duration=None):
+        """
+        Record an operation by name ('insert', 'search', 'delete' or
+        'range'); a `duration` of None records it untimed.
+        """
+        recent_ops = self.recent_ops
+        counts = self.window_counts
+        if len(recent_ops) == self.window_size:
+            counts[recent_ops[0]] -= 1
+        recent_ops.append(op)
+        counts[op] += 1
+        self.total_ops += 1
+        self.recorded_ops += 1
+        
+        if op == 'search':
+            self.total_searches += 1
+        elif op == 'insert':
+            self.total_inserts += 1
+            self._record_key_order(key)
+            if self.int_keys and type(key) is not int:
+                self.int_keys = False
+            self._record_key_range(key, key)
+        elif op == 'delete':
+            self.total_deletes += 1
+        else:
+            self.total_ranges += 1
+            self.range_rate = self._decayed_range_rate() + self.range_rate_alpha
+            self.range_rate_at = self.recorded_ops
+        if duration is None:  # Untimed (counters-only instrumentation)
+            return
+        
+        histogram = self.latency.get((op, self.structure))
+        if histogram is None:
+            histogram = self.latency[(op, self.structure)] = LatencyHistogram()
+        histogram.record(duration)
+        self.timed_counts[op] += 1
+        self.log_latency_sums[op] += log2(duration * 1e9 + 1)
+        
+        times = self.operation_times
+        if len(times) == self.window_size:
+            self.operation_time_sum -= times[0]
+        times.append(duration)
+        self.operation_time_sum += duration
+        
+        # Re-sum now and then so float error can't accumulate
+        if self.total_ops % (self.window_size * 1000) == 0:
+            self.operation_time_sum = sum(times)
+    
+    def record_batch(self, op, keys, duration=None, sample=None):
+        """
+        Record one batch of `op` over `keys`; `duration` is the whole batch's
+        time, charged equally to every key. Totals and the latency histogram
+        count every key, but only the last `sample` keys (default a window's
+        worth) enter the windows, so recording is O(sample) however big the
+        batch is.
+        """
+        n = len(keys)
+        if n == 0:
+            return
+        tail = min(n, sample or self.window_size, self.window_size)
+        
+        recent_ops = self.recent_ops
+        counts = self.window_counts
+        for _ in range(tail):
+            if len(recent_ops) == self.window_size:
+                counts[recent_ops[0]] -= 1
+            recent_ops.append(op)
+            counts[op] += 1
+        self.total_ops += n
+        self.recorded_ops += tail
+        
+        if op == 'insert':
+            self.total_inserts += n
+            if n > tail:
+                self.last_key = keys[n - tail - 1]  # So the first sampled pair is a real one
+            for i in range(n - tail, n):
+                self._record_key_order(keys[i])
+            try:
+                self._record_key_range(min(keys), max(keys))
+            except TypeError:
+                pass
+            if self.int_keys and not all(type(key) is int for key in keys):
+                self.int_keys = False
+        elif op == 'search':
+            self.total_searches += n
+        elif op == 'delete':
+            self.total_deletes += n
+        else:
+            self.total_ranges += n
+        
+        if duration is None:
+            return
+        per_op = duration / n
+        histogram = self.latency.get((op, self.structure))
+        if histogram is None:
+            histogram = self.latency[(op, self.structure)] = LatencyHistogram()
+        histogram.record(per_op, n)
+        self.timed_counts[op] += n
+        self.log_latency_sums[op] += log2(per_op * 1e9 + 1) * n
+        
+        times = self.operation_times
+        for _ in range(tail):
+            times.append(per_op)
+        self.operation_time_sum = sum(times)
+    
+    def count(self, op, n=1):
+        """
+        Count operations that were not sampled: totals only.
+        Window ratios, key order and timing come from the sampled operations.
+        """
+        self.total_ops += n
+        if op == 'insert':
+            self.total_inserts += n
+        elif op == 'search':
+            self.total_searches += n
+        elif op == 'delete':
+            self.total_deletes += n
+        else:
+            self.total_ranges += n
+    
+    def keep_recent(self, n, key_order=False):
+        """
+        Drop window entries older than the last `n` recorded operations, so
+        a workload phase that began `n` operations ago is judged on its own:
+        the op-mix and timing windows, or with key_order=True only the
+        key-order window. Totals and latency histograms are kept.
+        """
+        recent_ops = self.recent_ops
+        if key_order:
+            inserts = 0
+            for i in range(max(len(recent_ops) - n, 0), len(recent_ops)):
+                if recent_ops[i] == 'insert':
+                    inserts += 1
+            # One pair per insert after the first
+            pairs = self.pair_directions
+            for _ in range(len(pairs) - max(inserts - 1, 0)):
+                direction = pairs.popleft()
+                if direction > 0:
+                    self.ascending_pairs -= 1
+                elif direction < 0:
+                    self.descending_pairs -= 1
+            self.recent_keys_count = min(self.recent_keys_count, len(pairs) + 1)
+            return
+        
+        for _ in range(len(recent_ops) - n):
+            self.window_counts[recent_ops.popleft()] -= 1
+        times = self.operation_times
+        if len(times) > n:
+            for _ in range(len(times) - n):
+                times.popleft()
+            self.operation_time_sum = sum(times)
     
     def get_search_ratio(self):
         """Calculate ratio of searches in recent window"""
         if not self.recent_ops:
             return 0.0
-        searches = sum(1 for op in self.recent_ops if op == 'search')
-        return searches / len(self.recent_ops)
+        return self.window_counts['search'] / len(self.recent_ops)
     
     def get_insert_ratio(self):
         """Calculate ratio of inserts in recent window"""
         if not self.recent_ops:
             return 0.0
-        inserts = sum(1 for op in self.recent_ops if op == 'insert')
-        return inserts / len(self.recent_ops)
+        return self.window_counts['insert'] / len(self.recent_ops)
+    
+    def get_delete_ratio(self):
+        """Calculate ratio of deletes in recent window"""
+        if not self.recent_ops:
+            return 0.0
+        return self.window_counts['delete'] / len(self.recent_ops)
+    
+    def _decayed_range_rate(self):
+        return self.range_rate * (1 - self.range_rate_alpha) ** (self.recorded_ops - self.range_rate_at)
+    
+    def get_range_ratio(self):
+        """
+        Ratio of ordered reads: the recent window's, or the decayed long-run
+        rate if higher, so occasional range queries stay visible between
+        windows that happen to contain none.
+        """
+        window = self.window_counts['range'] / len(self.recent_ops) if self.recent_ops else 0.0
+        return max(window, self._decayed_range_rate())
+    
+    def get_avg_range_items(self):
+        """Average items returned per ordered read"""
+        return self.range_items / self.total_ranges if self.total_ranges else 0
     
     def get_order_score(self):
         """
-        Calculate how sorted the inserted keys are.
+        Calculate how sorted the recently inserted keys are.
         Returns value between 0 (random) and 1 (perfectly sorted)
         """
-        if len(self.inserted_keys) < 10:
+        if self.recent_keys_count < 10:
             return 0.5  # Not enough data
         
-        # Check last N keys
-        recent_keys = self.inserted_keys[-min(50, len(self.inserted_keys)):]
-        
-        # Count ascending pairs
-        ascending = sum(1 for i in range(len(recent_keys)-1) 
-                       if recent_keys[i] < recent_keys[i+1])
-        
-        # Count descending pairs
-        descending = sum(1 for i in range(len(recent_keys)-1) 
-                        if recent_keys[i] > recent_keys[i+1])
-        
-        total_pairs = len(recent_keys) - 1
+        total_pairs = len(self.pair_directions)
         
         # High order score = mostly sorted (ascending or descending)
-        order_score = max(ascending, descending) / total_pairs
-        return order_score
+        return max(self.ascending_pairs, self.descending_pairs) / total_pairs
     
     def is_sorted_workload(self, threshold=0.7):
         """Determine if workload is sorted"""
@@ -93,35 +325,151 @@ class StatsCollector:
         """Determine if workload is search-heavy"""
         return self.get_search_ratio() > threshold
     
+    def has_int_keys(self):
+        """Every inserted key seen so far was an int that fits in int64"""
+        return (self.int_keys and self.min_key is not None
+                and -(1 << 63) <= self.min_key and self.max_key < (1 << 63))
+    
     def get_avg_operation_time(self):
-        """Get average operation time"""
+        """Get average operation time over the recent window"""
         if not self.operation_times:
             return 0
-        recent_times = self.operation_times[-100:]
-        return sum(recent_times) / len(recent_times)
+        return max(self.operation_time_sum, 0.0) / len(self.operation_times)
+    
+    def record_migration_pause(self, duration):
+        """Record time an operation spent blocked on migration work"""
+        self.migration_latency.record(duration)
+    
+    def get_latency_histogram(self, op=None, structure=None):
+        """Merged snapshot over the matching (operation, structure) series"""
+        merged = LatencyHistogram()
+        for (series_op, series_structure), histogram in self.latency.items():
+            if op is not None and series_op != op:
+                continue
+            if structure is not None and series_structure != structure:
+                continue
+            merged.merge(histogram)
+        return merged
+    
+    def get_latency_stats(self):
+        """
+        Percentile summaries per operation: one entry per backing structure
+        plus 'all' merged across them, and the migration pause series.
+        """
+        stats = {}
+        for (op, structure), histogram in self.latency.items():
+            stats.setdefault(op, {})[structure] = histogram.get_summary()
+        for op in stats:
+            stats[op]['all'] = self.get_latency_histogram(op).get_summary()
+        stats['migration'] = self.migration_latency.get_summary()
+        return stats
+    
+    def get_totals(self):
+        """
+        Running totals for the change detector; they only grow, so two
+        calls give the op mix, key order and latency of the operations
+        between them.
+        """
+        sums = self.log_latency_sums
+        return {
+            'recorded_ops': self.recorded_ops,
+            'ops': self.total_ops,
+            'searches': self.total_searches,
+            'pairs': self.total_pairs,
+            'ascending_pairs': self.total_ascending_pairs,
+            # op -> (timed operations, sum of their log2 latencies in ns)
+            'latency': {op: (count, sums[op]) for op, count in self.timed_counts.items() if count}
+        }
     
     def get_summary(self):
         """Get statistics summary"""
         return {
-            'total_ops': self.total_inserts + self.total_searches + self.total_deletes,
+            'total_ops': self.total_ops,
             'inserts': self.total_inserts,
             'searches': self.total_searches,
             'deletes': self.total_deletes,
+            'ranges': self.total_ranges,
             'search_ratio': self.get_search_ratio(),
             'insert_ratio': self.get_insert_ratio(),
+            'delete_ratio': self.get_delete_ratio(),
+            'range_ratio': self.get_range_ratio(),
+            'avg_range_items': self.get_avg_range_items(),
             'order_score': self.get_order_score(),
             'is_sorted': self.is_sorted_workload(),
             'is_search_heavy': self.is_search_heavy(),
+            'int_keys': self.has_int_keys(),
             'avg_time': self.get_avg_operation_time()
         }
     
+    def get_state(self):
+        """
+        What a snapshot keeps: counters and windows as plain data. Latency
+        histograms are not kept, and neither are boundary keys that aren't
+        ints, floats or strings.
+        """
+        return {
+            'recent_ops': list(self.recent_ops),
+            'totals': [self.total_inserts, self.total_searches, self.total_deletes,
+                       self.total_ranges, self.range_items, self.total_ops, self.recorded_ops],
+            'range_rate': [self.range_rate, self.range_rate_at],
+            'last_key': _plain_key(self.last_key),
+            'min_key': _plain_key(self.min_key),
+            'max_key': _plain_key(self.max_key),
+            'recent_keys_count': self.recent_keys_count,
+            'pair_directions': list(self.pair_directions),
+            'int_keys': self.int_keys,
+            'operation_times': list(self.operation_times)
+        }
+    
+    def set_state(self, state):
+        """Restore what get_state() returned"""
+        self.reset()
+        for op in state['recent_ops'][-self.window_size:]:
+            self.recent_ops.append(op)
+            self.window_counts[op] += 1
+        (self.total_inserts, self.total_searches, self.total_deletes, self.total_ranges,
+         self.range_items, self.total_ops, self.recorded_ops) = state['totals']
+        self.range_rate, self.range_rate_at = state['range_rate']
+        self.last_key = state['last_key']
+        self.min_key = state['min_key']
+        self.max_key = state['max_key']
+        self.int_keys = state['int_keys']
+        for direction in state['pair_directions'][-self.pair_directions.maxlen:]:
+            self.pair_directions.append(direction)
+            if direction > 0:
+                self.ascending_pairs += 1
+            elif direction < 0:
+                self.descending_pairs += 1
+        self.recent_keys_count = min(state['recent_keys_count'], len(self.pair_directions) + 1)
+        self.operation_times.extend(state['operation_times'][-self.window_size:])
+        self.operation_time_sum = sum(self.operation_times)
+    
     def reset(self):
         """Reset all statistics"""
         self.recent_ops.clear()
+        self.window_counts = {'insert': 0, 'search': 0, 'delete': 0, 'range': 0}
         self.total_inserts = 0
         self.total_searches = 0
         self.total_deletes = 0
-        self.inserted_keys = []
+        self.total_ranges = 0
+        self.range_items = 0
+        self.total_ops = 0
+        self.recorded_ops = 0
+        self.range_rate = 0.0
+        self.range_rate_at = 0
+        self.int_keys = True
+        self.last_key = None
+        self.recent_keys_count = 0
+        self.pair_directions.clear()
+        self.ascending_pairs = 0
+        self.descending_pairs = 0
+        self.total_pairs = 0
+        self.total_ascending_pairs = 0
         self.max_key = None
         self.min_key = None
-        self.operation_times = []
\ No newline at end of file
+        self.operation_times.clear()
+        self.operation_time_sum = 0.0
+        self.latency = {}
+        self.migration_latency.clear()
+        self.timed_counts = {'insert': 0, 'search': 0, 'delete': 0, 'range': 0}
+        self.log_latency_sums = {'insert': 0.0, 'search': 0.0, 'delete': 0.0, 'range': 0.0}
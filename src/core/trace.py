@@ -0,0 +1,200 @@
+from array import array
+from collections import deque
+from hashlib import blake2b
+from itertools import islice, repeat, starmap
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+
+from .latency_histogram import LatencyHistogram
+
+# File layout: header (magic, version, wall-clock start), then chunks of
+# fixed-width little-endian columns: a u32 record count n, then n op codes
+# (u8), n keys (i64), n timestamps (u64 ns since the start) and n counts
+# (u32). Non-int keys are stored as a stable 64-bit hash and an absent key
+# (min, max, unbounded ranges) as NO_KEY. count is the number of items a
+# range returned; 0 for every other op.
+MAGIC = b'STMTRACE'
+VERSION = 1
+HEADER = struct.Struct('<8sHd')
+CHUNK = struct.Struct('<I')
+COLUMNS = (('B', 1), ('q', 8), ('Q', 8), ('I', 4))  # op, key, time, count
+RECORD_BYTES = sum(width for _, width in COLUMNS)
+
+INSERT, SEARCH, DELETE, RANGE, FLOOR, CEILING, MIN, MAX, ITERATE = range(1, 10)
+OP_NAMES = {INSERT: 'insert', SEARCH: 'search', DELETE: 'delete', RANGE: 'range', FLOOR: 'floor',
+            CEILING: 'ceiling', MIN: 'min', MAX: 'max', ITERATE: 'items_from'}
+
+NO_KEY = -(1 << 63)
+_INT64_MIN = NO_KEY + 1
+_INT64_MAX = (1 << 63) - 1
+_clock = time.perf_counter_ns
+
+
+def _trace_key(key):
+    if type(key) is int and _INT64_MIN <= key <= _INT64_MAX:
+        return key
+    if key is None:
+        return NO_KEY
+    # Stable across processes (unlike hash() of str); keeps equality, not order
+    h = int.from_bytes(blake2b(repr(key).encode(), digest_size=8).digest(), 'little', signed=True)
+    return h if h != NO_KEY else _INT64_MIN
+
+
+class TraceRecorder:
+    """
+    Records a map's operation stream to a binary trace file.
+    Recording an operation only queues its four fields; once `chunk_records`
+    are queued they are split into columns and written as one chunk, in
+    C-level passes. Safe to share between threads: recording never takes a
+    lock (a deque extend is atomic), only writing a chunk does.
+    """
+    
+    def __init__(self, path, chunk_records=1 << 10):
+        self.path = path
+        self.chunk_records = chunk_records
+        self._flush_at = chunk_records * len(COLUMNS)
+        self._file = open(path, 'wb')
+        self._file.write(HEADER.pack(MAGIC, VERSION, time.time()))
+        self._queue = deque()
+        self._lock = threading.Lock()
+        self._start = _clock()
+        self.records = 0
+    
+    def record(self, op, key, count=0):
+        """Append one operation (an op code from this module)"""
+        if type(key) is not int or not _INT64_MIN <= key <= _INT64_MAX:
+            key = _trace_key(key)
+        queue = self._queue
+        queue.extend((op, key, _clock() - self._start, count))
+        if len(queue) >= self._flush_at:
+            self._flush()
+    
+    def record_many(self, op, keys):
+        """Append one operation per key of a batch, all with the same timestamp"""
+        t = _clock() - self._start
+        fields = []
+        for key in keys:
+            fields += (op, _trace_key(key), t, 0)
+        self._queue.extend(fields)
+        if len(self._queue) >= self._flush_at:
+            self._flush()
+    
+    def _flush(self):
+        with self._lock:
+            queue = self._queue
+            # Drain whole records from the left: ones appended meanwhile stay queued
+            n = len(queue) // len(COLUMNS)
+            fields = list(starmap(queue.popleft, repeat((), n * len(COLUMNS))))
+            if not n or self._file is None:  # None: recorded after close()
+                return
+            self.records += n
+            write = self._file.write
+            write(CHUNK.pack(n))
+            for i, (typecode, _) in enumerate(COLUMNS):
+                column = array(typecode, fields[i::len(COLUMNS)])
+                if sys.byteorder == 'big':
+                    column.byteswap()
+                write(column)
+    
+    def close(self):
+        """Write what is queued and close the file; returns the number of records"""
+        self._flush()
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+        return self.records
+
+
+def read_trace(path):
+    """
+    Stream (op, key, ns_since_start, count) records from a trace through a
+    read-only mmap, one chunk at a time; memory use depends on the chunk
+    size, not the trace size. A truncated last chunk is ignored.
+    """
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < HEADER.size:
+            raise ValueError(f"{path} is not a trace")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            magic, version, _ = HEADER.unpack_from(mm)
+            if magic != MAGIC:
+                raise ValueError(f"{path} is not a trace")
+            if version != VERSION:
+                raise ValueError(f"Unsupported trace version {version}")
+            
+            offset = HEADER.size
+            while offset + CHUNK.size <= size:
+                (n,) = CHUNK.unpack_from(mm, offset)
+                offset += CHUNK.size
+                if offset + n * RECORD_BYTES > size:
+                    return
+                columns = []
+                for typecode, width in COLUMNS:
+                    column = array(typecode)
+                    column.frombytes(mm[offset:offset + n * width])
+                    if sys.byteorder == 'big':
+                        column.byteswap()
+                    columns.append(column)
+                    offset += n * width
+                yield from zip(*columns)
+
+
+def replay_trace(path, target, report_every=None):
+    """
+    Run every operation of a trace against `target`: any SelfTuningMap
+    variant or bare structure with the map interface. Inserts use the key
+    as the value; a range is replayed from its low key for as many items
+    as it returned, and an iteration for one chunk.
+    
+    Returns {'operations', 'seconds', 'ops_per_sec', 'latency' (summary per
+    op), 'switches', 'final_structure'}. Switches are the ones `target`
+    made during the replay (empty for a fixed structure). With
+    `report_every`, prints throughput every that many operations.
+    """
+    handlers = {
+        INSERT: lambda key, count: target.insert(key, key),
+        SEARCH: lambda key, count: target.search(key),
+        DELETE: lambda key, count: target.delete(key),
+        RANGE: lambda key, count: target.range(key, None, count),
+        FLOOR: lambda key, count: target.floor(key),
+        CEILING: lambda key, count: target.ceiling(key),
+        MIN: lambda key, count: target.min(),
+        MAX: lambda key, count: target.max(),
+        ITERATE: lambda key, count: list(islice(target.items_from(key), 64))
+    }
+    histograms = {op: LatencyHistogram() for op in handlers}
+    engine = getattr(target, 'decision_engine', None)
+    switches_before = len(engine.get_switch_history()) if engine is not None else 0
+    
+    clock = time.perf_counter_ns
+    operations = 0
+    start = clock()
+    for op, key, _, count in read_trace(path):
+        if key == NO_KEY:
+            key = None
+        t = clock()
+        handlers[op](key, count)
+        histograms[op].record((clock() - t) / 1e9)
+        operations += 1
+        if report_every and operations % report_every == 0:
+            elapsed = (clock() - start) / 1e9
+            print(f"  {operations} ops, {operations / elapsed:,.0f} ops/s")
+    seconds = (clock() - start) / 1e9
+    
+    wait = getattr(target, 'wait_for_migration', None)
+    if wait is not None:
+        wait()
+    get_structure = getattr(target, 'get_current_structure', None)
+    return {
+        'operations': operations,
+        'seconds': seconds,
+        'ops_per_sec': operations / seconds if seconds else 0.0,
+        'latency': {OP_NAMES[op]: h.get_summary() for op, h in histograms.items() if h.count},
+        'switches': (engine.get_switch_history()[switches_before:] if engine is not None else []),
+        'final_structure': get_structure() if get_structure is not None else type(target).__name__
+    }
@@ -0,0 +1,280 @@
+import copy
+import mmap
+import os
+import pickle
+import struct
+import threading
+import zlib
+
+from .snapshot import write_snapshot, read_snapshot
+
+# Record: crc32 of the body, body length, then the body: an op byte and its
+# payload. Int keys that fit in int64 are packed; other keys are pickled.
+RECORD = struct.Struct('<II')
+OP_INSERT = 1       # pickled (key, value)
+OP_INSERT_INT = 2   # int64 key + pickled value
+OP_DELETE = 3       # pickled key
+OP_DELETE_INT = 4   # int64 key
+INT_OP = struct.Struct('<Bq')
+_INT64_MIN = -(1 << 63)
+_INT64_MAX = (1 << 63) - 1
+PICKLE_PROTOCOL = 3  # Unframed: protocol 4+ adds a 9-byte frame header to every record
+
+SEGMENT_PREFIX = 'wal-'
+SEGMENT_SUFFIX = '.log'
+SNAPSHOT_PREFIX = 'snapshot-'
+SNAPSHOT_SUFFIX = '.snap'
+
+
+class WriteAheadLog:
+    """
+    Append-only log of a SelfTuningMap's inserts and deletes, in `directory`.
+    Records are group-committed every `group_size` writes and fsynced every
+    `fsync_every` commits. Segments past `compact_bytes` are folded into a
+    snapshot in the background; SelfTuningMap.recover() replays the rest.
+    """
+    
+    def __init__(self, directory, group_size=64, fsync_every=1, compact_bytes=64 << 20):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.group_size = max(1, group_size)
+        self.fsync_every = fsync_every
+        self.compact_bytes = compact_bytes
+        self.state_source = None  # Returns the map's tuning state; set by the map
+        
+        self._buffer = bytearray()
+        self._pending = 0  # Records in the buffer
+        self._file = None
+        self._segment = None
+        self._segment_bytes = 0
+        self._unsynced_groups = 0
+        self._compactor = None
+        
+        # Metrics
+        self.records = 0
+        self.bytes_written = 0
+        self.group_commits = 0
+        self.fsyncs = 0
+        self.compactions = 0
+        self.compaction_error = None
+    
+    # Files
+    
+    def _path(self, prefix, seq, suffix):
+        return os.path.join(self.directory, f"{prefix}{seq:08d}{suffix}")
+    
+    def _numbered(self, prefix, suffix):
+        """Sequence numbers of the files named prefix<N>suffix, ascending"""
+        seqs = []
+        for name in os.listdir(self.directory):
+            if name.startswith(prefix) and name.endswith(suffix):
+                number = name[len(prefix):len(name) - len(suffix)]
+                if number.isdigit():
+                    seqs.append(int(number))
+        return sorted(seqs)
+    
+    def _latest_snapshot(self):
+        snapshots = self._numbered(SNAPSHOT_PREFIX, SNAPSHOT_SUFFIX)
+        return snapshots[-1] if snapshots else 0
+    
+    def snapshot_path(self):
+        """Path of the latest snapshot, or None if the log has never been compacted"""
+        seq = self._latest_snapshot()
+        return self._path(SNAPSHOT_PREFIX, seq, SNAPSHOT_SUFFIX) if seq else None
+    
+    def _open_segment(self):
+        # Always a new segment: the previous one may end in a torn record
+        seqs = self._numbered(SEGMENT_PREFIX, SEGMENT_SUFFIX)
+        self._segment = max(seqs[-1] if seqs else 0, self._latest_snapshot()) + 1
+        self._file = open(self._path(SEGMENT_PREFIX, self._segment, SEGMENT_SUFFIX), 'ab')
+        self._segment_bytes = 0
+    
+    # Appending
+    
+    def _append(self, body):
+        buffer = self._buffer
+        buffer += RECORD.pack(zlib.crc32(body), len(body))
+        buffer += body
+        self._pending += 1
+        if self._pending >= self.group_size:
+            self._write_group()
+            self._maybe_compact()
+    
+    def log_insert(self, key, value):
+        if type(key) is int and _INT64_MIN <= key <= _INT64_MAX:
+            self._append(INT_OP.pack(OP_INSERT_INT, key) + pickle.dumps(value, PICKLE_PROTOCOL))
+        else:
+            self._append(bytes((OP_INSERT,)) + pickle.dumps((key, value), PICKLE_PROTOCOL))
+    
+    def log_delete(self, key):
+        if type(key) is int and _INT64_MIN <= key <= _INT64_MAX:
+            self._append(INT_OP.pack(OP_DELETE_INT, key))
+        else:
+            self._append(bytes((OP_DELETE,)) + pickle.dumps(key, PICKLE_PROTOCOL))
+    
+    def log_insert_many(self, items):
+        for key, value in items:
+            self.log_insert(key, value)
+    
+    def log_delete_many(self, keys):
+        for key in keys:
+            self.log_delete(key)
+    
+    def _write_group(self, sync=False):
+        """Write the buffered records in one go, fsyncing as configured (or if `sync`)"""
+        if self._pending:
+            if self._file is None:
+                self._open_segment()
+            self._file.write(self._buffer)
+            self._file.flush()
+            self.records += self._pending
+            self.bytes_written += len(self._buffer)
+            self._segment_bytes += len(self._buffer)
+            self.group_commits += 1
+            self._unsynced_groups += 1
+            self._buffer = bytearray()
+            self._pending = 0
+        
+        if self._file is not None and self._unsynced_groups and (
+                sync or (self.fsync_every and self._unsynced_groups >= self.fsync_every)):
+            os.fsync(self._file.fileno())
+            self.fsyncs += 1
+            self._unsynced_groups = 0
+    
+    def commit(self):
+        """Write and fsync everything logged so far"""
+        self._write_group(sync=True)
+        self._maybe_compact()
+    
+    def _maybe_compact(self):
+        if self._segment_bytes >= self.compact_bytes and self.state_source is not None:
+            self.compact()
+    
+    # Compaction
+    
+    def compact(self, wait=False):
+        """
+        Seal the open segment and fold the log into a new snapshot in a
+        background thread (or before returning if `wait`). Does nothing
+        while an earlier compaction is still running.
+        """
+        if self.compacting():
+            return
+        self._write_group(sync=True)
+        if self._file is None:
+            return
+        self._file.close()
+        self._file = None
+        
+        # Capture the tuning state now: it must match the end of this segment
+        state = copy.deepcopy(self.state_source())
+        self._compactor = threading.Thread(target=self._compact, args=(self._segment, state),
+                                           name="wal-compaction", daemon=True)
+        self._compactor.start()
+        if wait:
+            self.wait_for_compaction()
+    
+    def compacting(self):
+        return self._compactor is not None and self._compactor.is_alive()
+    
+    def wait_for_compaction(self, timeout=None):
+        """Block until a running compaction finishes; True if none is left running"""
+        if self._compactor is not None:
+            self._compactor.join(timeout)
+        return not self.compacting()
+    
+    def _compact(self, upto, state):
+        try:
+            base = self._latest_snapshot()
+            data = {}
+            if base:
+                _, keys, values = read_snapshot(self._path(SNAPSHOT_PREFIX, base, SNAPSHOT_SUFFIX))
+                data = dict(zip(keys, values))
+                del keys, values
+            
+            segments = [seq for seq in self._numbered(SEGMENT_PREFIX, SEGMENT_SUFFIX)
+                        if base < seq <= upto]
+            for op, key, value in self._read_segments(segments):
+                if op == 'insert':
+                    data[key] = value
+                else:
+                    data.pop(key, None)
+            
+            write_snapshot(self._path(SNAPSHOT_PREFIX, upto, SNAPSHOT_SUFFIX), list(data.items()),
+                           state)
+            for seq in self._numbered(SNAPSHOT_PREFIX, SNAPSHOT_SUFFIX):
+                if seq < upto:
+                    os.remove(self._path(SNAPSHOT_PREFIX, seq, SNAPSHOT_SUFFIX))
+            for seq in self._numbered(SEGMENT_PREFIX, SEGMENT_SUFFIX):
+                if seq <= upto:
+                    os.remove(self._path(SEGMENT_PREFIX, seq, SEGMENT_SUFFIX))
+            self.compactions += 1
+        except Exception as e:
+            self.compaction_error = e  # The sealed segments stay and are replayed instead
+    
+    # Reading
+    
+    def replay(self):
+        """
+        Yield ('insert', key, value) and ('delete', key, None) for every
+        record written since the latest snapshot, in log order.
+        """
+        base = self._latest_snapshot()
+        segments = [seq for seq in self._numbered(SEGMENT_PREFIX, SEGMENT_SUFFIX) if seq > base]
+        return self._read_segments(segments)
+    
+    def _read_segments(self, segments):
+        for seq in segments:
+            yield from self._read_segment(self._path(SEGMENT_PREFIX, seq, SEGMENT_SUFFIX))
+    
+    @staticmethod
+    def _read_segment(path):
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                offset = 0
+                end = len(mm)
+                while offset + RECORD.size <= end:
+                    crc, length = RECORD.unpack_from(mm, offset)
+                    start = offset + RECORD.size
+                    body = mm[start:start + length]
+                    if len(body) < length or zlib.crc32(body) != crc or not body:
+                        return  # Torn or corrupt record: the rest of the segment is unreadable
+                    offset = start + length
+                    
+                    op = body[0]
+                    if op == OP_INSERT_INT:
+                        _, key = INT_OP.unpack_from(body)
+                        yield 'insert', key, pickle.loads(body[INT_OP.size:])
+                    elif op == OP_INSERT:
+                        key, value = pickle.loads(body[1:])
+                        yield 'insert', key, value
+                    elif op == OP_DELETE_INT:
+                        _, key = INT_OP.unpack_from(body)
+                        yield 'delete', key, None
+                    elif op == OP_DELETE:
+                        yield 'delete', pickle.loads(body[1:]), None
+                    else:
+                        return
+    
+    def close(self):
+        """Commit, wait for any compaction, and close the open segment"""
+        self.commit()
+        self.wait_for_compaction()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+    
+    def get_stats(self):
+        return {
+            'records': self.records,
+            'buffered': self._pending,
+            'bytes_written': self.bytes_written,
+            'segment_bytes': self._segment_bytes,
+            'group_commits': self.group_commits,
+            'fsyncs': self.fsyncs,
+            'compactions': self.compactions,
+            'compacting': self.compacting(),
+            'compaction_error': repr(self.compaction_error) if self.compaction_error else None
+        }
@@ -126,8 +126,8 @@ with col3:
 with col4:
     if 'rotation_count' in stats:
         st.metric("Rotations (AVL)", stats['rotation_count'])
-    elif 'collision_rate' in stats:
-        st.metric("Collision Rate", f"{stats['collision_rate']:.2%}")
+    elif 'avg_probe_length' in stats:
+        st.metric("Avg Probe Length", f"{stats['avg_probe_length']:.2f}")
 
 # Graphs
 if len(st.session_state.history['operations']) > 1:
@@ -1,4 +1,3 @@
-# src/utils/__init__.py
-from .workload_generator import WorkloadGenerator
+from .workload_generator import WorkloadGenerator, WorkloadStream, ZipfianRanks
 
-__all__ = ['WorkloadGenerator']
+__all__ = ['WorkloadGenerator', 'WorkloadStream', 'ZipfianRanks']
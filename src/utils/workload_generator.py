@@ -1,5 +1,13 @@
+import math
 import random
 
+try:
+    import numpy as np
+except ImportError:  # Optional: without NumPy only the list workloads are available
+    np = None
+
+HAS_NUMPY = np is not None
+
 
 class WorkloadGenerator:
     """Generates different workload patterns for experimentation"""
@@ -58,6 +66,16 @@ class WorkloadGenerator:
         keys = list(range(n_inserts))  # Sorted inserts
         return WorkloadGenerator.mixed_workload(n_inserts, n_searches, keys)
     
+    @staticmethod
+    def stream(n_ops, distribution='uniform', key_space=1000000, mix=None, seed=0,
+               chunk_size=1 << 16, **params):
+        """
+        Generator version of the workloads above for runs of any length:
+        see WorkloadStream. Yields ('insert', key, key), ('search', key,
+        None), ('delete', key, None) and ('range', lo, hi).
+        """
+        return iter(WorkloadStream(n_ops, distribution, key_space, mix, seed, chunk_size, **params))
+    
     @staticmethod
     def evolving_workload():
         """
@@ -87,4 +105,194 @@ class WorkloadGenerator:
                 key = random.randint(1000, 2000)
                 ops.append(('insert', key, f"value_{key}"))
         
-        return ops  
\ No newline at end of file
+        return ops  
+
+
+INSERT, SEARCH, DELETE, RANGE = range(4)
+OP_NAMES = ('insert', 'search', 'delete', 'range')
+DISTRIBUTIONS = ('uniform', 'zipfian', 'hotspot', 'latest', 'sequential')
+_EXACT_ZETA_TERMS = 10 ** 7
+_SCRAMBLE_PRIME = 2147483647  # Multiplier of the rank -> key bijection (2**31 - 1)
+
+
+def _zeta(n, theta):
+    """Sum of 1 / i**theta for i in 1..n; the tail past 10**7 terms by its integral"""
+    exact = min(n, _EXACT_ZETA_TERMS)
+    total = 0.0
+    for start in range(1, exact + 1, 1 << 20):
+        i = np.arange(start, min(start + (1 << 20), exact + 1), dtype=np.float64)
+        total += float(np.sum(i ** -theta))
+    if n > exact:
+        # Euler-Maclaurin: integral over (exact, n] plus the endpoint correction
+        total += (n ** (1 - theta) - exact ** (1 - theta)) / (1 - theta)
+        total += (n ** -theta - exact ** -theta) / 2
+    return total
+
+
+def _mulmod(a, m, n):
+    """a * m % n for an int64 array `a` in [0, n) and 0 <= m < n <= 2**63, without overflow"""
+    if (n - 1) * m < 1 << 63:
+        return a * m % n
+    # Shift-and-add over the bits of m: every partial sum stays below 2n <= 2**64
+    a = a.astype(np.uint64)
+    n = np.uint64(n)
+    result = np.zeros_like(a)
+    while m:
+        if m & 1:
+            result += a
+            result %= n
+        a <<= np.uint64(1)
+        a %= n
+        m >>= 1
+    return result.astype(np.int64)
+
+
+class ZipfianRanks:
+    """
+    Bounded Zipfian ranks in [0, n): rank 0 is the most popular. Uses the
+    closed-form sampler of Gray et al. ("Quickly generating billion-record
+    synthetic databases", as in YCSB), so a batch is a few array passes and
+    setup costs one zeta(n) sum. 0 < theta < 1; 0.99 is the YCSB default.
+    """
+    
+    def __init__(self, n, theta=0.99):
+        if not 0 < theta < 1:
+            raise ValueError(f"theta must be in (0, 1), got {theta}")
+        if n < 1:
+            raise ValueError(f"n must be at least 1, got {n}")
+        self.n = n
+        self.theta = theta
+        self.zetan = _zeta(n, theta)
+        self.alpha = 1 / (1 - theta)
+        self.second = 1 + 0.5 ** theta  # zeta(2): below it u * zetan picks rank 1
+        self.eta = ((1 - (2 / n) ** (1 - theta)) / (1 - self.second / self.zetan)
+                    if n > 2 else 0.0)
+    
+    def sample(self, rng, size):
+        u = rng.random(size)
+        ranks = (self.n * (self.eta * u - self.eta + 1) ** self.alpha).astype(np.int64)
+        uz = u * self.zetan
+        ranks[uz < self.second] = 1
+        ranks[uz < 1] = 0
+        np.clip(ranks, 0, self.n - 1, out=ranks)
+        return ranks
+
+
+class WorkloadStream:
+    """
+    Reproducible stream of `n_ops` operations, generated in NumPy chunks of
+    `chunk_size` so memory doesn't grow with the run length.
+    `mix` weights 'insert', 'search', 'delete' and 'range'; `distribution`
+    is 'uniform', 'zipfian', 'hotspot', 'latest' or 'sequential'. chunks()
+    yields the raw (ops, keys) arrays.
+    """
+    
+    def __init__(self, n_ops, distribution='uniform', key_space=1000000, mix=None, seed=0,
+                 chunk_size=1 << 16, theta=0.99, scrambled=True, hot_fraction=0.1,
+                 hot_probability=0.9, noise=0.05, range_span=100):
+        if np is None:
+            raise ImportError("WorkloadStream requires NumPy")
+        if distribution not in DISTRIBUTIONS:
+            raise ValueError(f"Unknown distribution {distribution!r}, expected one of {DISTRIBUTIONS}")
+        if not 2 <= key_space <= 1 << 63:
+            raise ValueError(f"key_space must be in [2, 2**63], got {key_space}")
+        if chunk_size < 1:
+            raise ValueError(f"chunk_size must be at least 1, got {chunk_size}")
+        if not 0 < hot_fraction < 1:
+            raise ValueError(f"hot_fraction must be in (0, 1), got {hot_fraction}")
+        if not 0 <= hot_probability <= 1 or not 0 <= noise <= 1:
+            raise ValueError("hot_probability and noise must be in [0, 1]")
+        
+        mix = {'insert': 0.5, 'search': 0.5} if mix is None else mix
+        unknown = set(mix) - set(OP_NAMES)
+        if unknown:
+            raise ValueError(f"Unknown operations in mix: {sorted(unknown)}")
+        weights = np.array([float(mix.get(name, 0)) for name in OP_NAMES])
+        if (weights < 0).any() or weights.sum() <= 0:
+            raise ValueError("mix weights must be non-negative and not all zero")
+        
+        self.n_ops = n_ops
+        self.distribution = distribution
+        self.key_space = key_space
+        self.mix = weights / weights.sum()
+        self.seed = seed
+        self.chunk_size = chunk_size
+        self.theta = theta
+        self.scrambled = scrambled
+        self.hot_keys = max(1, int(key_space * hot_fraction))
+        self.hot_probability = hot_probability
+        self.noise = noise
+        self.range_span = range_span
+        
+        self._zipf = (ZipfianRanks(key_space, theta)
+                      if distribution in ('zipfian', 'latest') else None)
+        self._multiplier = _SCRAMBLE_PRIME % key_space
+        while math.gcd(self._multiplier, key_space) != 1:
+            self._multiplier += 1
+    
+    def __len__(self):
+        return self.n_ops
+    
+    def chunks(self):
+        """Yield (ops, keys): a uint8 op code array and an int64 key array per chunk"""
+        rng = np.random.default_rng(self.seed)
+        inserted = 0  # Keys appended so far by 'latest' and 'sequential'
+        remaining = self.n_ops
+        while remaining > 0:
+            n = min(self.chunk_size, remaining)
+            remaining -= n
+            ops = rng.choice(len(OP_NAMES), size=n, p=self.mix).astype(np.uint8)
+            keys, inserted = self._keys(rng, ops, inserted)
+            yield ops, keys
+    
+    def _keys(self, rng, ops, inserted):
+        n = len(ops)
+        distribution = self.distribution
+        if distribution == 'uniform':
+            return rng.integers(0, self.key_space, n, dtype=np.int64), inserted
+        if distribution == 'zipfian':
+            ranks = self._zipf.sample(rng, n)
+            if self.scrambled:
+                # rank * m mod key_space with gcd(m, key_space) = 1 is a bijection
+                ranks = _mulmod(ranks, self._multiplier, self.key_space)
+            return ranks, inserted
+        if distribution == 'hotspot':
+            hot = rng.random(n) < self.hot_probability
+            keys = rng.integers(self.hot_keys, self.key_space, n, dtype=np.int64)
+            keys[hot] = rng.integers(0, self.hot_keys, int(hot.sum()), dtype=np.int64)
+            return keys, inserted
+        
+        # 'latest' and 'sequential': inserts take the next new key
+        is_insert = ops == INSERT
+        before = np.cumsum(is_insert, dtype=np.int64)
+        before -= is_insert  # Keys inserted before each operation
+        before += inserted
+        if distribution == 'latest':
+            # Redrawing ranks past the oldest key keeps them Zipfian over [0, before)
+            ranks = self._zipf.sample(rng, n)
+            redraw = np.flatnonzero((ranks >= before) & (before > 0))
+            while len(redraw):
+                ranks[redraw] = self._zipf.sample(rng, len(redraw))
+                redraw = redraw[ranks[redraw] >= before[redraw]]
+            keys = before - 1 - ranks
+            np.maximum(keys, 0, out=keys)  # Nothing inserted yet
+        else:
+            keys = (rng.random(n) * np.maximum(before, 1)).astype(np.int64)
+            noisy = is_insert & (rng.random(n) < self.noise)
+            keys[noisy] = rng.integers(0, self.key_space, int(noisy.sum()), dtype=np.int64)
+            is_insert &= ~noisy
+        keys[is_insert] = before[is_insert]
+        return keys, inserted + int((ops == INSERT).sum())
+    
+    def __iter__(self):
+        span = self.range_span
+        for ops, keys in self.chunks():
+            for op, key in zip(ops.tolist(), keys.tolist()):
+                if op == SEARCH:
+                    yield 'search', key, None
+                elif op == INSERT:
+                    yield 'insert', key, key
+                elif op == DELETE:
+                    yield 'delete', key, None
+                else:
+                    yield 'range', key, key + span
@@ -0,0 +1,49 @@
+import asyncio
+import time
+
+from src.core import AsyncSelfTuningMap, CountingBloomFilter
+
+
+async def _max_gap(amap, writes):
+    """Run `writes` against `amap` beside a ticker; the longest the loop went without ticking"""
+    gaps = [0.0]
+    done = False
+    
+    async def ticker():
+        last = time.perf_counter()
+        while not done:
+            await asyncio.sleep(0)
+            now = time.perf_counter()
+            gaps[0] = max(gaps[0], now - last)
+            last = now
+    
+    task = asyncio.create_task(ticker())
+    await writes
+    done = True
+    await task
+    return gaps[0]
+
+
+def test_switch_and_filter_growth_hold_the_loop_one_chunk_at_a_time():
+    async def run():
+        bloom = CountingBloomFilter(100000)
+        amap = AsyncSelfTuningMap(initial_structure='BST', instrumentation='off', bloom=bloom)
+        await amap.insert_many((k, k) for k in range(0, 199990, 2))  # Just short of overflowing it
+        
+        async def writes():
+            await amap.force_switch('HashMap')
+            for key in range(1, 80000, 2):
+                await amap.insert(key, key)
+                if key % 32 == 1:
+                    await asyncio.sleep(0)
+            await amap.wait_for_migration()
+        
+        gap = await _max_gap(amap, writes())
+        assert amap.get_current_structure() == 'HashMap'
+        assert bloom.rebuilds >= 1 and bloom.pending is None
+        assert bloom.count == amap.map.active_ds.size
+        return gap
+    
+    # The copy, commit, release and filter growth each run in small slices;
+    # the bound leaves room for a busy machine
+    assert asyncio.run(run()) < 0.05
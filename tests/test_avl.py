@@ -0,0 +1,55 @@
+import random
+
+from src.core import AVL
+
+
+def _check_balanced(tree):
+    """Checks every node height and balance factor; returns the node count"""
+    count = 0
+    stack = [(tree.root, None, None)]
+    while stack:
+        node, lo, hi = stack.pop()
+        if node is None:
+            continue
+        count += 1
+        assert (lo is None or node.key > lo) and (hi is None or node.key < hi)
+        left = node.left.height if node.left else 0
+        right = node.right.height if node.right else 0
+        assert node.height == 1 + max(left, right)
+        assert abs(left - right) <= 1
+        stack.append((node.left, lo, node.key))
+        stack.append((node.right, node.key, hi))
+    assert count == tree.size
+    return count
+
+
+def test_stays_balanced_under_single_operations():
+    rng = random.Random(0)
+    tree = AVL()
+    for key in range(2000):
+        tree.insert(key, key)  # Sorted: the worst case for an unbalanced tree
+    _check_balanced(tree)
+    assert tree.get_height() <= 12
+    for step in range(4000):
+        key = rng.randrange(4000)
+        if rng.random() < 0.5:
+            tree.insert(key, step)
+        else:
+            tree.delete(key)
+        if step % 400 == 0:
+            _check_balanced(tree)
+    _check_balanced(tree)
+    assert tree.rotation_count > 0
+
+
+def test_stays_balanced_under_batches():
+    rng = random.Random(1)
+    tree = AVL()
+    for _ in range(30):
+        tree.insert_many((rng.randrange(5000), 0) for _ in range(rng.randrange(1, 800)))
+        _check_balanced(tree)
+        tree.delete_many(rng.randrange(5000) for _ in range(rng.randrange(1, 600)))
+        _check_balanced(tree)
+    tree.bulk_load((key, key) for key in range(1000))
+    assert _check_balanced(tree) == 1000
+    assert tree.get_height() == 10
@@ -0,0 +1,112 @@
+import random
+from bisect import bisect_left, bisect_right
+
+import pytest
+
+from src.core import AVL, BPlusTree, BST, HashMap, SortedArrayMap
+from src.core.sorted_array_map import HAS_NUMPY
+
+BACKENDS = [BST, AVL, BPlusTree, HashMap]
+if HAS_NUMPY:
+    BACKENDS.append(SortedArrayMap)
+
+
+def _check_reads(ds, model, rng):
+    keys = sorted(model)
+    assert ds.size == len(model)
+    assert sorted(ds.get_all_items()) == sorted(model.items())
+    for _ in range(20):
+        key = rng.randrange(-10, 1010)
+        assert ds.search(key) == model.get(key)
+        
+        i = bisect_right(keys, key)
+        assert ds.floor(key) == ((keys[i - 1], model[keys[i - 1]]) if i else None)
+        i = bisect_left(keys, key)
+        assert ds.ceiling(key) == ((keys[i], model[keys[i]]) if i < len(keys) else None)
+        
+        hi = key + rng.randrange(50)
+        expected = [(k, model[k]) for k in keys[bisect_left(keys, key):bisect_left(keys, hi)]]
+        assert ds.range(key, hi) == expected
+        assert ds.range(key, hi, limit=3) == expected[:3]
+    assert ds.min() == ((keys[0], model[keys[0]]) if keys else None)
+    assert ds.max() == ((keys[-1], model[keys[-1]]) if keys else None)
+    assert ds.range() == [(k, model[k]) for k in keys]
+
+
+@pytest.mark.parametrize('backend', BACKENDS, ids=lambda cls: cls.__name__)
+def test_matches_dict_under_random_operations(backend):
+    for seed in range(3):
+        rng = random.Random(seed)
+        ds = backend()
+        model = {}
+        for step in range(3000):
+            op = rng.random()
+            key = rng.randrange(1000)
+            if op < 0.5:
+                assert ds.insert(key, step) == (key not in model)
+                model[key] = step
+            elif op < 0.8:
+                assert ds.delete(key) == (key in model)
+                model.pop(key, None)
+            else:
+                assert ds.search(key) == model.get(key)
+            if step % 500 == 499:
+                _check_reads(ds, model, rng)
+        _check_reads(ds, model, rng)
+
+
+@pytest.mark.parametrize('backend', BACKENDS, ids=lambda cls: cls.__name__)
+def test_batches_match_single_operations(backend):
+    rng = random.Random(7)
+    ds = backend()
+    model = {}
+    for _ in range(20):
+        items = [(rng.randrange(1000), rng.random()) for _ in range(rng.randrange(1, 400))]
+        seen = set(model)
+        expected = []
+        for key, value in items:
+            expected.append(key not in seen)
+            seen.add(key)
+            model[key] = value
+        assert ds.insert_many(items) == expected
+        
+        keys = [rng.randrange(1000) for _ in range(rng.randrange(1, 300))]
+        assert ds.search_many(keys) == [model.get(key) for key in keys]
+        
+        keys = [rng.randrange(1000) for _ in range(rng.randrange(1, 300))]
+        expected = []
+        for key in keys:
+            expected.append(key in model)
+            model.pop(key, None)
+        assert ds.delete_many(keys) == expected
+        _check_reads(ds, model, rng)
+
+
+@pytest.mark.parametrize('backend', BACKENDS, ids=lambda cls: cls.__name__)
+def test_scan_visits_every_item_despite_interleaved_writes(backend):
+    ds = backend()
+    ds.insert_many((key, key) for key in range(0, 4000, 2))
+    seen = set()
+    cursor = None
+    key = 1
+    while True:
+        items, cursor = ds.scan(cursor, 64)
+        seen.update(k for k, _ in items)
+        if cursor is None:
+            break
+        ds.insert(key, key)  # Keys written mid-scan may or may not be seen
+        key += 2
+    assert seen >= set(range(0, 4000, 2))
+
+
+@pytest.mark.parametrize('backend', BACKENDS, ids=lambda cls: cls.__name__)
+def test_bulk_load_and_clear(backend):
+    ds = backend()
+    ds.insert(-1, 'gone')
+    ds.bulk_load((key, str(key)) for key in range(500))
+    assert ds.size == 500
+    assert ds.search(-1) is None
+    assert ds.search(250) == '250'
+    assert list(ds.items_from(495)) == [(key, str(key)) for key in range(495, 500)]
+    ds.clear()
+    assert ds.size == 0 and ds.get_all_items() == [] and ds.min() is None
@@ -0,0 +1,67 @@
+import random
+
+from src.core import CountingBloomFilter, SelfTuningMap
+
+
+
+def test_filter_never_rules_out_an_added_key():
+    bloom = CountingBloomFilter()
+    for key in range(5000):
+        bloom.add(key)
+    for key in range(0, 5000, 2):
+        bloom.remove(key)
+    assert all(bloom.might_contain(key) for key in range(1, 5000, 2))
+
+
+def test_stepped_resize_matches_rebuild():
+    bloom = CountingBloomFilter()
+    bloom.start_resize(6000)
+    for key in range(3000):
+        bloom.add(key)  # Written during the resize: reaches both copies
+    bloom.refill(range(3000, 6000))
+    bloom.finish_resize(6000)
+    
+    rebuilt = CountingBloomFilter()
+    rebuilt.rebuild(range(6000))
+    assert bloom.slots == rebuilt.slots
+    assert bloom.counters == rebuilt.counters
+    assert bloom.pending is None
+
+
+def test_overflow_grows_filter_a_slice_per_write():
+    stm = SelfTuningMap(initial_structure='HashMap', instrumentation='off', bloom=True)
+    step = stm.FILTER_RESIZE_STEP
+    refilled = []
+    refill = stm.bloom.refill
+    stm.bloom.refill = lambda keys: refilled.append(list(keys)) or refill(refilled[-1])
+    
+    rng = random.Random(1)
+    keys = rng.sample(range(10 ** 9), 20000)
+    for i, key in enumerate(keys):
+        stm.insert(key, i)
+        if i % 3 == 0:
+            stm.delete(keys[i // 2])
+    
+    assert stm.bloom.rebuilds >= 3
+    assert max(len(chunk) for chunk in refilled) <= step
+    assert stm.bloom.count == stm.active_ds.size
+    deleted = {keys[i // 2] for i in range(0, len(keys), 3)}
+    assert all(stm.search(key) == i for i, key in enumerate(keys) if key not in deleted)
+
+
+def test_filter_follows_incremental_migration():
+    stm = SelfTuningMap(migration_mode='incremental', migration_batch_size=64,
+                        instrumentation='off', bloom=True)
+    for key in range(3000):
+        stm.insert(key, key)
+    stm.force_switch('HashMap')
+    key = 3000
+    while stm.migration is not None or stm.bloom.pending is not None:
+        stm.insert(key, key)
+        stm.migration_step()
+        key += 1
+    assert stm.get_current_structure() == 'HashMap'
+    assert stm.bloom.count == stm.active_ds.size
+    assert not stm.bloom.needs_resize(stm.active_ds.size)
+    assert all(stm.search(k) == k for k in range(key))
+    assert stm.search(-1) is None
@@ -0,0 +1,60 @@
+import random
+
+from src.core import BST
+
+
+def test_height_bound_is_exact_without_deletes():
+    tree = BST()
+    for key in range(500):
+        tree.insert(key, key)  # Sorted: a chain
+    assert tree.get_height_bound() == tree.get_height() == 500
+    
+    tree = BST()
+    rng = random.Random(0)
+    for key in rng.sample(range(100000), 3000):
+        tree.insert(key, key)
+    tree.insert_many((rng.randrange(200000), 0) for _ in range(1000))
+    assert tree.get_height_bound() == tree.get_height()
+
+
+def test_height_bound_never_undershoots():
+    for seed in range(50):
+        rng = random.Random(seed)
+        tree = BST()
+        for _ in range(6):
+            keys = rng.sample(range(1000), rng.randrange(1, 300))
+            step = rng.randrange(4)
+            if step == 0:
+                for key in keys:
+                    tree.insert(key, key)
+            elif step == 1:
+                tree.insert_many((key, key) for key in keys)
+            elif step == 2:
+                tree.delete_many(keys)
+            else:
+                for key in keys:
+                    tree.delete(key)
+            assert tree.get_height_bound() >= tree.get_height()
+    
+    tree.bulk_load([(key, key) for key in range(1000)])
+    assert tree.get_height_bound() == tree.get_height() == 10
+
+
+def test_sorted_inserts_build_a_deep_chain_without_recursion():
+    tree = BST()
+    n = 3000  # Three times the default recursion limit
+    for key in range(n):
+        tree.insert(key, key)
+    assert tree.get_height() == n
+    assert tree.search(n - 1) == n - 1
+    assert tree.get_all_items() == [(key, key) for key in range(n)]
+    assert tree.range(n - 5) == [(key, key) for key in range(n - 5, n)]
+    assert tree.floor(n + 10) == (n - 1, n - 1) and tree.max() == (n - 1, n - 1)
+    assert [key for key, _ in tree.items_from(n - 3)] == [n - 3, n - 2, n - 1]
+    assert tree.insert_many([(n + 1, 0), (n, 0)]) == [True, True]
+    assert tree.delete(0) and tree.delete(n + 1)
+    assert tree.delete_many(range(1, 2000)) == [True] * 1999
+    assert tree.size == n - 1999
+    while not tree.release_step(100):
+        pass
+    assert tree.size == 0
@@ -0,0 +1,90 @@
+import random
+
+from src.core import ChangeDetector, SelfTuningMap
+
+
+def _run(stm, rng, n, search_ratio, keys=None):
+    for i in range(n):
+        key = rng.randrange(100000) if keys is None else keys(i)
+        if rng.random() < search_ratio:
+            stm.search(key)
+        else:
+            stm.insert(key, key)
+
+
+def _counters_map():
+    # Untimed, so the run is deterministic; latency is tested on its own below
+    stm = SelfTuningMap(initial_structure='HashMap', instrumentation='counters')
+    stm.decision_engine.min_ops_before_switch = float('inf')
+    return stm
+
+
+def test_op_mix_and_key_order_changes_are_detected():
+    rng = random.Random(1)
+    stm = _counters_map()
+    engine = stm.decision_engine
+    _run(stm, rng, 20000, 0.7)
+    assert not engine.change_points
+    
+    start = stm.stats.total_ops
+    _run(stm, rng, 2000, 0.2)
+    changes = list(engine.change_points)
+    assert changes and changes[0]['signal'] == 'search'
+    assert changes[0]['at_operation'] - start <= 200
+    
+    start = stm.stats.total_ops
+    _run(stm, rng, 2000, 0.2, keys=lambda i: 10 ** 6 + i)
+    changes = [c for c in engine.change_points if c['at_operation'] > start]
+    assert changes and changes[0]['signal'] == 'order'
+    assert changes[0]['at_operation'] - start <= 300
+    assert stm.stats.get_order_score() > 0.9  # Windows trimmed to the sorted phase
+
+
+def test_detector_is_fed_at_a_fixed_cadence():
+    stm = _counters_map()
+    _run(stm, random.Random(2), 16000, 0.7)
+    detector = stm.decision_engine.change_detector
+    assert detector.samples == 16000 // SelfTuningMap.DETECT_INTERVAL - 1  # The first sets the baseline
+    
+    stm.insert_many((key, key) for key in range(5000))
+    assert detector.samples == 16000 // SelfTuningMap.DETECT_INTERVAL
+
+
+def test_latency_shift_is_detected_and_noise_is_not():
+    rng = random.Random(3)
+    detector = ChangeDetector()
+    totals = {'recorded_ops': 0, 'ops': 0, 'searches': 0, 'pairs': 0, 'ascending_pairs': 0,
+              'latency': {'search': (0, 0.0)}}
+    
+    def feed(mean_log2, blocks):
+        signals = []
+        for _ in range(blocks):
+            count, log_sum = totals['latency']['search']
+            for _ in range(16):
+                count += 1
+                # Log-normal-ish jitter plus an occasional 1000x outlier
+                log_sum += mean_log2 + rng.gauss(0, 0.5) + (10 if rng.random() < 0.01 else 0)
+            totals['latency'] = {'search': (count, log_sum)}
+            totals['recorded_ops'] += 16
+            totals['ops'] += 16
+            totals['searches'] += 16
+            signals.append(detector.observe(dict(totals)))
+        return signals
+    
+    assert not any(feed(11.0, 2000))
+    signals = feed(12.0, 20)  # 2x slower
+    assert 'latency' in signals and signals.index('latency') < 12
+
+
+def test_checks_back_off_on_a_stable_workload():
+    rng = random.Random(4)
+    stm = SelfTuningMap(initial_structure='HashMap', instrumentation='counters')
+    stm.active_ds.bulk_load((key, key) for key in range(100000))
+    engine = stm.decision_engine
+    _run(stm, rng, 60000, 0.7)
+    
+    assert not engine.change_points and not engine.switch_history
+    assert engine.check_interval == engine.max_check_interval
+    checks = engine.check_count
+    _run(stm, rng, 20000, 0.7)
+    assert engine.check_count - checks <= 20000 // engine.max_check_interval + 1
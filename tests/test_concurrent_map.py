@@ -0,0 +1,104 @@
+import random
+import threading
+
+import pytest
+
+from src.core import ConcurrentSelfTuningMap, RWLock
+
+
+def test_threads_with_a_background_switch_lose_no_writes():
+    stm = ConcurrentSelfTuningMap(initial_structure='AVL', migration_batch_size=64)
+    stm.insert_many((key, key) for key in range(0, 20000, 4))
+    errors = []
+    
+    def writer(offset):
+        rng = random.Random(offset)
+        try:
+            for i in range(3000):
+                key = offset + 4 * rng.randrange(5000)
+                stm.insert(key, -key)
+                if i % 5 == 0:
+                    stm.delete(key)
+                    stm.insert(key, -key)
+        except Exception as e:
+            errors.append(e)
+    
+    def reader():
+        rng = random.Random(0)
+        try:
+            for _ in range(5000):
+                key = 4 * rng.randrange(5000)
+                assert stm.search(key) == key  # Never written by the writers
+        except Exception as e:
+            errors.append(e)
+    
+    threads = [threading.Thread(target=writer, args=(offset,)) for offset in (1, 2, 3)]
+    threads += [threading.Thread(target=reader) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    stm.force_switch('HashMap')
+    for thread in threads:
+        thread.join()
+    stm.wait_for_migration()
+    
+    assert not errors
+    items = dict(stm.active_ds.get_all_items())
+    assert all(items[key] == key for key in range(0, 20000, 4))
+    assert all(value == -key for key, value in items.items() if key % 4)
+    assert stm.get_stats()['inserts'] >= 5000 + 3 * 3000
+
+
+def test_builder_frees_the_old_structure_outside_the_lock():
+    stm = ConcurrentSelfTuningMap(initial_structure='AVL', migration_batch_size=64,
+                                  instrumentation='off')
+    stm.insert_many((key, key) for key in range(20000))
+    source = stm.active_ds
+    stm.force_switch('BPlusTree')
+    for i in range(2000):
+        assert stm.search(i) == i  # Operations never free: only the builder does
+    assert stm.wait_for_migration(10)
+    
+    assert stm.get_current_structure() == 'BPlusTree'
+    assert stm.retired == [] and stm.get_memory_stats()['retired_structures'] == 0
+    assert source.size == 0 and source.root is None and not source._releasing
+    assert all(stm.search(key) == key for key in range(0, 20000, 7))
+
+
+def test_ordered_reads_over_pending_writes_share_the_lock():
+    pytest.importorskip('numpy')
+    stm = ConcurrentSelfTuningMap(initial_structure='SortedArray', instrumentation='off')
+    stm.active_ds.bulk_load((key, key) for key in range(0, 2000, 2))
+    stm.insert(1, 1)
+    stm.delete(4)
+    assert stm.active_ds.get_pending() == 2
+    
+    results = []
+    stm._lock.acquire_read()
+    try:
+        reader = threading.Thread(target=lambda: results.append(stm.range(0, 8)))
+        reader.start()
+        reader.join(2)
+    finally:
+        stm._lock.release_read()
+    assert results == [[(0, 0), (1, 1), (2, 2), (6, 6)]]
+
+
+def test_rwlock_lets_readers_share_and_writers_exclude():
+    lock = RWLock()
+    inside = []
+    
+    lock.acquire_read()
+    reader = threading.Thread(target=lambda: (lock.acquire_read(), inside.append('reader'),
+                                              lock.release_read()))
+    reader.start()
+    reader.join(2)
+    assert inside == ['reader']
+    
+    writer = threading.Thread(target=lambda: (lock.acquire_write(), inside.append('writer'),
+                                              lock.release_write()))
+    writer.start()
+    writer.join(0.1)
+    assert inside == ['reader']  # Blocked until the first reader leaves
+    lock.release_read()
+    writer.join(2)
+    assert inside == ['reader', 'writer']
@@ -0,0 +1,80 @@
+import pytest
+
+from src.core import DecisionEngine, SelfTuningMap
+
+
+# Search-heavy random keys on a tall BST: the HashMap is cheaper per op.
+# No key order, so the cost per op doesn't depend on the horizon.
+SUMMARY = {'total_ops': 10000, 'search_ratio': 0.9, 'insert_ratio': 0.1, 'delete_ratio': 0.0,
+           'range_ratio': 0.0, 'order_score': 0.0, 'int_keys': False}
+SIZE = 20000
+HEIGHT = 60
+
+
+def _decide(horizon_ops, switch_margin=1.0):
+    engine = DecisionEngine('cost_model', horizon_ops=horizon_ops, calibrate=False)
+    engine.switch_margin = switch_margin
+    decision = engine.decide_structure('BST', SUMMARY, HEIGHT, SIZE)
+    return decision, engine.last_decision
+
+
+def _break_even_horizon():
+    """Ops after which the best structure's savings pay for migrating to it"""
+    _, numbers = _decide(1000)
+    costs = numbers['op_cost']
+    saved_per_op = costs['BST'] - costs[numbers['best']]
+    assert saved_per_op > 0
+    return numbers['migration_cost'] / saved_per_op
+
+
+def test_switch_waits_until_savings_over_the_horizon_beat_the_migration():
+    break_even = _break_even_horizon()
+    
+    (should_switch, target, reason), numbers = _decide(int(break_even * 0.9))
+    assert not should_switch and target == 'BST'
+    assert 0 < numbers['projected_savings'] < numbers['migration_cost']
+    
+    (should_switch, target, reason), numbers = _decide(int(break_even * 1.1) + 1)
+    assert should_switch and target == numbers['best'] != 'BST'
+    assert numbers['projected_savings'] > numbers['migration_cost']
+    assert reason.startswith('Cost model:')
+
+
+def test_switch_margin_raises_the_savings_required():
+    horizon = int(_break_even_horizon() * 1.5) + 1
+    assert _decide(horizon)[0][0]
+    (should_switch, _, _), numbers = _decide(horizon, switch_margin=2.0)
+    assert not should_switch
+    assert numbers['migration_cost'] < numbers['projected_savings'] < 2 * numbers['migration_cost']
+
+
+def test_larger_structure_needs_a_longer_horizon():
+    engine = DecisionEngine('cost_model', horizon_ops=int(_break_even_horizon() * 1.1) + 1,
+                            calibrate=False)
+    assert engine.decide_structure('BST', SUMMARY, HEIGHT, SIZE)[0]
+    # Ten times the items to move, for the same savings per op
+    assert not engine.decide_structure('BST', SUMMARY, HEIGHT, 10 * SIZE)[0]
+
+
+def test_switch_history_records_the_numbers_behind_the_decision():
+    engine = DecisionEngine('cost_model', calibrate=False)
+    stm = SelfTuningMap(initial_structure='BST', decision_engine=engine)
+    for key in range(3000):  # Sorted inserts: the BST degrades into a list
+        stm.insert(key, key)
+    
+    history = stm.get_stats()['switch_history']
+    assert history
+    switch = history[0]
+    assert switch['from'] == 'BST' and switch['to'] != 'BST'
+    assert switch['reason'].startswith('Cost model:')
+    
+    details = switch['details']
+    assert details['mode'] == 'cost_model'
+    assert details['best'] == switch['to']
+    assert details['horizon_ops'] == engine.horizon_ops
+    costs = details['op_cost']
+    assert costs[switch['to']] == min(costs.values())
+    assert details['projected_savings'] == pytest.approx(
+        (costs['BST'] - costs[switch['to']]) * engine.horizon_ops)
+    assert details['projected_savings'] > details['migration_cost'] * engine.switch_margin
+    assert details['size'] == switch['at_operation']  # Every op so far inserted a new key
@@ -0,0 +1,38 @@
+from src.core import HashMap
+
+
+def test_reserved_table_allocates_no_next_table():
+    hm = HashMap()
+    hm.reserve(150000)
+    capacity = hm.capacity
+    for start in range(0, 150000, 250):
+        hm.insert_many((key, key) for key in range(start, start + 250))
+    assert hm.capacity == capacity and hm.resize_count == 1
+    assert not hm._next_keys
+    
+    hm.insert(-1, -1)  # Past the reserved size: preparing the next grow resumes
+    assert hm._next_keys is not None
+
+
+def test_next_table_grows_a_bounded_step_per_insert():
+    hm = HashMap()
+    grown = 0
+    for key in range(200000):
+        before = len(hm._next_keys or ())
+        hm.insert(key, key)
+        after = len(hm._next_keys or ())
+        if after > before:
+            grown = max(grown, after - before)
+    assert 0 < grown <= HashMap.PREALLOC_STEP
+    assert all(hm.search(key) == key for key in range(0, 200000, 7))
+
+
+def test_batch_into_a_filled_table_grows_incrementally():
+    hm = HashMap()
+    for key in range(49000):
+        hm.insert(key, key)
+    capacity = hm.capacity
+    assert hm.insert_many((key, key) for key in range(49000, 49400)) == [True] * 400
+    assert hm.capacity == 2 * capacity
+    assert hm.is_resizing()  # Left for later operations to drain
+    assert hm.search_many(range(0, 49400, 13)) == list(range(0, 49400, 13))
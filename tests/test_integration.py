@@ -0,0 +1,52 @@
+import random
+
+import pytest
+
+from src.core import SelfTuningMap
+
+
+def _run_phases(stm):
+    """Sorted inserts, random point reads and writes, then ordered reads, checked against a dict"""
+    rng = random.Random(0)
+    model = {}
+    for key in range(4000):
+        stm.insert(key, key)
+        model[key] = key
+    after_sorted = stm.get_current_structure()
+    
+    for step in range(8000):
+        key = rng.randrange(8000)
+        if step % 4 == 0:
+            stm.insert(key, step)
+            model[key] = step
+        elif step % 9 == 0:
+            stm.delete(key)
+            model.pop(key, None)
+        else:
+            assert stm.search(key) == model.get(key)
+    
+    keys = sorted(model)
+    for _ in range(2000):
+        lo = rng.randrange(8000)
+        expected = [(k, model[k]) for k in keys if lo <= k < lo + 20]
+        assert stm.range(lo, lo + 20) == expected
+    while stm.migration is not None:
+        stm.migration_step()
+    assert sorted(stm.active_ds.get_all_items()) == sorted(model.items())
+    return after_sorted, stm
+
+
+@pytest.mark.parametrize('mode', ['blocking', 'incremental'])
+def test_map_adapts_across_phases_without_losing_data(mode):
+    after_sorted, stm = _run_phases(SelfTuningMap(migration_mode=mode))
+    assert after_sorted != 'BST'  # A sorted stream degrades the BST it starts on
+    assert stm.get_current_structure() != 'HashMap'  # Range-heavy at the end
+    stats = stm.get_stats()
+    assert stats['migration_count'] >= 1
+    assert stats['total_ops'] == 4000 + 8000 + 2000
+
+
+@pytest.mark.parametrize('instrumentation', ['sampled', 'counters'])
+def test_instrumentation_levels_keep_the_same_data(instrumentation):
+    _, stm = _run_phases(SelfTuningMap(instrumentation=instrumentation, cache=True, bloom=True))
+    assert stm.get_stats()['total_ops'] == 4000 + 8000 + 2000
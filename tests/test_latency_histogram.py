@@ -0,0 +1,97 @@
+import random
+
+import pytest
+
+from src.core import LatencyHistogram, SelfTuningMap
+
+
+def _nanoseconds(rng, n):
+    # Spread over six orders of magnitude, as op latencies and pauses are
+    return [int(10 ** rng.uniform(1, 7)) for _ in range(n)]
+
+
+def _filled(values):
+    histogram = LatencyHistogram()
+    for ns in values:
+        histogram.record(ns / 1e9)
+    return histogram
+
+
+def test_buckets_hold_their_values_within_the_precision():
+    histogram = LatencyHistogram(precision_bits=5)
+    error = 1 / 2 ** (histogram.precision_bits - 1)
+    for ns in list(range(100)) + _nanoseconds(random.Random(0), 2000):
+        histogram.clear()
+        histogram.record(ns / 1e9)
+        value = histogram.max_value  # The recorded value, after rounding to ns
+        (bucket,) = histogram.counts
+        width = histogram._bucket_width(bucket)
+        assert bucket <= value < bucket + width
+        assert width == 1 or width / bucket <= error
+    
+    # Values below 2**precision_bits ns are kept exactly
+    assert LatencyHistogram(precision_bits=5)._bucket_width(31) == 1
+
+
+def test_percentiles_and_max_are_within_the_precision():
+    samples = _nanoseconds(random.Random(1), 20000)
+    values = _filled(samples)
+    exact = sorted(int(ns / 1e9 * 1e9) for ns in samples)  # As recorded
+    error = 1 / 2 ** (values.precision_bits - 1)
+    summary = values.get_summary()
+    
+    assert summary['count'] == len(exact)
+    assert summary['mean'] == pytest.approx(sum(exact) / len(exact) / 1e9)
+    for name, p in LatencyHistogram.PERCENTILES:
+        true = exact[int(-(-len(exact) * p // 100)) - 1]  # The ceil(n * p%)-th smallest
+        # The bucket's upper edge: never below the true value, and close
+        assert true <= summary[name] * 1e9 <= true * (1 + error) + 1
+    assert summary['max'] * 1e9 == exact[-1]
+    assert summary['p50'] <= summary['p90'] <= summary['p99'] <= summary['p999'] <= summary['max']
+
+
+def test_empty_histogram_reports_zeros():
+    summary = LatencyHistogram().get_summary()
+    assert summary['count'] == 0
+    assert all(summary[name] == 0.0 for name in ('mean', 'p50', 'p999', 'max'))
+
+
+def test_merged_snapshots_match_one_histogram_of_all_samples():
+    rng = random.Random(2)
+    first, second = _nanoseconds(rng, 3000), _nanoseconds(rng, 5000)
+    left, right = _filled(first), _filled(second)
+    
+    snapshot = left.snapshot()
+    left.record(1.0)  # Later samples stay out of the snapshot
+    assert snapshot.count == 3000 and snapshot.max_value < 1e9
+    
+    merged = snapshot.merge(right.snapshot())
+    combined = _filled(first + second)
+    assert merged.counts == combined.counts
+    assert (merged.count, merged.total) == (combined.count, combined.total)
+    assert (merged.min_value, merged.max_value) == (combined.min_value, combined.max_value)
+    assert merged.get_summary() == combined.get_summary()
+    assert right.count == 5000  # Merging reads the other histogram, never changes it
+
+
+@pytest.mark.parametrize('mode', ['blocking', 'incremental'])
+def test_migration_pauses_are_reported_in_get_stats(mode):
+    stm = SelfTuningMap(initial_structure='AVL', migration_mode=mode, migration_batch_size=64)
+    stm.decision_engine.min_ops_before_switch = float('inf')
+    for key in range(2000):
+        stm.insert(key, key)
+    assert stm.get_stats()['latency']['migration']['count'] == 0
+    
+    stm.force_switch('HashMap')
+    while stm.migration is not None:
+        stm.search(0)
+    
+    latency = stm.get_stats()['latency']
+    pauses = latency['migration']
+    # One pause per blocking switch; one per copied batch of an incremental one
+    assert pauses['count'] == (1 if mode == 'blocking' else -(-2000 // 64))
+    assert 0 < pauses['p50'] <= pauses['max']
+    assert pauses['max'] * 1e9 == stm.stats.migration_latency.max_value
+    # Operation latencies stay in their own series, per structure
+    assert set(latency['insert']) == {'AVL', 'all'}
+    assert latency['insert']['all']['count'] == 2000
@@ -0,0 +1,53 @@
+import random
+
+import pytest
+
+from src.core import ClockCache, LRUCache, SelfTuningMap
+
+
+@pytest.mark.parametrize('cache_class', [LRUCache, ClockCache])
+def test_cache_stays_coherent_with_writes_and_switches(cache_class):
+    rng = random.Random(0)
+    cache = cache_class(capacity=64, admit_every=1)
+    stm = SelfTuningMap(initial_structure='AVL', cache=cache, instrumentation='off')
+    model = {}
+    for step in range(6000):
+        key = rng.randrange(200)
+        op = rng.random()
+        if op < 0.3:
+            stm.insert(key, step)
+            model[key] = step
+        elif op < 0.45:
+            stm.delete(key)
+            model.pop(key, None)
+        elif op < 0.5:
+            items = [(rng.randrange(200), step) for _ in range(8)]
+            stm.insert_many(items)
+            model.update(items)
+        else:
+            assert stm.search(key) == model.get(key)
+        if step in (2000, 4000):
+            # Writes keep the cache coherent whatever structure is active
+            stm.force_switch('HashMap' if step == 2000 else 'BPlusTree')
+    assert stm.search_many(range(200)) == [model.get(key) for key in range(200)]
+    assert cache.hits > 0 and len(cache) <= 64
+
+
+@pytest.mark.parametrize('cache_class', [LRUCache, ClockCache])
+def test_cache_evicts_within_capacity(cache_class):
+    cache = cache_class(capacity=8, admit_every=1)
+    for key in range(100):
+        assert cache.lookup(key, lambda k: k * 2) == key * 2
+    assert len(cache) == 8 and cache.evictions == 92
+    cache.invalidate(99)
+    assert cache.lookup(99, lambda k: 'fresh') == 'fresh'
+
+
+def test_lru_keeps_the_recently_used_key():
+    cache = LRUCache(capacity=2, admit_every=1)
+    cache.lookup(1, str)
+    cache.lookup(2, str)
+    cache.lookup(1, str)  # 2 is now the least recent
+    cache.lookup(3, str)
+    assert cache.lookup(1, lambda k: 'reloaded') == '1'
+    assert cache.lookup(2, lambda k: 'reloaded') == 'reloaded'
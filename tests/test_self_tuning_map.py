@@ -0,0 +1,250 @@
+import random
+
+import pytest
+
+from src.core import DecisionEngine, SelfTuningMap
+
+
+def _migrating_to_hashmap(n=5000):
+    # Fixed check schedule: an adaptive one may back off past the end of the test
+    stm = SelfTuningMap(initial_structure='AVL', migration_mode='incremental',
+                        migration_batch_size=1, decision_engine=DecisionEngine(adaptive=False))
+    for key in range(n):
+        stm.insert(key, key)
+    stm.force_switch('HashMap')
+    assert stm.migration is not None
+    return stm
+
+
+def test_range_heavy_workload_aborts_migration_to_hashmap():
+    stm = _migrating_to_hashmap()
+    for i in range(5000):
+        assert stm.range(i, i + 10) == [(k, k) for k in range(i, min(i + 10, 5000))]
+    assert stm.aborted_migrations >= 1
+    assert stm.get_current_structure() != 'HashMap'
+    assert 'HashMap' not in [switch['to'] for switch in stm.get_stats()['switch_history']]
+
+
+def test_migration_aborts_once_engine_stops_wanting_it():
+    stm = _migrating_to_hashmap()
+    for key in range(5000, 6000):
+        stm.insert(key, key)
+    assert stm.migration is None
+    assert stm.aborted_migrations == 1
+    assert stm.get_current_structure() == 'AVL'
+    assert all(stm.search(key) == key for key in range(0, 6000, 7))
+
+
+def _on_sorted_array(n=2000, **kwargs):
+    pytest.importorskip('numpy')
+    stm = SelfTuningMap(**kwargs)
+    for key in range(n):
+        stm.insert(key, key)
+    stm.force_switch('SortedArray')
+    return stm
+
+
+def test_unsampled_float_key_keeps_map_off_sorted_array():
+    pytest.importorskip('numpy')
+    for seed in range(5):
+        random.seed(seed)
+        stm = SelfTuningMap(instrumentation='sampled')
+        for key in range(2000):
+            stm.insert(key, key)
+        stm.insert(0.5, 'half')
+        for i in range(20000):
+            assert stm.search(i % 2000) == i % 2000
+        assert stm.search(0.5) == 'half'
+        assert not stm.get_stats()['int_keys']
+        assert stm.get_current_structure() != 'SortedArray'
+
+
+@pytest.mark.parametrize('key', [0.5, 2 ** 70, -2 ** 70, 'abc'])
+def test_non_int64_key_moves_map_off_sorted_array(key):
+    stm = _on_sorted_array()
+    assert stm.get_current_structure() == 'SortedArray'
+    stm.insert(key, 'x')
+    assert stm.get_current_structure() != 'SortedArray'
+    assert stm.search(key) == 'x'
+    assert all(stm.search(k) == k for k in range(0, 2000, 7))
+    assert stm.active_ds.size == 2001
+
+
+def test_non_int64_key_aborts_incremental_migration_to_sorted_array():
+    pytest.importorskip('numpy')
+    stm = SelfTuningMap(migration_mode='incremental', migration_batch_size=1,
+                        instrumentation='off')
+    for key in range(2000):
+        stm.insert(key, key)
+    stm.force_switch('SortedArray')
+    assert stm.migration is not None
+    stm.insert(1.5, 'x')
+    assert stm.migration is None
+    assert stm.aborted_migrations == 1
+    assert stm.get_current_structure() == 'BST'
+    assert stm.search(1.5) == 'x'
+
+
+@pytest.mark.parametrize('mode', ['blocking', 'incremental'])
+def test_switch_to_sorted_array_with_stored_big_int_is_dropped(mode):
+    pytest.importorskip('numpy')
+    stm = SelfTuningMap(initial_structure='AVL', migration_mode=mode, instrumentation='counters')
+    for key in range(2000):
+        stm.insert(key, key)
+    stm.active_ds.insert(2 ** 70, 'big')  # As if inserted on an unsampled op
+    stm.force_switch('SortedArray')
+    while stm.migration is not None:
+        stm.migration_step()
+    assert stm.get_current_structure() == 'AVL'
+    assert stm.aborted_migrations == 1
+    assert stm.search(2 ** 70) == 'big'
+    assert not stm.get_stats()['int_keys']
+
+
+class _DictBackend:
+    """Minimal unordered backend for register_backend"""
+    
+    def __init__(self):
+        self.data = {}
+        self.size = 0
+    
+    def insert(self, key, value):
+        new = key not in self.data
+        self.data[key] = value
+        self.size = len(self.data)
+        return new
+    
+    def search(self, key):
+        return self.data.get(key)
+    
+    def delete(self, key):
+        found = self.data.pop(key, None) is not None
+        self.size = len(self.data)
+        return found
+    
+    def get_all_items(self):
+        return list(self.data.items())
+    
+    def bulk_load(self, items):
+        self.data = dict(items)
+        self.size = len(self.data)
+    
+    def scan(self, cursor=None, count=100):
+        keys = list(self.data)
+        i = 0 if cursor is None else keys.index(cursor) + 1
+        items = [(key, self.data[key]) for key in keys[i:i + count]]
+        return items, items[-1][0] if i + count < len(keys) else None
+    
+    def clear(self):
+        self.data = {}
+        self.size = 0
+
+
+def test_registered_backend_is_migrated_to():
+    class Registry(SelfTuningMap):
+        pass
+    
+    Registry.register_backend('Dict', _DictBackend)
+    assert 'Dict' not in SelfTuningMap.BACKENDS
+    with pytest.raises(TypeError):
+        Registry.register_backend('Broken', object)
+    
+    for mode in ('blocking', 'incremental'):
+        stm = Registry(initial_structure='AVL', migration_mode=mode,
+                       decision_engine=DecisionEngine(adaptive=False))
+        for key in range(3000):
+            stm.insert(key, key)
+        stm.force_switch('Dict')
+        while stm.migration is not None:
+            stm.migration_step()
+        assert stm.get_current_structure() == 'Dict'
+        assert isinstance(stm.active_ds, _DictBackend)
+        assert all(stm.search(key) == key for key in range(0, 3000, 7))
+
+
+def test_engine_picks_registered_sorted_array():
+    pytest.importorskip('numpy')
+    stm = SelfTuningMap(initial_structure='HashMap', migration_mode='incremental')
+    for key in range(5000):
+        stm.insert(key, key)
+    for i in range(20000):
+        stm.search(i % 5000)
+    assert stm.get_current_structure() == 'SortedArray'
+    assert [switch['to'] for switch in stm.get_stats()['switch_history']][-1] == 'SortedArray'
+
+
+def test_only_live_structures_are_allocated():
+    built = []
+    
+    class Registry(SelfTuningMap):
+        pass
+    
+    for name, factory in SelfTuningMap.BACKENDS.items():
+        Registry.register_backend(name, lambda name=name, factory=factory:
+                                  built.append(name) or factory())
+    built.clear()  # register_backend builds one of each to check it
+    
+    stm = Registry(initial_structure='AVL', migration_mode='incremental')
+    assert built == ['AVL']
+    assert stm.get_memory_stats()['live_structures'] == ['AVL']
+    stm.force_switch('BPlusTree')
+    assert built == ['AVL', 'BPlusTree']
+    assert stm.get_memory_stats()['live_structures'] == ['AVL', 'BPlusTree']
+
+
+def test_source_is_released_a_step_per_operation_after_commit():
+    n = 20000
+    stm = SelfTuningMap(initial_structure='AVL', migration_mode='incremental',
+                        migration_batch_size=64, instrumentation='off')
+    for key in range(n):
+        stm.insert(key, key)
+    source = stm.active_ds
+    stm.force_switch('BPlusTree')
+    while stm.migration is not None:
+        stm.search(0)
+    
+    # The commit only retires the source; freeing it is spread over later operations
+    assert stm.retired == [source]
+    assert stm.get_memory_stats()['retired_structures'] == 1
+    ops = 0
+    while stm.retired:
+        stm.search(ops % n)
+        ops += 1
+    assert ops >= n // 64
+    assert source.size == 0 and source.root is None and not source._releasing
+    assert stm.get_memory_stats()['retired_structures'] == 0
+    assert all(stm.search(key) == key for key in range(0, n, 7))
+
+
+def test_peak_memory_counts_both_copies_of_a_migration():
+    n = 5000
+    stm = SelfTuningMap(initial_structure='AVL', migration_mode='incremental',
+                        instrumentation='off')
+    for key in range(n):
+        stm.insert(key, key)
+    assert stm.get_memory_stats()['peak_copies'] == 1.0
+    
+    stm.force_switch('BPlusTree')
+    while stm.migration is not None:
+        stm.search(0)
+    memory = stm.get_memory_stats()
+    assert memory['items_held'] == n
+    assert memory['peak_items_held'] == 2 * n
+    assert memory['peak_copies'] == 2.0
+
+
+def test_sampled_map_counts_every_op_through_a_held_reference():
+    stm = SelfTuningMap(initial_structure='AVL', migration_mode='incremental',
+                        instrumentation='sampled', sample_rate=64)
+    insert, search = stm.insert, stm.search
+    for key in range(3000):
+        insert(key, key)
+    stm.force_switch('HashMap')  # Reroutes the fast paths the references call
+    for key in range(3000):
+        assert search(key) == key
+    stm.delete(0)
+    
+    stats = stm.get_stats()
+    assert (stats['inserts'], stats['searches'], stats['deletes']) == (3000, 3000, 1)
+    assert stats['total_ops'] == 6001
+    assert stm.search(0) is None
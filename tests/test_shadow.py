@@ -0,0 +1,90 @@
+import pytest
+
+from src.core import DecisionEngine, SelfTuningMap, ShadowEvaluator
+
+
+SEARCH_HEAVY = {'total_ops': 10000, 'search_ratio': 0.9, 'insert_ratio': 0.1, 'delete_ratio': 0.0,
+                'range_ratio': 0.0, 'order_score': 0.0, 'int_keys': False}
+
+
+def _measured(shadow, name, seconds_per_op):
+    """Pretend the shadow replayed enough ops on `name` to trust its numbers"""
+    for op in ('insert', 'search', 'delete'):
+        shadow.timings[name][op] = [seconds_per_op * shadow.min_samples, shadow.min_samples]
+
+
+@pytest.mark.parametrize('stride', [1, 7, 16, 64, 1024])
+def test_strided_int_keys_are_sampled_at_the_set_rate(stride):
+    shadow = ShadowEvaluator(key_sample=16)
+    sampled = sum(shadow._sampled(key) for key in range(0, 16000 * stride, stride))
+    assert 16000 / 16 * 0.7 < sampled < 16000 / 16 * 1.3
+
+
+def test_map_replays_strided_keys_into_the_shadow():
+    stm = SelfTuningMap(initial_structure='AVL', shadow=True)
+    stm.decision_engine.min_ops_before_switch = float('inf')
+    for key in range(0, 64000, 16):
+        stm.insert(key, key)
+    report = stm.get_stats()['shadow']
+    assert report['replayed'] > 0
+    assert 0 < report['keys'] < 4000
+
+
+def test_shadow_keys_are_capped_but_held_keys_still_update():
+    shadow = ShadowEvaluator(key_sample=1, max_keys=100, cpu_budget=float('inf'))
+    for key in range(1000):
+        shadow.observe('insert', key, key, main_duration=1.0)
+    assert all(ds.size == 100 for ds in shadow.structures.values())
+    assert shadow.get_report()['keys'] == shadow.get_report()['max_keys'] == 100
+    
+    shadow.observe('insert', 5, 'updated', main_duration=1.0)
+    assert all(ds.search(5) == 'updated' for ds in shadow.structures.values())
+
+
+def test_shadow_time_stays_within_the_cpu_budget():
+    shadow = ShadowEvaluator(key_sample=1, cpu_budget=0.1)
+    longest = 0.0
+    for key in range(20000):
+        before = shadow.shadow_time
+        # Main ops far cheaper than replaying one into four structures
+        shadow.observe('insert' if key % 2 else 'search', key, key, main_duration=1e-7)
+        longest = max(longest, shadow.shadow_time - before)
+        # At most one replay beyond the budget: the one that crossed it
+        assert shadow.shadow_time <= shadow.cpu_budget * shadow.main_time + longest
+    
+    report = shadow.get_report()
+    assert report['skipped_budget'] > 0
+    assert report['replayed'] + report['skipped_budget'] == 20000
+
+
+def test_shadow_vetoes_a_threshold_switch_it_measured_as_slower():
+    engine = DecisionEngine()
+    assert engine.decide_structure('AVL', SEARCH_HEAVY, 15, 20000)[:2] == (True, 'HashMap')
+    
+    shadow = ShadowEvaluator()
+    _measured(shadow, 'AVL', 1e-6)
+    _measured(shadow, 'HashMap', 2e-6)
+    should_switch, target, reason = engine.decide_structure('AVL', SEARCH_HEAVY, 15, 20000,
+                                                            shadow=shadow)
+    assert (should_switch, target) == (False, 'AVL')
+    assert reason.startswith('Shadow veto')
+    assert engine.last_decision['shadow_cost'] == {'HashMap': pytest.approx(2e-6),
+                                                   'AVL': pytest.approx(1e-6)}
+    
+    _measured(shadow, 'HashMap', 0.5e-6)  # Measured faster: the switch stands
+    assert engine.decide_structure('AVL', SEARCH_HEAVY, 15, 20000, shadow=shadow)[:2] == (
+        True, 'HashMap')
+
+
+def test_shadow_measurements_correct_the_cost_model():
+    engine = DecisionEngine('cost_model', horizon_ops=10 ** 6, calibrate=False)
+    assert engine.decide_structure('BST', SEARCH_HEAVY, 60, 20000)[:2] == (True, 'HashMap')
+    assert engine.last_decision['shadow_corrections'] == {}
+    
+    shadow = ShadowEvaluator()
+    _measured(shadow, 'HashMap', 1e-3)  # Far slower than the model predicts
+    should_switch, target, _ = engine.decide_structure('BST', SEARCH_HEAVY, 60, 20000,
+                                                       shadow=shadow)
+    # Clamped, so one bad measurement can't rule a structure out entirely
+    assert engine.last_decision['shadow_corrections'] == {'HashMap': 4.0}
+    assert should_switch and target not in ('BST', 'HashMap')
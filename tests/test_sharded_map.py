@@ -0,0 +1,74 @@
+import random
+from itertools import islice
+
+import pytest
+
+from src.core import SelfTuningMap, ShardedSelfTuningMap
+
+
+def _maps():
+    return [
+        ShardedSelfTuningMap(n_shards=4),
+        ShardedSelfTuningMap(n_shards=4, partition='range', boundaries=[250, 500, 750])
+    ]
+
+
+@pytest.mark.parametrize('stm', _maps(), ids=['hash', 'range'])
+def test_matches_dict_across_shards(stm):
+    rng = random.Random(0)
+    model = {}
+    for step in range(3000):
+        key = rng.randrange(1000)
+        if rng.random() < 0.6:
+            stm.insert(key, step)
+            model[key] = step
+        else:
+            stm.delete(key)
+            model.pop(key, None)
+    stm.insert_many([(key, -key) for key in range(0, 1000, 50)])
+    model.update((key, -key) for key in range(0, 1000, 50))
+    
+    keys = sorted(model)
+    assert stm.search_many(range(1000)) == [model.get(key) for key in range(1000)]
+    assert stm.range(100, 600) == [(k, model[k]) for k in keys if 100 <= k < 600]
+    assert stm.range(100, None, limit=5) == [(k, model[k]) for k in keys if k >= 100][:5]
+    assert stm.floor(499)[0] == max(k for k in keys if k <= 499)
+    assert stm.ceiling(501)[0] == min(k for k in keys if k >= 501)
+    assert stm.min()[0] == keys[0] and stm.max()[0] == keys[-1]
+    assert [k for k, _ in islice(stm.items_from(740), 30)] == [k for k in keys if k >= 740][:30]
+    assert stm.get_stats()['size'] == len(model)
+
+
+def test_each_shard_tunes_for_its_own_keys():
+    stm = ShardedSelfTuningMap(n_shards=2, partition='range', boundaries=[10 ** 6])
+    for key in range(3000):
+        stm.insert(key, key)  # Shard 0: a sorted stream degrades its BST
+    rng = random.Random(1)
+    high = [10 ** 6 + rng.randrange(10 ** 6) for _ in range(200)]
+    for key in high:
+        stm.insert(key, key)  # Shard 1: a few random keys keep its BST shallow
+    for _ in range(2000):
+        key = rng.choice(high)
+        assert stm.search(key) == key
+    low, high = stm.get_structures()
+    assert low in ('AVL', 'BPlusTree')
+    assert high == 'BST'
+    assert stm.shards[1].get_stats()['migration_count'] == 0
+
+
+def test_hash_partition_spreads_keys():
+    stm = ShardedSelfTuningMap(n_shards=8)
+    stm.insert_many((key, key) for key in range(0, 80000, 8))  # Same low bits
+    sizes = [shard.active_ds.size for shard in stm.shards]
+    assert min(sizes) > 0.8 * max(sizes)
+
+
+def test_rejects_bad_partitions():
+    with pytest.raises(ValueError):
+        ShardedSelfTuningMap(partition='round-robin')
+    with pytest.raises(ValueError):
+        ShardedSelfTuningMap(n_shards=3, partition='range', boundaries=[5])
+    with pytest.raises(ValueError):
+        ShardedSelfTuningMap(n_shards=3, partition='range', boundaries=[5, 5])
+    shards = ShardedSelfTuningMap(n_shards=2, shard_factory=lambda: SelfTuningMap('AVL'))
+    assert shards.get_structures() == ['AVL', 'AVL']
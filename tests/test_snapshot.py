@@ -0,0 +1,84 @@
+import json
+
+import pytest
+
+from src.core import CostModel, DecisionEngine, SelfTuningMap
+from src.core.snapshot import read_snapshot
+from src.core.sorted_array_map import HAS_NUMPY
+
+STRUCTURES = ['BST', 'AVL', 'BPlusTree', 'HashMap'] + (['SortedArray'] if HAS_NUMPY else [])
+
+
+@pytest.mark.parametrize('structure', STRUCTURES)
+def test_save_load_round_trip(tmp_path, structure):
+    stm = SelfTuningMap(initial_structure=structure, instrumentation='off')
+    for key in range(1000, 0, -3):
+        stm.insert(key, {'v': key})
+    path = tmp_path / 'map.snap'
+    assert stm.save(path) == stm.active_ds.size
+    
+    loaded = SelfTuningMap.load(path, instrumentation='off')
+    assert loaded.get_current_structure() == structure
+    assert loaded.active_ds.get_all_items() == stm.active_ds.get_all_items()
+    assert loaded.search(997) == {'v': 997}
+
+
+def test_round_trip_keeps_non_int64_keys(tmp_path):
+    stm = SelfTuningMap(initial_structure='HashMap', instrumentation='off')
+    keys = ['b', 'a', 'ccc', '']
+    for key in keys:
+        stm.insert(key, key.upper())
+    stm.save(tmp_path / 'map.snap')
+    loaded = SelfTuningMap.load(tmp_path / 'map.snap', bloom=True)
+    assert sorted(loaded.active_ds.get_all_items()) == sorted((k, k.upper()) for k in keys)
+    assert loaded.search('zzz') is None and loaded.search('ccc') == 'CCC'
+
+
+def test_load_resumes_what_the_map_learned(tmp_path):
+    stm = SelfTuningMap()
+    for key in range(3000):
+        stm.insert(key, key)  # Sorted inserts: the map moves off the BST
+    assert stm.get_stats()['switch_history']
+    stm.save(tmp_path / 'map.snap')
+    
+    before = stm.get_stats()
+    loaded = SelfTuningMap.load(tmp_path / 'map.snap')
+    after = loaded.get_stats()
+    assert after['current_structure'] == before['current_structure']
+    assert after['total_ops'] == before['total_ops']
+    assert after['switch_history'] == before['switch_history']
+    assert after['order_score'] == before['order_score']
+    for key in range(3000, 3100):
+        loaded.insert(key, key)
+    assert loaded.get_stats()['total_ops'] == before['total_ops'] + 100
+
+
+def test_save_replaces_an_existing_snapshot(tmp_path):
+    path = tmp_path / 'map.snap'
+    stm = SelfTuningMap(instrumentation='off')
+    stm.insert(1, 'one')
+    stm.save(path)
+    stm.delete(1)
+    stm.insert(2, 'two')
+    stm.save(path)
+    assert SelfTuningMap.load(path).active_ds.get_all_items() == [(2, 'two')]
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['map.snap']
+
+
+def test_state_is_plain_data_and_keeps_cost_model(tmp_path, monkeypatch):
+    engine = DecisionEngine('cost_model', calibrate=False)
+    engine.cost_model.calibrated = True
+    engine.cost_model.sort_cost = 1.25e-7
+    stm = SelfTuningMap(decision_engine=engine)
+    for key in range(500):
+        stm.insert(key, object())  # Values are pickled; the state never is
+    stm.save(tmp_path / 'map.snap')
+    
+    state, keys, _ = read_snapshot(tmp_path / 'map.snap')
+    assert json.loads(json.dumps(state)) == state
+    assert keys == list(range(500))
+    
+    monkeypatch.setattr(CostModel, 'calibrate', lambda self, *args: pytest.fail("recalibrated"))
+    loaded = SelfTuningMap.load(tmp_path / 'map.snap')
+    assert loaded.decision_engine.mode == 'cost_model'
+    assert loaded.decision_engine.cost_model.sort_cost == 1.25e-7
@@ -0,0 +1,71 @@
+import random
+
+import pytest
+
+pytest.importorskip('numpy')
+
+from src.core import SortedArrayMap
+
+
+def _pending_map(rng):
+    """A map with buffered inserts and tombstones, never merged, plus its model"""
+    sa = SortedArrayMap()
+    sa.bulk_load((key, key) for key in range(0, 20000, 2))
+    model = {key: key for key in range(0, 20000, 2)}
+    for _ in range(200):
+        key = rng.randrange(20000)
+        if rng.random() < 0.5:
+            sa.insert(key, -key)
+            model[key] = -key
+        else:
+            sa.delete(key)
+            model.pop(key, None)
+    assert sa.buffer and sa.deleted
+    return sa, model
+
+
+def test_ordered_reads_merge_the_buffer_without_folding():
+    rng = random.Random(7)
+    sa, model = _pending_map(rng)
+    ordered = sorted(model.items())
+    keys = [key for key, _ in ordered]
+    
+    assert sa.get_all_items() == ordered
+    assert sa.min() == ordered[0] and sa.max() == ordered[-1]
+    for _ in range(200):
+        lo, hi = sorted(rng.randrange(-10, 20010) for _ in range(2))
+        limit = rng.choice([None, 1, 5, 50])
+        expected = [item for item in ordered if lo <= item[0] < hi]
+        assert sa.range(lo, hi, limit) == expected[:limit]
+        
+        key = rng.randrange(-10, 20010)
+        below = [item for item in ordered if item[0] <= key]
+        above = [item for item in ordered if item[0] >= key]
+        assert sa.floor(key) == (below[-1] if below else None)
+        assert sa.ceiling(key) == (above[0] if above else None)
+    
+    seen, cursor = [], None
+    while True:
+        items, cursor = sa.scan(cursor, 37)
+        seen.extend(items)
+        if cursor is None:
+            break
+    assert seen == ordered
+    assert [key for key, _ in sa.items_from(keys[100])] == keys[100:]
+    assert sa.merge_count == 0 and sa.get_pending() > 0
+
+
+def test_merge_still_folds_on_the_size_trigger():
+    sa = SortedArrayMap()
+    sa.bulk_load((key, key) for key in range(0, 20000, 2))
+    model = dict(sa.get_all_items())
+    limit = sa._merge_limit()
+    for key in range(1, 2 * limit - 2, 2):
+        sa.insert(key, key)
+        model[key] = key
+    assert sa.merge_count == 0 and len(sa.buffer) == limit - 1
+    
+    sa.insert(2 * limit - 1, 0)
+    model[2 * limit - 1] = 0
+    assert sa.merge_count == 1 and not sa.buffer and not sa.buffer_keys
+    assert sa.get_all_items() == sorted(model.items())
@@ -0,0 +1,105 @@
+import random
+from collections import Counter, deque
+
+import pytest
+
+from src.core import StatsCollector
+
+
+OPS = ('insert', 'search', 'delete', 'range')
+
+
+class _NoScan(deque):
+    """A window that fails the test if anything walks it"""
+    
+    def __iter__(self):
+        raise AssertionError('window scanned')
+
+
+def _no_scans(stats):
+    stats.recent_ops = _NoScan(stats.recent_ops, stats.recent_ops.maxlen)
+    stats.operation_times = _NoScan(stats.operation_times, stats.operation_times.maxlen)
+    stats.pair_directions = _NoScan(stats.pair_directions, stats.pair_directions.maxlen)
+    return stats
+
+
+def _brute_order_score(inserted, order_window):
+    keys = inserted[-order_window:]
+    if len(keys) < 10:
+        return 0.5
+    pairs = list(zip(keys, keys[1:]))
+    ascending = sum(b > a for a, b in pairs)
+    descending = sum(b < a for a, b in pairs)
+    return max(ascending, descending) / len(pairs)
+
+
+def test_windows_stay_fixed_size():
+    stats = StatsCollector(window_size=100, order_window=50)
+    rng = random.Random(0)
+    for i in range(20000):
+        stats.record(rng.choice(OPS), rng.randrange(1000), rng.random() * 1e-5)
+    stats.record_batch('insert', list(range(5000)), 1e-3)
+    
+    assert len(stats.recent_ops) == sum(stats.window_counts.values()) == 100
+    assert len(stats.operation_times) == 100
+    assert len(stats.pair_directions) == 49
+    assert stats.total_ops == 25000 and stats.recorded_ops == 20100
+    # Histograms are sparse: their size follows the spread, not the count
+    assert all(len(histogram.counts) < 500 for histogram in stats.latency.values())
+
+
+def test_ratios_and_mean_are_kept_up_without_scanning_the_windows():
+    stats = _no_scans(StatsCollector(window_size=100, order_window=50))
+    shadow_ops = deque(maxlen=100)
+    shadow_times = deque(maxlen=100)
+    totals = Counter()
+    rng = random.Random(1)
+    for i in range(5000):
+        op = rng.choice(OPS)
+        duration = rng.random() * 1e-5
+        stats.record(op, rng.randrange(1000), duration)
+        shadow_ops.append(op)
+        shadow_times.append(duration)
+        totals[op] += 1
+        if i % 997 == 0:
+            stats.count('search', 50)  # Unsampled ops: totals only
+            totals['search'] += 50
+        
+        summary = stats.get_summary()
+        counts = Counter(shadow_ops)
+        assert summary['search_ratio'] == counts['search'] / len(shadow_ops)
+        assert summary['insert_ratio'] == counts['insert'] / len(shadow_ops)
+        assert summary['delete_ratio'] == counts['delete'] / len(shadow_ops)
+        assert summary['range_ratio'] >= counts['range'] / len(shadow_ops)
+        assert summary['avg_time'] == pytest.approx(sum(shadow_times) / len(shadow_times))
+    assert (summary['searches'], summary['inserts'], summary['deletes'], summary['ranges']) == (
+        totals['search'], totals['insert'], totals['delete'], totals['range'])
+    assert summary['total_ops'] == sum(totals.values())
+
+
+def test_streaming_order_score_matches_a_recompute():
+    rng = random.Random(2)
+    for order_window in (10, 50):
+        stats = StatsCollector(window_size=100, order_window=order_window)
+        inserted = []
+        assert stats.get_order_score() == 0.5
+        next_key = 0
+        for phase in range(40):
+            sorted_phase = phase % 3 == 0
+            descending = phase % 3 == 1
+            for _ in range(rng.randrange(5, 80)):
+                if rng.random() < 0.3:
+                    stats.record('search', rng.randrange(1000))
+                    continue
+                if sorted_phase:
+                    next_key += rng.randrange(1, 4)
+                    key = next_key
+                elif descending:
+                    next_key -= rng.randrange(0, 3)  # Equal keys count as neither
+                    key = next_key
+                else:
+                    key = rng.randrange(1000)
+                stats.record('insert', key)
+                inserted.append(key)
+                assert stats.get_order_score() == pytest.approx(
+                    _brute_order_score(inserted, order_window))
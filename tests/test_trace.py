@@ -0,0 +1,30 @@
+from src.core import SelfTuningMap
+from src.core import trace as tr
+
+
+def test_trace_records_and_replays_every_operation(tmp_path):
+    path = tmp_path / 'ops.trace'
+    stm = SelfTuningMap(instrumentation='off')
+    stm.start_trace(path)
+    for key in range(100):
+        stm.insert(key, key)
+    stm.search(5)
+    stm.delete(7)
+    assert len(stm.range(10, 20)) == 10
+    stm.floor(50)
+    stm.min()
+    stm.insert_many([(200, 0), (201, 0)])
+    assert stm.stop_trace() == 107
+    
+    records = list(tr.read_trace(path))
+    assert [op for op, *_ in records[100:]] == [tr.SEARCH, tr.DELETE, tr.RANGE, tr.FLOOR, tr.MIN,
+                                                tr.INSERT, tr.INSERT]
+    assert records[102][1] == 10 and records[102][3] == 10  # Low key and items returned
+    assert records[104][1] == tr.NO_KEY
+    assert all(b[2] >= a[2] for a, b in zip(records, records[1:]))
+    
+    target = SelfTuningMap(initial_structure='HashMap', instrumentation='off')
+    report = tr.replay_trace(path, target)
+    assert report['operations'] == 107
+    assert report['latency']['insert']['count'] == 102
+    assert target.active_ds.size == 101
@@ -0,0 +1,58 @@
+import os
+
+from src.core import SelfTuningMap, WriteAheadLog
+
+
+def _fill(stm, model, keys):
+    for key in keys:
+        stm.insert(key, str(key))
+        model[key] = str(key)
+    for key in keys[::3]:
+        stm.delete(key)
+        model.pop(key)
+
+
+def test_recover_replays_the_log(tmp_path):
+    wal = WriteAheadLog(tmp_path, group_size=8)
+    stm = SelfTuningMap(wal=wal)
+    model = {}
+    _fill(stm, model, list(range(500)) + [-5, 2 ** 70, -2 ** 70])  # Big ints are pickled
+    stm.insert_many([(1000, 'x'), (1001, 'y')])
+    model.update({1000: 'x', 1001: 'y'})
+    wal.close()
+    
+    recovered = SelfTuningMap.recover(WriteAheadLog(tmp_path))
+    assert dict(recovered.active_ds.get_all_items()) == model
+
+
+def test_recover_from_snapshot_plus_log(tmp_path):
+    wal = WriteAheadLog(tmp_path)
+    stm = SelfTuningMap(initial_structure='AVL', wal=wal)
+    model = {}
+    _fill(stm, model, list(range(300)))
+    wal.compact(wait=True)
+    assert wal.compactions == 1 and wal.snapshot_path() is not None
+    _fill(stm, model, list(range(300, 600)))
+    stm.delete(1)
+    model.pop(1)
+    wal.close()
+    
+    recovered = SelfTuningMap.recover(WriteAheadLog(tmp_path))
+    assert recovered.get_current_structure() == 'AVL'
+    assert dict(recovered.active_ds.get_all_items()) == model
+
+
+def test_torn_tail_loses_only_the_torn_record(tmp_path):
+    wal = WriteAheadLog(tmp_path, group_size=1)
+    stm = SelfTuningMap(wal=wal)
+    for key in range(100):
+        stm.insert(key, key)
+    wal.close()
+    
+    segment = max(name for name in os.listdir(tmp_path) if name.startswith('wal-'))
+    path = os.path.join(tmp_path, segment)
+    with open(path, 'r+b') as f:
+        f.truncate(os.path.getsize(path) - 3)
+    
+    recovered = SelfTuningMap.recover(WriteAheadLog(tmp_path))
+    assert sorted(key for key, _ in recovered.active_ds.get_all_items()) == list(range(99))
@@ -0,0 +1,42 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from src.utils.workload_generator import INSERT, WorkloadStream
+
+
+def _stream_keys(stream):
+    ops, keys = zip(*stream.chunks())
+    return np.concatenate(ops), np.concatenate(keys)
+
+
+def test_latest_reads_only_inserted_keys_favouring_recent_ones():
+    stream = WorkloadStream(100000, 'latest', mix={'insert': 0.05, 'search': 0.95},
+                            chunk_size=4096, seed=3)
+    ops, keys = _stream_keys(stream)
+    inserted = np.cumsum(ops == INSERT) - (ops == INSERT)
+    reads = (ops != INSERT) & (inserted > 0)
+    assert (keys[reads] < inserted[reads]).all()
+    age = inserted[reads] - 1 - keys[reads]
+    assert np.mean(age == 0) > 0.05  # The newest key is the most popular
+    assert np.mean(keys[reads] == 0) < 0.01  # Not a dumping ground for ranks past the oldest key
+    assert (keys[ops == INSERT] == np.arange(int((ops == INSERT).sum()))).all()
+
+
+def test_scrambled_zipfian_is_exact_past_int64_products():
+    key_space = 10 ** 12  # rank * multiplier no longer fits an int64
+    scrambled = WorkloadStream(50000, 'zipfian', key_space=key_space, seed=0)
+    _, ranks = _stream_keys(WorkloadStream(50000, 'zipfian', key_space=key_space, seed=0,
+                                           scrambled=False))
+    expected = [rank * scrambled._multiplier % key_space for rank in ranks.tolist()]
+    assert _stream_keys(scrambled)[1].tolist() == expected
+
+
+@pytest.mark.parametrize('distribution', ['uniform', 'zipfian', 'hotspot', 'latest', 'sequential'])
+def test_streams_are_reproducible_and_in_range(distribution):
+    first = _stream_keys(WorkloadStream(20000, distribution, key_space=5000, seed=9))
+    second = _stream_keys(WorkloadStream(20000, distribution, key_space=5000, seed=9))
+    assert (first[0] == second[0]).all() and (first[1] == second[1]).all()
+    assert first[1].min() >= 0
+    with pytest.raises(ValueError):
+        WorkloadStream(10, distribution, key_space=1 << 64)